@@ -0,0 +1,95 @@
+"""Benchmark da detecção rápida de comandos do NLPProcessor
+
+Compara o laço antigo (um re.search por padrão, na ordem de prioridade) com o
+IntentMatcher (padrões pré-compilados com filtro por palavra-chave), sobre um corpus de mensagens típicas de usuários em
+Angola. Antes de medir, confere que os dois devolvem o mesmo comando, padrão
+e grupos para todas as mensagens.
+
+Uso: PYTHONPATH=. python benchmarks/bench_intent_matcher.py [--number N]
+"""
+import argparse
+import re
+import timeit
+
+from src.modules.nlp_processor import NLPProcessor
+
+CORPUS = [
+    # Sem comando (caem no OpenAI)
+    'bom dia mano tudo fixe',
+    'boa tarde kota',
+    'obrigado pela ajuda',
+    'ya ya ta bom',
+    'eish o candongueiro hoje demorou bue',
+    'ok',
+    'a minha kumbu acabou',
+    'ate amanha',
+    'saudades da banda',
+    'o jogo do petro foi rijo',
+    'bue de calor hoje no kilamba',
+    'manda mais informacoes',
+    # Prestadores
+    'sou eletricista em luanda faco instalacoes',
+    'trabalho como canalizador no cazenga',
+    'preciso de um pintor para casa em viana',
+    'procuro mecanico em benguela',
+    'quero contratar uma cabeleireira para sabado',
+    'ofereco servicos de limpeza em talatona',
+    # Marketplace
+    'vendo iphone 12 150 000 kz estado novo',
+    'quero comprar uma geleira usada',
+    'tenho para venda um gerador 5kva no zango',
+    'anunciar carro toyota hilux',
+    'tem para venda tv de 55 polegadas',
+    # Outros módulos
+    'perdi o meu bi na baixa de luanda',
+    'achei uma carteira no rangel',
+    'quero reclamar da unitel a rede nao funciona',
+    'problema com a ende sem luz ha tres dias',
+    'bolsa de estudo para medicina em portugal',
+    'mestrado em engenharia no brasil',
+    'quanto esta o dolar no mercado informal',
+    'bitcoin subiu hoje',
+    'procuro mulher para namoro serio',
+    'quero fazer amizade com pessoas de malanje',
+    'qual o preco do cimento em luanda',
+    'como tirar o passaporte',
+    'onde fica a conservatoria de viana',
+]
+
+def legacy_detection(text):
+    """Laço original de _quick_pattern_detection"""
+    for command_type, patterns in NLPProcessor.command_patterns.items():
+        for pattern in patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                return command_type, pattern, match.groups()
+    return None
+
+def compiled_detection(text):
+    detection = NLPProcessor.command_matcher.match(text)
+    if detection:
+        command_type, pattern, match = detection
+        return command_type, pattern, match.groups()
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=200, help='passagens pelo corpus por rodada')
+    parser.add_argument('--repeat', type=int, default=5, help='rodadas (vale a melhor)')
+    args = parser.parse_args()
+    
+    for text in CORPUS:
+        assert legacy_detection(text) == compiled_detection(text), text
+    
+    no_command = [text for text in CORPUS if legacy_detection(text) is None]
+    
+    for corpus_label, corpus in (('corpus completo', CORPUS), ('sem comando', no_command)):
+        print(f'{corpus_label} ({len(corpus)} mensagens)')
+        
+        for label, func in (('laço re.search', legacy_detection), ('filtrado', compiled_detection)):
+            run = lambda: [func(text) for text in corpus]
+            best = min(timeit.repeat(run, number=args.number, repeat=args.repeat))
+            print(f'  {label:>15}: {best / (args.number * len(corpus)) * 1e6:8.2f} us/mensagem')
+
+if __name__ == '__main__':
+    main()
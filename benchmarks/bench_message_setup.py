@@ -0,0 +1,51 @@
+"""Micro-benchmark do custo de preparação por mensagem
+
+Compara a criação de NLPProcessor, MessageRouter e WhatsAppIntegration a cada
+mensagem (comportamento antigo) com a obtenção das instâncias compartilhadas
+do registro da aplicação.
+
+Uso: PYTHONPATH=. python benchmarks/bench_message_setup.py [--number N]
+"""
+import argparse
+import os
+import timeit
+import openai
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+os.environ.setdefault('DEV_DATABASE_URL', 'sqlite://')
+
+from src.main import create_app
+from src.modules.nlp_processor import NLPProcessor
+from src.modules.message_router import MessageRouter
+from src.modules.whatsapp_integration import WhatsAppIntegration
+from src.modules.registry import get_nlp_processor, get_message_router, get_whatsapp
+
+def per_message_construction():
+    NLPProcessor()
+    openai.OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+    MessageRouter()
+    WhatsAppIntegration()
+
+def registry_lookup():
+    get_nlp_processor().openai_client.client
+    get_message_router()
+    get_whatsapp()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=100, help='mensagens simuladas por rodada')
+    parser.add_argument('--repeat', type=int, default=3, help='rodadas (vale a melhor)')
+    args = parser.parse_args()
+    
+    app = create_app('development')
+    
+    with app.app_context():
+        # As instâncias compartilhadas são criadas no primeiro uso, fora da medição
+        registry_lookup()
+        
+        for label, func in (('por mensagem', per_message_construction), ('registro', registry_lookup)):
+            best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+            print(f'{label:>14}: {best / args.number * 1e6:10.2f} us/mensagem')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""Avaliação offline do NLP sobre o corpus rotulado de mensagens
+
+Roda o NLPProcessor e os extratores dos módulos sobre
+benchmarks/corpus/nlp_corpus_v1.jsonl (uma mensagem por linha, com a
+intenção, as entidades e os campos esperados dos módulos). O cliente OpenAI
+da aplicação é trocado por um stub que conta as chamadas e responde uma
+intenção fixa (ou a do rótulo, com --oracle), então nada sai da máquina.
+
+Relata a acurácia (geral, das respostas locais e por intenção), a taxa de
+fallback para o OpenAI, o acerto das entidades e dos campos extraídos pelos
+módulos, e a vazão e latência de cada etapa: normalização, tokens e
+palavras-chave, detecção rápida, extração de entidades e extração dos módulos.
+
+Datas esperadas são relativas ao dia da execução: "hoje", "hoje-1",
+"hoje+1" e "dia-12" (o dia 12 mais recente).
+
+Uso: PYTHONPATH=. python benchmarks/bench_nlp_corpus.py [--repeat 20] [--oracle] [--json relatorio.json]
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+os.environ.setdefault('DEV_DATABASE_URL', 'sqlite://')
+os.environ['INTENT_CACHE_BACKEND'] = 'none'
+os.environ['OPENAI_BATCH_WINDOW_MS'] = '0'
+
+from src.main import create_app
+from src.modules.intent_classifier import init_intent_classifier
+from src.modules.parsed_message import ParsedMessage
+from src.modules.registry import get_message_router, get_nlp_processor
+from src.modules.spelling import init_spelling_corrector
+from src.modules.typed_entities import last_day_of_month
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'corpus', 'nlp_corpus_v1.jsonl')
+
+STAGES = ('normalizacao', 'tokens_palavras_chave', 'deteccao_rapida', 'entidades', 'extracao_modulos')
+
+class StubOpenAIClient:
+    """No lugar do ResilientOpenAIClient: conta as chamadas e responde sem rede"""
+    
+    def __init__(self, intent: str):
+        self.intent = intent
+        self.calls = 0
+    
+    def create(self, **kwargs):
+        self.calls += 1
+        content = json.dumps({'intent': self.intent, 'category': 'geral', 'confidence': 0.9,
+                              'requires_clarification': False, 'context': {}})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def resolve_expected(value, today):
+    """Datas relativas do corpus ("hoje-1", "dia-12") em ISO; os demais valores como estão"""
+    if value.startswith('hoje'):
+        return (today + timedelta(days=int(value[4:] or 0))).isoformat()
+    if value.startswith('dia-'):
+        return last_day_of_month(int(value[4:]), today).isoformat()
+    return value
+
+def as_text(value):
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+def module_extraction(router, intent, nlp_result):
+    """Campos que o módulo da intenção extrai da mensagem (sem banco nem resposta)"""
+    module = router.modules.get(intent)
+    text, parsed, entities = nlp_result['text'], nlp_result['parsed'], nlp_result['entities']
+    
+    if intent in ('cadastro_prestador', 'busca_prestador'):
+        return {'specialty': module._extract_specialty(parsed), 'location': module._extract_location(entities, text)}
+    if intent == 'venda_produto':
+        return module._extract_product_info(text, parsed, entities)
+    if intent == 'busca_produto':
+        return dict(module._extract_search_filters(parsed, entities), term=module._extract_search_term(text))
+    if intent == 'conexao_pessoal':
+        if module._is_registration(parsed):
+            return module._extract_profile_info(text, parsed, entities)
+        return module._extract_search_criteria(parsed, entities)
+    if intent == 'achado_perdido':
+        tipo = 'perdido' if module._is_lost_item(parsed) else 'encontrado' if module._is_found_item(parsed) else None
+        return module._extract_item_info(text, parsed, entities, tipo)
+    if intent == 'reclamacao':
+        return module._extract_complaint_info(text, parsed, entities)
+    if intent == 'bolsa_estudo':
+        return module._extract_search_criteria(parsed)
+    
+    return None
+
+def evaluate(corpus, nlp, router, stub, oracle, default_intent, today, verbose):
+    """Uma passada por process_message: intenção, fallback, entidades e campos"""
+    report = {
+        'intents': defaultdict(Counter),
+        'entities': defaultdict(Counter),
+        'fields': defaultdict(Counter),
+        'total': Counter(),
+        'errors': []
+    }
+    
+    for sample in corpus:
+        label = sample['intent']
+        stub.intent = label if oracle else default_intent
+        calls = stub.calls
+        
+        result = nlp.process_message(sample['text'])
+        fallback = stub.calls > calls
+        correct = result.get('intent') == label
+        
+        report['total']['mensagens'] += 1
+        report['total']['corretas'] += correct
+        report['total']['fallback'] += fallback
+        report['total']['locais'] += not fallback
+        report['total']['locais_corretas'] += correct and not fallback
+        report['intents'][label]['mensagens'] += 1
+        report['intents'][label]['corretas'] += correct
+        report['intents'][label]['fallback'] += fallback
+        
+        if not correct:
+            report['errors'].append((sample['id'], label, result.get('intent'), 'openai' if fallback else result.get('intent_source', 'padrao')))
+        
+        # Entidades: esperadas encontradas (recall) e extraídas não esperadas (precisão)
+        expected_entities = {tipo: {resolve_expected(v, today) for v in values}
+                             for tipo, values in sample.get('entities', {}).items()}
+        for tipo, values in result.get('entities', {}).items():
+            if tipo == 'localizacao_id':
+                continue
+            for value in values:
+                hit = value in expected_entities.get(tipo, ())
+                report['entities'][tipo]['extraidas'] += 1
+                report['entities'][tipo]['corretas'] += hit
+                if not hit and verbose:
+                    print(f"  entidade inesperada {sample['id']}: {tipo}={value}")
+        for tipo, values in expected_entities.items():
+            report['entities'][tipo]['esperadas'] += len(values)
+            missing = values - set(result.get('entities', {}).get(tipo, ()))
+            report['entities'][tipo]['encontradas'] += len(values) - len(missing)
+            if missing and verbose:
+                print(f"  entidade não encontrada {sample['id']}: {tipo}={sorted(missing)}")
+        
+        # Campos dos módulos, com a intenção do rótulo (independe da detecção)
+        expected_fields = sample.get('fields', {})
+        if expected_fields:
+            nlp_result = {'text': sample['text'], 'parsed': result['parsed'], 'entities': result.get('entities', {})}
+            extracted = module_extraction(router, label, nlp_result) or {}
+            for field, value in expected_fields.items():
+                hit = as_text(extracted.get(field)) == resolve_expected(value, today)
+                report['fields'][label]['esperados'] += 1
+                report['fields'][label]['corretos'] += hit
+                if not hit and verbose:
+                    print(f"  campo {sample['id']}: {field}={as_text(extracted.get(field))!r}, esperado {value!r}")
+    
+    return report
+
+def time_stages(corpus, nlp, router, repeat):
+    """Latência de cada etapa, mensagem a mensagem, em repeat passadas pelo corpus"""
+    timings = {stage: [] for stage in STAGES}
+    clock = time.perf_counter
+    
+    for _ in range(repeat):
+        for sample in corpus:
+            text = sample['text']
+            
+            start = clock()
+            normalized = nlp._correct_spelling(nlp._normalize_text(text))
+            timings['normalizacao'].append(clock() - start)
+            
+            start = clock()
+            parsed = ParsedMessage(text, normalized)
+            timings['tokens_palavras_chave'].append(clock() - start)
+            
+            start = clock()
+            nlp._quick_pattern_detection(normalized)
+            timings['deteccao_rapida'].append(clock() - start)
+            
+            start = clock()
+            spans = nlp._extract_entity_spans(normalized, text)
+            entities = nlp._extract_entities(normalized, spans)
+            timings['entidades'].append(clock() - start)
+            
+            parsed.spans = spans
+            start = clock()
+            module_extraction(router, sample['intent'], {'text': text, 'parsed': parsed, 'entities': entities})
+            timings['extracao_modulos'].append(clock() - start)
+    
+    return timings
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def summarize_timings(timings):
+    summary = {}
+    
+    for stage, values in timings.items():
+        total = sum(values)
+        values = sorted(values)
+        summary[stage] = {
+            'mensagens_por_segundo': len(values) / total if total else 0.0,
+            'media_us': total / len(values) * 1e6,
+            'p50_us': percentile(values, 0.50) * 1e6,
+            'p95_us': percentile(values, 0.95) * 1e6,
+            'p99_us': percentile(values, 0.99) * 1e6
+        }
+    
+    return summary
+
+def ratio(part, whole):
+    return part / whole if whole else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='arquivo JSONL do corpus rotulado')
+    parser.add_argument('--repeat', type=int, default=20, help='passadas pelo corpus na medição das etapas')
+    parser.add_argument('--oracle', action='store_true', help='o stub do OpenAI responde a intenção do rótulo')
+    parser.add_argument('--openai-intent', default='pesquisa_geral', help='intenção respondida pelo stub (sem --oracle)')
+    parser.add_argument('--classifier', default=None, help='modelo do classificador local (padrão: INTENT_CLASSIFIER_PATH)')
+    parser.add_argument('--spelling', default=None, help='dicionário ortográfico (padrão: SPELLING_DICTIONARY_PATH)')
+    parser.add_argument('--json', dest='json_path', default=None, help='grava o relatório neste arquivo')
+    parser.add_argument('--verbose', action='store_true', help='lista entidades e campos divergentes')
+    args = parser.parse_args()
+    
+    corpus = load_corpus(args.corpus)
+    app = create_app('development')
+    
+    if args.classifier:
+        app.config['INTENT_CLASSIFIER_PATH'] = args.classifier
+        init_intent_classifier(app)
+    if args.spelling:
+        app.config['SPELLING_DICTIONARY_PATH'] = args.spelling
+        init_spelling_corrector(app)
+    
+    stub = StubOpenAIClient(args.openai_intent)
+    app.extensions['openai_client'] = stub
+    
+    with app.app_context():
+        nlp = get_nlp_processor()
+        router = get_message_router()
+        today = date.today()
+        
+        report = evaluate(corpus, nlp, router, stub, args.oracle, args.openai_intent, today, args.verbose)
+        stages = summarize_timings(time_stages(corpus, nlp, router, args.repeat))
+    
+    total = report['total']
+    print(f"Corpus: {args.corpus} ({total['mensagens']} mensagens, stub do OpenAI: "
+          f"{'rótulo' if args.oracle else args.openai_intent})")
+    print(f"Acurácia: {ratio(total['corretas'], total['mensagens']):.1%}  "
+          f"local: {ratio(total['locais_corretas'], total['locais']):.1%} de {total['locais']}  "
+          f"fallback para o OpenAI: {ratio(total['fallback'], total['mensagens']):.1%}")
+    
+    print('\nIntenção               Msgs  Acurácia  Fallback')
+    for intent, counts in sorted(report['intents'].items()):
+        print(f"{intent:<22} {counts['mensagens']:>4}  {ratio(counts['corretas'], counts['mensagens']):>8.1%}  "
+              f"{ratio(counts['fallback'], counts['mensagens']):>8.1%}")
+    
+    print('\nEntidade       Esperadas  Precisão    Recall')
+    for tipo, counts in sorted(report['entities'].items()):
+        print(f"{tipo:<14} {counts['esperadas']:>9}  {ratio(counts['corretas'], counts['extraidas']):>8.1%}  "
+              f"{ratio(counts['encontradas'], counts['esperadas']):>8.1%}")
+    
+    print('\nCampos dos módulos     Esperados  Corretos')
+    for intent, counts in sorted(report['fields'].items()):
+        print(f"{intent:<22} {counts['esperados']:>9}  {ratio(counts['corretos'], counts['esperados']):>8.1%}")
+    
+    print(f'\nEtapa                   msgs/s     média       p50       p95       p99  (us, {args.repeat} passadas)')
+    for stage in STAGES:
+        row = stages[stage]
+        print(f"{stage:<22} {row['mensagens_por_segundo']:>7.0f}  {row['media_us']:>8.1f}  {row['p50_us']:>8.1f}  "
+              f"{row['p95_us']:>8.1f}  {row['p99_us']:>8.1f}")
+    
+    if args.verbose and report['errors']:
+        print('\nIntenções erradas (id, esperada, detectada, origem):')
+        for error in report['errors']:
+            print('  ' + ', '.join(str(item) for item in error))
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'corpus': os.path.basename(args.corpus),
+                'oracle': args.oracle,
+                'total': dict(total),
+                'intents': {intent: dict(counts) for intent, counts in report['intents'].items()},
+                'entities': {tipo: dict(counts) for tipo, counts in report['entities'].items()},
+                'fields': {intent: dict(counts) for intent, counts in report['fields'].items()},
+                'stages': stages
+            }, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
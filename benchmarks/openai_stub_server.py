@@ -0,0 +1,95 @@
+"""Servidor local que imita /v1/chat/completions do OpenAI
+
+Responde sempre a mesma classificação (um array para prompts em lote), com
+atraso e taxa de erros configuráveis, para exercitar prazo, disjuntor, hedge
+e micro-lotes do cliente OpenAI sem chamar a API real. Aponte a aplicação para ele com
+OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+
+Uso: python benchmarks/openai_stub_server.py [--delay-ms 200] [--slow-rate 0.1] [--error-rate 0.2]
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_LINE = re.compile(r'^\d+\. "', re.MULTILINE)
+
+def make_handler(args):
+    lock = threading.Lock()
+    counter = {'requests': 0}
+    
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            prompt = ' '.join(m.get('content', '') for m in request.get('messages', []))
+            
+            with lock:
+                counter['requests'] += 1
+                number = counter['requests']
+            
+            delay = args.slow_ms if random.random() < args.slow_rate else args.delay_ms
+            time.sleep(delay / 1000.0)
+            
+            if random.random() < args.error_rate:
+                self._send(500, {'error': {'message': 'erro simulado', 'type': 'server_error'}})
+                return
+            
+            classification = {'intent': args.intent, 'category': 'geral', 'confidence': 0.9,
+                              'requires_clarification': False, 'context': {}}
+            
+            # Prompt de micro-lote: um objeto por mensagem numerada
+            batch_size = len(BATCH_LINE.findall(prompt))
+            if batch_size:
+                content = json.dumps([dict(classification, index=i) for i in range(1, batch_size + 1)])
+            else:
+                content = json.dumps(classification)
+            self._send(200, {
+                'id': f'chatcmpl-stub-{number}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': 'gpt-3.5-turbo',
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            })
+        
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+    
+    return StubHandler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay-ms', type=float, default=200, help='atraso normal das respostas')
+    parser.add_argument('--slow-ms', type=float, default=10000, help='atraso das respostas lentas')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='fração de respostas lentas')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas 500')
+    parser.add_argument('--intent', default='pesquisa_geral', help='intenção devolvida')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f'Servidor stub do OpenAI em http://{args.host}:{args.port}/v1')
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""whatsapp_message_id em conversas
+
+Revision ID: 3f1c2a9d7b10
+Revises: 
+Create Date: 2026-10-17 03:20:00
+
+Bancos criados antes da deduplicação por wamid não têm a coluna: o
+db.create_all() só cria tabelas novas, não altera as existentes. Em bancos
+novos a coluna já vem do create_all, por isso a migração confere antes.
+Sem Flask-Migrate, o equivalente é:
+
+    ALTER TABLE conversas ADD COLUMN whatsapp_message_id VARCHAR(100);
+    CREATE UNIQUE INDEX ix_conversas_whatsapp_message_id ON conversas (whatsapp_message_id);
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('conversas')}
+    indexes = {index['name'] for index in inspector.get_indexes('conversas')}
+
+    if 'whatsapp_message_id' not in columns:
+        op.add_column('conversas', sa.Column('whatsapp_message_id', sa.String(length=100), nullable=True))
+
+    if 'ix_conversas_whatsapp_message_id' not in indexes:
+        op.create_index('ix_conversas_whatsapp_message_id', 'conversas', ['whatsapp_message_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_conversas_whatsapp_message_id', table_name='conversas')
+    op.drop_column('conversas', 'whatsapp_message_id')
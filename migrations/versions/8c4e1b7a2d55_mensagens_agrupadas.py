@@ -0,0 +1,45 @@
+"""mensagens agrupadas
+
+Revision ID: 8c4e1b7a2d55
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-17 05:10:00
+
+wamids das mensagens unidas em rajadas a uma conversa. Em bancos novos a
+tabela já vem do create_all, por isso a migração confere antes. Sem
+Flask-Migrate, o equivalente é:
+
+    CREATE TABLE mensagens_agrupadas (
+        whatsapp_message_id VARCHAR(100) NOT NULL PRIMARY KEY,
+        conversa_id INTEGER NOT NULL REFERENCES conversas (id)
+    );
+    CREATE INDEX ix_mensagens_agrupadas_conversa_id ON mensagens_agrupadas (conversa_id);
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e1b7a2d55'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'mensagens_agrupadas' not in inspector.get_table_names():
+        op.create_table(
+            'mensagens_agrupadas',
+            sa.Column('whatsapp_message_id', sa.String(length=100), nullable=False),
+            sa.Column('conversa_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['conversa_id'], ['conversas.id']),
+            sa.PrimaryKeyConstraint('whatsapp_message_id')
+        )
+        op.create_index('ix_mensagens_agrupadas_conversa_id', 'mensagens_agrupadas', ['conversa_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_mensagens_agrupadas_conversa_id', table_name='mensagens_agrupadas')
+    op.drop_table('mensagens_agrupadas')
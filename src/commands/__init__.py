@@ -0,0 +1,12 @@
+from flask import Flask
+from .replay import replay_webhooks
+from .train_classifier import train_intent_classifier
+from .reclassify import reclassify_conversas
+from .spelling_dictionary import build_spelling_dictionary
+
+def register_commands(app: Flask):
+    """Registra os comandos de linha de comando (flask <comando>)"""
+    app.cli.add_command(replay_webhooks)
+    app.cli.add_command(train_intent_classifier)
+    app.cli.add_command(reclassify_conversas)
+    app.cli.add_command(build_spelling_dictionary)
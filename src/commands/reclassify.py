@@ -0,0 +1,192 @@
+import os
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models import db, Conversa, ReclassificacaoConversa
+from src.modules.intent_classifier import NaiveBayesIntentClassifier
+from src.modules.nlp_processor import NLPProcessor
+from src.modules.parsed_message import normalize_text
+from src.modules.registry import get_nlp_processor
+from src.modules.spelling import SpellingCorrector
+
+# Estado de cada processo do pool (criado no inicializador)
+_worker: Dict[str, Any] = {}
+
+def init_worker(classifier_path: Optional[str], threshold: float, spelling_path: Optional[str] = None):
+    """Prepara o NLPProcessor, o classificador local e o corretor ortográfico no processo do pool"""
+    _worker['nlp'] = NLPProcessor()
+    _worker['classifier'] = NaiveBayesIntentClassifier.load(classifier_path) if classifier_path else None
+    _worker['threshold'] = threshold
+    _worker['speller'] = SpellingCorrector.load(spelling_path) if spelling_path else None
+
+def classify_chunk(rows: List[Tuple[int, str, Optional[str]]]) -> List[Dict[str, Any]]:
+    """Etapas de padrões e classificador local para um bloco de conversas"""
+    nlp = _worker['nlp']
+    speller = _worker['speller']
+    results = []
+    
+    for conversa_id, message, previous in rows:
+        text = normalize_text(message)
+        if speller is not None:
+            text = speller.correct(text)
+        
+        detection = nlp.detect_intent_locally(text, _worker['classifier'], _worker['threshold'])
+        detection = detection or {}
+        
+        results.append({
+            'conversa_id': conversa_id,
+            'mensagem': message,
+            'texto': text,
+            'intencao_anterior': previous,
+            'intencao_nova': detection.get('intent'),
+            'tipo_comando': detection.get('command_type'),
+            'categoria': detection.get('category'),
+            'confianca': detection.get('confidence'),
+            'origem': detection.get('intent_source', 'nenhuma')
+        })
+    
+    return results
+
+def iter_chunks(chunk_size: int, start_id: int, limit: int) -> Iterator[List[Tuple[int, str, Optional[str]]]]:
+    """Conversas em blocos por faixa de id (paginação por chave, memória constante)"""
+    last_id = start_id
+    remaining = limit or None
+    
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        rows = Conversa.query.with_entities(
+            Conversa.id, Conversa.mensagem_usuario, Conversa.intencao_detectada
+        ).filter(Conversa.id > last_id).order_by(Conversa.id).limit(size).all()
+        
+        if not rows:
+            return
+        
+        last_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+        
+        yield [tuple(row) for row in rows]
+
+def iter_classified(chunks: Iterator[List], workers: int, classifier_path: Optional[str],
+                    threshold: float, spelling_path: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Classifica os blocos no pool, na ordem, com no máximo 2 blocos por processo em andamento"""
+    if workers <= 0:
+        init_worker(classifier_path, threshold, spelling_path)
+        for chunk in chunks:
+            yield classify_chunk(chunk)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(classifier_path, threshold, spelling_path)) as pool:
+        pending = deque()
+        
+        for chunk in chunks:
+            pending.append(pool.submit(classify_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        
+        while pending:
+            yield pending.popleft().result()
+
+@click.command('reclassify-conversas')
+@click.option('--chunk-size', default=1000, type=int, help='Conversas por bloco lido e gravado')
+@click.option('--workers', default=None, type=int, help='Processos para padrões e classificador local (0 = no processo atual)')
+@click.option('--start-id', default=0, type=int, help='Começa depois deste id de conversa')
+@click.option('--limit', default=0, type=int, help='Máximo de conversas (0 = todas)')
+@click.option('--classifier', 'classifier_path', default=None, help='Modelo local (padrão: INTENT_CLASSIFIER_PATH; "none" desliga)')
+@click.option('--threshold', default=None, type=float, help='Limiar do classificador local (padrão: INTENT_CLASSIFIER_THRESHOLD)')
+@click.option('--spelling', 'spelling_path', default=None, help='Dicionário ortográfico (padrão: SPELLING_DICTIONARY_PATH; "none" desliga)')
+@click.option('--openai/--no-openai', 'use_openai', default=False, help='Envia ao OpenAI as mensagens sem classificação local')
+@click.option('--openai-rate', default=2.0, type=float, help='Máximo de chamadas ao OpenAI por segundo')
+@click.option('--run-id', default=None, help='Identificador da execução na tabela de resultados')
+@click.option('--top', default=20, type=int, help='Mudanças de intenção mais frequentes no relatório')
+@with_appcontext
+def reclassify_conversas(chunk_size, workers, start_id, limit, classifier_path, threshold, spelling_path,
+                         use_openai, openai_rate, run_id, top):
+    """Reclassifica o histórico de Conversa com os padrões e modelos atuais
+    
+    Os resultados vão para reclassificacoes_conversa (a conversa original não
+    é alterada) e o relatório compara a nova intenção com intencao_detectada.
+    As conversas são lidas, classificadas e gravadas em blocos, então a
+    memória não cresce com o tamanho do histórico.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    threshold = threshold if threshold is not None else current_app.config.get('INTENT_CLASSIFIER_THRESHOLD', 0.9)
+    classifier_path = classifier_path or current_app.config.get('INTENT_CLASSIFIER_PATH')
+    if classifier_path == 'none' or (classifier_path and not os.path.exists(classifier_path)):
+        classifier_path = None
+    spelling_path = spelling_path or current_app.config.get('SPELLING_DICTIONARY_PATH')
+    if spelling_path == 'none' or (spelling_path and not os.path.exists(spelling_path)):
+        spelling_path = None
+    
+    run_id = run_id or f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    db.create_all()
+    
+    nlp_processor = get_nlp_processor() if use_openai else None
+    openai_interval = 1.0 / openai_rate if openai_rate > 0 else 0.0
+    next_openai_call = 0.0
+    
+    total = 0
+    changed = 0
+    sources = Counter()
+    transitions = Counter()
+    started = time.monotonic()
+    
+    click.echo(f'Execução {run_id} (workers: {workers}, classificador local: {classifier_path or "desligado"}, '
+               f'dicionário ortográfico: {spelling_path or "desligado"})')
+    
+    for results in iter_classified(iter_chunks(chunk_size, start_id, limit), workers, classifier_path, threshold,
+                                   spelling_path):
+        for result in results:
+            message = result.pop('mensagem')
+            text = result.pop('texto')
+            
+            if nlp_processor is not None and result['intencao_nova'] is None and message:
+                wait = next_openai_call - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                next_openai_call = time.monotonic() + openai_interval
+                
+                analysis = nlp_processor.analyze_with_openai(message, text)
+                if analysis and analysis.get('intent'):
+                    result.update({
+                        'intencao_nova': analysis['intent'],
+                        'tipo_comando': analysis.get('command_type'),
+                        'categoria': analysis.get('category'),
+                        'confianca': analysis.get('confidence'),
+                        'origem': 'openai'
+                    })
+            
+            result['execucao_id'] = run_id
+            result['alterada'] = result['intencao_nova'] != result['intencao_anterior']
+            
+            total += 1
+            sources[result['origem']] += 1
+            if result['alterada']:
+                changed += 1
+                transitions[(result['intencao_anterior'], result['intencao_nova'])] += 1
+        
+        db.session.bulk_insert_mappings(ReclassificacaoConversa, results)
+        db.session.commit()
+        
+        elapsed = time.monotonic() - started
+        click.echo(f'  {total} conversas ({total / elapsed if elapsed else 0:.0f}/s), {changed} alteradas')
+    
+    if not total:
+        click.echo('Nenhuma conversa encontrada')
+        return
+    
+    click.echo(f'Total: {total}, alteradas: {changed} ({changed / total:.1%})')
+    click.echo('Origem da nova intenção:')
+    for source, count in sources.most_common():
+        click.echo(f'  {source}: {count} ({count / total:.1%})')
+    
+    click.echo('Mudanças mais frequentes (anterior -> nova):')
+    for (previous, new), count in transitions.most_common(top):
+        click.echo(f'  {previous} -> {new}: {count}')
@@ -0,0 +1,157 @@
+import copy
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import click
+import requests
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models import db, Conversa
+from src.modules.webhook_recorder import read_recordings
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil pelo método nearest-rank"""
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+
+    return ordered[min(index, len(ordered) - 1)]
+
+def rewrite_message_ids(payload: Dict[str, Any], run_id: str) -> List[str]:
+    """Torna os IDs das mensagens únicos por execução
+
+    Sem isso, a deduplicação descartaria as mensagens já processadas em uma
+    reprodução anterior. Retorna os novos IDs.
+    """
+    message_ids = []
+
+    for entry in payload.get('entry', []):
+        for change in entry.get('changes', []):
+            for message in change.get('value', {}).get('messages', []):
+                if message.get('id'):
+                    message['id'] = f"{message['id']}.replay-{run_id}"
+                    message_ids.append(message['id'])
+
+    return message_ids
+
+def _format_ms(value: Optional[float]) -> str:
+    return '-' if value is None else f'{value:.0f} ms'
+
+@click.command('replay-webhooks')
+@click.argument('paths', nargs=-1, required=True)
+@click.option('--url', default=None, help='URL do webhook (padrão: aplicação local em processo)')
+@click.option('--rate', default=0.0, type=float, help='Requisições por segundo (0 = intervalos originais)')
+@click.option('--speed', default=1.0, type=float, help='Multiplicador dos intervalos originais quando --rate é 0')
+@click.option('--concurrency', default=4, type=int, help='Requisições simultâneas')
+@click.option('--limit', default=0, type=int, help='Máximo de requisições reproduzidas (0 = todas)')
+@click.option('--wait', 'wait_seconds', default=30, type=int, help='Segundos para aguardar o processamento assíncrono')
+@with_appcontext
+def replay_webhooks(paths, url, rate, speed, concurrency, limit, wait_seconds):
+    """Reproduz webhooks gravados e mede vazão e latência
+
+    PATHS são arquivos .jsonl.gz (ou diretórios) gerados com WEBHOOK_RECORD_DIR.
+    As latências de processamento vêm de Conversa.tempo_resposta_ms, então o
+    banco configurado deve ser o mesmo da aplicação que recebe as requisições.
+    """
+    records = read_recordings(list(paths))
+    if limit:
+        records = records[:limit]
+
+    if not records:
+        click.echo('Nenhum registro encontrado.')
+        return
+
+    run_id = str(int(time.time()))
+    app = current_app._get_current_object()
+    local_client = threading.local()
+
+    http_latencies = []
+    message_ids = []
+    errors = []
+    results_lock = threading.Lock()
+
+    def post(payload):
+        request_start = time.perf_counter()
+
+        try:
+            if url:
+                status = requests.post(url, json=payload, timeout=60).status_code
+            else:
+                if not hasattr(local_client, 'client'):
+                    local_client.client = app.test_client()
+                status = local_client.client.post('/webhook/whatsapp', json=payload).status_code
+        except Exception as e:
+            status = str(e)
+
+        elapsed_ms = (time.perf_counter() - request_start) * 1000
+
+        with results_lock:
+            http_latencies.append(elapsed_ms)
+            if status != 200:
+                errors.append(status)
+
+    first_recorded = records[0].get('t', 0)
+    replay_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix='replay') as executor:
+        for i, record in enumerate(records):
+            payload = copy.deepcopy(record['payload'])
+            message_ids.extend(rewrite_message_ids(payload, run_id))
+
+            # Agenda pelo ritmo fixo ou pelos intervalos originais da gravação
+            if rate > 0:
+                offset = i / rate
+            else:
+                offset = (record.get('t', first_recorded) - first_recorded) / max(speed, 0.001)
+
+            delay = replay_start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            executor.submit(post, payload)
+
+    send_duration = time.perf_counter() - replay_start
+
+    # No modo assíncrono as mensagens ainda podem estar na fila
+    processing_times = _collect_processing_times(message_ids, wait_seconds)
+    total_duration = time.perf_counter() - replay_start
+
+    click.echo(f'Requisições: {len(records)} ({len(errors)} com erro)')
+    click.echo(f'Mensagens: {len(message_ids)} enviadas, {len(processing_times)} processadas')
+    click.echo(f'Duração: envio {send_duration:.2f}s, total {total_duration:.2f}s')
+    click.echo(f'Vazão: {len(records) / max(send_duration, 0.001):.1f} req/s, '
+               f'{len(processing_times) / max(total_duration, 0.001):.1f} mensagens processadas/s')
+    click.echo('Latência HTTP: ' + ', '.join(
+        f'p{p} {_format_ms(percentile(http_latencies, p))}' for p in (50, 95, 99)))
+    click.echo('tempo_resposta_ms: ' + ', '.join(
+        f'p{p} {_format_ms(percentile(processing_times, p))}' for p in (50, 95, 99)))
+
+    if errors:
+        click.echo(f'Erros (amostra): {errors[:5]}')
+
+def _collect_processing_times(message_ids: List[str], wait_seconds: int) -> List[int]:
+    """Busca tempo_resposta_ms das conversas geradas pela reprodução"""
+    deadline = time.monotonic() + wait_seconds
+    expected = len(message_ids)
+    times = []
+
+    while True:
+        # Encerra a transação anterior para enxergar as conversas gravadas pelos workers
+        db.session.rollback()
+        times = []
+        # Consulta em blocos para não estourar o limite de parâmetros do banco
+        for start in range(0, expected, 500):
+            chunk = message_ids[start:start + 500]
+            rows = Conversa.query.with_entities(Conversa.tempo_resposta_ms).filter(
+                Conversa.whatsapp_message_id.in_(chunk)
+            ).all()
+            times.extend(row.tempo_resposta_ms for row in rows if row.tempo_resposta_ms is not None)
+
+        if len(times) >= expected or time.monotonic() >= deadline:
+            return times
+
+        time.sleep(1)
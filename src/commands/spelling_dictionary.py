@@ -0,0 +1,94 @@
+import os
+from collections import Counter
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models import Conversa
+from src.modules.intent_classifier import NaiveBayesIntentClassifier
+from src.modules.nlp_processor import NLPProcessor
+from src.modules.parsed_message import normalize_text
+from src.modules.spelling import WORD, SpellingCorrector
+
+@click.command('build-spelling-dictionary')
+@click.option('--output', default=None, help='Arquivo do dicionário (padrão: SPELLING_DICTIONARY_PATH)')
+@click.option('--min-count', default=3, type=int, help='Ocorrências mínimas para uma palavra ser sugerida')
+@click.option('--dominance', default=20, type=int, help='Quantas vezes o candidato precisa ser mais frequente que uma palavra conhecida')
+@click.option('--max-words', default=100000, type=int, help='Máximo de palavras no dicionário, das mais frequentes')
+@click.option('--limit', default=0, type=int, help='Máximo de conversas lidas, das mais recentes (0 = todas)')
+@click.option('--sample', default=5000, type=int, help='Conversas recentes usadas no relatório de fallback')
+@click.option('--top', default=20, type=int, help='Correções mais frequentes no relatório')
+@with_appcontext
+def build_spelling_dictionary(output, min_count, dominance, max_words, limit, sample, top):
+    """Monta o dicionário ortográfico com as palavras de Conversa.mensagem_usuario
+    
+    Depois mede, nas conversas mais recentes, quantas mensagens iriam para o
+    OpenAI (sem padrão nem classificação local acima do limiar) sem e com a
+    correção, e mostra as correções mais frequentes.
+    """
+    output = output or current_app.config.get('SPELLING_DICTIONARY_PATH')
+    if not output:
+        raise click.UsageError('Informe --output ou configure SPELLING_DICTIONARY_PATH')
+    
+    query = Conversa.query.with_entities(Conversa.mensagem_usuario).filter(
+        Conversa.mensagem_usuario.isnot(None)
+    ).order_by(Conversa.timestamp.desc())
+    
+    if limit:
+        query = query.limit(limit)
+    
+    counts = Counter()
+    messages = 0
+    recent = []
+    
+    for (message,) in query.yield_per(1000):
+        text = normalize_text(message)
+        counts.update(word for word in text.split() if WORD.match(word))
+        messages += 1
+        if len(recent) < sample and text:
+            recent.append(text)
+    
+    if not counts:
+        raise click.ClickException('Nenhuma mensagem encontrada para montar o dicionário')
+    
+    corrector = SpellingCorrector(dict(counts.most_common(max_words)), min_count, dominance)
+    corrector.save(output)
+    
+    click.echo(f'{messages} conversas, {len(counts)} palavras distintas')
+    click.echo(f'Dicionário com {len(corrector.counts)} palavras ({len(corrector.seed)} do vocabulário base) salvo em {output}')
+    
+    classifier_path = current_app.config.get('INTENT_CLASSIFIER_PATH')
+    classifier = NaiveBayesIntentClassifier.load(classifier_path) if classifier_path and os.path.exists(classifier_path) else None
+    threshold = current_app.config.get('INTENT_CLASSIFIER_THRESHOLD', 0.9)
+    nlp = NLPProcessor()
+    
+    fallback_before = 0
+    fallback_after = 0
+    corrected_messages = 0
+    corrections = Counter()
+    
+    for text in recent:
+        words = text.split()
+        fixed = [corrector.correct_word(word) for word in words]
+        corrected = ' '.join(fixed)
+        
+        if corrected != text:
+            corrected_messages += 1
+            corrections.update((word, fix) for word, fix in zip(words, fixed) if word != fix)
+        
+        if nlp.detect_intent_locally(text, classifier, threshold) is None:
+            fallback_before += 1
+        if nlp.detect_intent_locally(corrected, classifier, threshold) is None:
+            fallback_after += 1
+    
+    total = len(recent)
+    if not total:
+        return
+    
+    click.echo(f'Conversas avaliadas: {total} ({corrected_messages / total:.1%} com correções, '
+               f'classificador local: {"sim" if classifier else "não"})')
+    click.echo(f'Fallback para o OpenAI: {fallback_before / total:.1%} sem correção, {fallback_after / total:.1%} com correção '
+               f'({(fallback_before - fallback_after) / total * 100:.1f} pontos percentuais a menos)')
+    
+    click.echo('Correções mais frequentes:')
+    for (word, fix), count in corrections.most_common(top):
+        click.echo(f'  {word} -> {fix}: {count}')
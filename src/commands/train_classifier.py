@@ -0,0 +1,85 @@
+import zlib
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models import Conversa
+from src.modules.intent_classifier import NaiveBayesIntentClassifier, evaluate
+from src.modules.parsed_message import normalize_text
+
+# Intenções que não servem de rótulo (falhas e respostas a botões)
+IGNORED_INTENTS = ('unknown', 'error', 'resposta_botao')
+
+REPORT_THRESHOLDS = (0.5, 0.7, 0.8, 0.9, 0.95, 0.99)
+
+def is_test_sample(text: str, test_fraction: float) -> bool:
+    """Separação treino/teste determinística pelo texto (repetições ficam do mesmo lado)"""
+    return zlib.crc32(text.encode('utf-8')) % 1000 < test_fraction * 1000
+
+@click.command('train-intent-classifier')
+@click.option('--output', default=None, help='Arquivo do modelo (padrão: INTENT_CLASSIFIER_PATH)')
+@click.option('--threshold', default=None, type=float, help='Limiar avaliado no relatório (padrão: INTENT_CLASSIFIER_THRESHOLD)')
+@click.option('--test-fraction', default=0.2, type=float, help='Fração das mensagens reservada para avaliação')
+@click.option('--min-samples', default=5, type=int, help='Mínimo de exemplos para uma intenção entrar no modelo')
+@click.option('--limit', default=0, type=int, help='Máximo de conversas usadas, das mais recentes (0 = todas)')
+@with_appcontext
+def train_intent_classifier(output, threshold, test_fraction, min_samples, limit):
+    """Treina o classificador local de intenções com o histórico de Conversa
+    
+    Os rótulos são as intenções já detectadas (padrões e OpenAI). O modelo é
+    avaliado nas mensagens reservadas e depois treinado com todas; o relatório
+    mostra a acurácia das respostas locais e a taxa de fallback para o OpenAI
+    em cada limiar.
+    """
+    output = output or current_app.config.get('INTENT_CLASSIFIER_PATH')
+    if not output:
+        raise click.UsageError('Informe --output ou configure INTENT_CLASSIFIER_PATH')
+    
+    threshold = threshold if threshold is not None else current_app.config.get('INTENT_CLASSIFIER_THRESHOLD', 0.9)
+    
+    query = Conversa.query.with_entities(Conversa.mensagem_usuario, Conversa.intencao_detectada).filter(
+        Conversa.mensagem_usuario.isnot(None),
+        Conversa.intencao_detectada.isnot(None),
+        Conversa.intencao_detectada.notin_(IGNORED_INTENTS)
+    ).order_by(Conversa.timestamp.desc())
+    
+    if limit:
+        query = query.limit(limit)
+    
+    samples = []
+    for message, intent in query:
+        text = normalize_text(message)
+        if text:
+            samples.append((text, intent))
+    
+    counts = {}
+    for _, intent in samples:
+        counts[intent] = counts.get(intent, 0) + 1
+    
+    samples = [(text, intent) for text, intent in samples if counts[intent] >= min_samples]
+    if not samples:
+        raise click.ClickException('Nenhuma conversa rotulada suficiente para treinar')
+    
+    train = [sample for sample in samples if not is_test_sample(sample[0], test_fraction)]
+    test = [sample for sample in samples if is_test_sample(sample[0], test_fraction)]
+    
+    click.echo(f'Exemplos: {len(samples)} ({len(train)} treino, {len(test)} teste)')
+    for intent in sorted(counts, key=counts.get, reverse=True):
+        marker = '' if counts[intent] >= min_samples else ' (ignorada)'
+        click.echo(f'  {intent}: {counts[intent]}{marker}')
+    
+    if train and test:
+        model = NaiveBayesIntentClassifier().fit(*zip(*train))
+        texts, labels = [text for text, _ in test], [intent for _, intent in test]
+        thresholds = sorted(set(REPORT_THRESHOLDS) | {threshold})
+        
+        click.echo('Limiar  Acurácia  Fallback')
+        for row in evaluate(model, texts, labels, thresholds):
+            marker = '  <- configurado' if row['threshold'] == threshold else ''
+            click.echo(f"{row['threshold']:>6.2f}  {row['accuracy']:>8.1%}  {row['fallback_rate']:>8.1%}{marker}")
+    else:
+        click.echo('Poucos exemplos para avaliar; treinando sem relatório')
+    
+    model = NaiveBayesIntentClassifier().fit(*zip(*samples))
+    model.save(output)
+    
+    click.echo(f'Modelo com {len(model.labels)} intenções salvo em {output}')
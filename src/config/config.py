@@ -20,13 +20,115 @@ class Config:
     WHATSAPP_PHONE_NUMBER_ID = os.environ.get('WHATSAPP_PHONE_NUMBER_ID')
     WHATSAPP_VERIFY_TOKEN = os.environ.get('WHATSAPP_VERIFY_TOKEN')
     WHATSAPP_WEBHOOK_URL = os.environ.get('WHATSAPP_WEBHOOK_URL')
+    # Prazo máximo de cada chamada à Graph API (segundos; encurtado pelo orçamento da mensagem)
+    WHATSAPP_TIMEOUT = float(os.environ.get('WHATSAPP_TIMEOUT', 10.0))
     
     # Configurações do OpenAI
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+    # URL alternativa da API (proxy ou servidor de teste local)
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')
+    # Prazo total de cada análise (segundos) e novas tentativas feitas pelo SDK dentro dele
+    OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', 8.0))
+    OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', 0))
+    # Disjuntor: nas últimas WINDOW chamadas (mínimo MIN_CALLS), abre com a fração de erros ou de
+    # chamadas acima de SLOW_MS passando do limite; aberto, o NLP usa só padrões por OPEN_SECONDS
+    OPENAI_BREAKER_WINDOW = int(os.environ.get('OPENAI_BREAKER_WINDOW', 20))
+    OPENAI_BREAKER_MIN_CALLS = int(os.environ.get('OPENAI_BREAKER_MIN_CALLS', 5))
+    OPENAI_BREAKER_ERROR_RATE = float(os.environ.get('OPENAI_BREAKER_ERROR_RATE', 0.5))
+    OPENAI_BREAKER_SLOW_MS = float(os.environ.get('OPENAI_BREAKER_SLOW_MS', 5000))
+    OPENAI_BREAKER_SLOW_RATE = float(os.environ.get('OPENAI_BREAKER_SLOW_RATE', 0.5))
+    OPENAI_BREAKER_OPEN_SECONDS = float(os.environ.get('OPENAI_BREAKER_OPEN_SECONDS', 30))
+    # Requisição duplicada quando a primeira passa do p95 recente (no mínimo HEDGE_MIN_DELAY_MS)
+    OPENAI_HEDGE_ENABLED = os.environ.get('OPENAI_HEDGE_ENABLED', 'False').lower() == 'true'
+    OPENAI_HEDGE_MIN_DELAY_MS = float(os.environ.get('OPENAI_HEDGE_MIN_DELAY_MS', 500))
+    # Micro-lotes: classificações pendentes por até WINDOW_MS vão em uma única requisição (0 = desligado)
+    OPENAI_BATCH_WINDOW_MS = int(os.environ.get('OPENAI_BATCH_WINDOW_MS', 0))
+    OPENAI_BATCH_MAX_SIZE = int(os.environ.get('OPENAI_BATCH_MAX_SIZE', 8))
     
     # Configurações do Redis
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Configurações de processamento de mensagens
+    # 'sync' processa no próprio webhook; 'celery' enfileira e responde imediatamente
+    MESSAGE_PROCESSING_MODE = os.environ.get('MESSAGE_PROCESSING_MODE', 'sync')
+    CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or REDIS_URL
+    CELERY_MESSAGE_QUEUE = os.environ.get('CELERY_MESSAGE_QUEUE', 'mensagens')
+    CELERY_TASK_ALWAYS_EAGER = False
+    
+    # Deduplicação de mensagens reenviadas pelo WhatsApp ('memory' ou 'redis')
+    MESSAGE_DEDUP_BACKEND = os.environ.get('MESSAGE_DEDUP_BACKEND', 'memory')
+    MESSAGE_DEDUP_TTL = int(os.environ.get('MESSAGE_DEDUP_TTL', 86400))  # 24h
+    MESSAGE_DEDUP_MAX_SIZE = int(os.environ.get('MESSAGE_DEDUP_MAX_SIZE', 50000))
+    
+    # Ordem por usuário: faixas de threads locais e trava por usuário entre processos ('none' ou 'redis')
+    MESSAGE_LANES = int(os.environ.get('MESSAGE_LANES', 4))
+    CELERY_LANE_QUEUES = int(os.environ.get('CELERY_LANE_QUEUES', 0))  # 0 = fila única
+    USER_LOCK_BACKEND = os.environ.get('USER_LOCK_BACKEND', 'none')
+    USER_LOCK_TIMEOUT = int(os.environ.get('USER_LOCK_TIMEOUT', 60))
+    USER_LOCK_WAIT = int(os.environ.get('USER_LOCK_WAIT', 30))
+    
+    # Agrupamento de rajadas: mensagens do mesmo usuário dentro da janela viram uma só (0 = desligado)
+    # No modo síncrono a janela atrasa a resposta do webhook; recomendado com MESSAGE_PROCESSING_MODE=celery
+    MESSAGE_COALESCE_WINDOW_MS = int(os.environ.get('MESSAGE_COALESCE_WINDOW_MS', 0))
+    MESSAGE_COALESCE_MAX_WAIT_MS = int(os.environ.get('MESSAGE_COALESCE_MAX_WAIT_MS', 4000))
+    
+    # Gravação do tráfego do webhook (JSONL gzip, telefones anonimizados) para `flask replay-webhooks`
+    WEBHOOK_RECORD_DIR = os.environ.get('WEBHOOK_RECORD_DIR')
+    WEBHOOK_RECORD_SECRET = os.environ.get('WEBHOOK_RECORD_SECRET')
+    
+    # Modo de log: 'default' ou 'structured' (fila fora da requisição, linhas JSON compactas e payloads amostrados)
+    LOG_MODE = os.environ.get('LOG_MODE', 'default')
+    WEBHOOK_PAYLOAD_LOG_SAMPLE_RATE = float(os.environ.get('WEBHOOK_PAYLOAD_LOG_SAMPLE_RATE', 0.01))
+    
+    # Callbacks de status de entrega (sent/delivered/read/failed), gravados em lote
+    STATUS_BATCH_SIZE = int(os.environ.get('STATUS_BATCH_SIZE', 200))
+    STATUS_FLUSH_INTERVAL = float(os.environ.get('STATUS_FLUSH_INTERVAL', 2.0))
+    
+    # Controle de carga: acima de *_MAX_* o webhook responde 503; acima de *_DEGRADE_* entra no modo degradado
+    # PENDING conta mensagens locais não concluídas; QUEUE_DEPTH, as filas do broker Redis (0 = desligado;
+    # sem valor, no modo celery vale o limite de PENDING e no modo sync fica desligado)
+    LOAD_SHED_MAX_PENDING = int(os.environ.get('LOAD_SHED_MAX_PENDING', 200))
+    LOAD_DEGRADE_PENDING = int(os.environ.get('LOAD_DEGRADE_PENDING', 50))
+    LOAD_SHED_MAX_QUEUE_DEPTH = int(os.environ['LOAD_SHED_MAX_QUEUE_DEPTH']) if os.environ.get('LOAD_SHED_MAX_QUEUE_DEPTH') else None
+    LOAD_DEGRADE_QUEUE_DEPTH = int(os.environ['LOAD_DEGRADE_QUEUE_DEPTH']) if os.environ.get('LOAD_DEGRADE_QUEUE_DEPTH') else None
+    LOAD_SHED_RETRY_AFTER = int(os.environ.get('LOAD_SHED_RETRY_AFTER', 30))
+    DEGRADED_MODE_FORCE = os.environ.get('DEGRADED_MODE_FORCE', 'False').lower() == 'true'
+    DEFERRED_WRITES_FLUSH_INTERVAL = float(os.environ.get('DEFERRED_WRITES_FLUSH_INTERVAL', 10.0))
+    
+    # Orçamento de tempo de cada mensagem desde a chegada no webhook (segundos; 0 = sem prazo)
+    MESSAGE_DEADLINE_SECONDS = float(os.environ.get('MESSAGE_DEADLINE_SECONDS', 15.0))
+    # Tempo guardado para o commit e o envio da resposta; esgotado o resto, vai uma resposta pronta
+    DEADLINE_REPLY_RESERVE_SECONDS = float(os.environ.get('DEADLINE_REPLY_RESERVE_SECONDS', 2.0))
+    # Abaixo destes tempos disponíveis: sem OpenAI, e buscas com no máximo DEADLINE_SEARCH_LIMIT resultados
+    DEADLINE_OPENAI_MIN_SECONDS = float(os.environ.get('DEADLINE_OPENAI_MIN_SECONDS', 1.5))
+    DEADLINE_SEARCH_MIN_SECONDS = float(os.environ.get('DEADLINE_SEARCH_MIN_SECONDS', 3.0))
+    DEADLINE_SEARCH_LIMIT = int(os.environ.get('DEADLINE_SEARCH_LIMIT', 3))
+    
+    # Cache das classificações do OpenAI ('memory', 'redis' = memória + Redis em REDIS_URL, ou 'none')
+    INTENT_CACHE_BACKEND = os.environ.get('INTENT_CACHE_BACKEND', 'memory')
+    INTENT_CACHE_TTL = int(os.environ.get('INTENT_CACHE_TTL', 86400))  # 24h
+    INTENT_CACHE_MAX_SIZE = int(os.environ.get('INTENT_CACHE_MAX_SIZE', 10000))
+    
+    # Classificador local de intenções (flask train-intent-classifier); sem arquivo, desligado
+    INTENT_CLASSIFIER_PATH = os.environ.get('INTENT_CLASSIFIER_PATH')
+    # Probabilidade mínima para responder sem o OpenAI
+    INTENT_CLASSIFIER_THRESHOLD = float(os.environ.get('INTENT_CLASSIFIER_THRESHOLD', 0.9))
+    
+    # Dicionário ortográfico do histórico (flask build-spelling-dictionary); sem arquivo, desligado
+    SPELLING_DICTIONARY_PATH = os.environ.get('SPELLING_DICTIONARY_PATH')
+    
+    # Análise local das fotos recebidas (download em threads, Pillow em processos; 0 = na própria thread)
+    IMAGE_ANALYSIS_ENABLED = os.environ.get('IMAGE_ANALYSIS_ENABLED', 'true').lower() == 'true'
+    IMAGE_ANALYSIS_WORKERS = int(os.environ.get('IMAGE_ANALYSIS_WORKERS', 2))
+    IMAGE_DOWNLOAD_WORKERS = int(os.environ.get('IMAGE_DOWNLOAD_WORKERS', 4))
+    # Tempo máximo que o processamento da mensagem espera pela análise (segundos)
+    IMAGE_ANALYSIS_TIMEOUT = float(os.environ.get('IMAGE_ANALYSIS_TIMEOUT', 5))
+    IMAGE_ANALYSIS_MAX_BYTES = int(os.environ.get('IMAGE_ANALYSIS_MAX_BYTES', 10 * 1024 * 1024))
+    IMAGE_ANALYSIS_CACHE_SIZE = int(os.environ.get('IMAGE_ANALYSIS_CACHE_SIZE', 2000))
+    
+    # Intervalo mínimo entre gravações de ultimo_acesso do usuário (segundos)
+    USER_LAST_ACCESS_INTERVAL = int(os.environ.get('USER_LAST_ACCESS_INTERVAL', 300))
+    
     # Configurações de segurança
     ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY')
     
@@ -77,6 +179,7 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    CELERY_BROKER_URL = 'memory://'
 
 # Dicionário de configurações
 config = {
@@ -9,8 +9,26 @@ from flask_migrate import Migrate
 from src.config import config
 from src.models import db
 from src.routes.user import user_bp
-from src.routes.whatsapp import whatsapp_bp
+from src.routes.whatsapp import whatsapp_bp, dispatch_now
 from src.routes.admin import admin_bp
+from src.modules.message_queue import init_celery
+from src.modules.message_dedup import init_message_dedup
+from src.modules.sharded_executor import init_message_lanes
+from src.modules.message_coalescer import init_message_coalescer
+from src.modules.webhook_recorder import init_webhook_recorder
+from src.modules.structured_logging import init_logging
+from src.modules.delivery_status import init_status_ingestor
+from src.modules.metrics import init_metrics
+from src.modules.load_shedder import init_load_shedder
+from src.modules.deferred_writes import init_deferred_writes
+from src.modules.intent_cache import init_intent_cache
+from src.modules.intent_classifier import init_intent_classifier
+from src.modules.spelling import init_spelling_corrector
+from src.modules.image_analysis import init_image_analyzer
+from src.modules.openai_client import init_openai_client
+from src.modules.intent_batcher import init_intent_batcher
+from src.modules.registry import init_registry
+from src.commands import register_commands
 
 def create_app(config_name=None):
     """Factory function para criar a aplicação Flask"""
@@ -22,11 +40,29 @@ def create_app(config_name=None):
     # Carrega configuração
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
+    init_logging(app)
     
     # Inicializa extensões
     db.init_app(app)
     migrate = Migrate(app, db)
     CORS(app, origins="*")  # Permite CORS para todas as origens
+    init_celery(app)
+    init_message_dedup(app)
+    init_message_lanes(app)
+    init_message_coalescer(app, dispatch_now)
+    init_webhook_recorder(app)
+    init_status_ingestor(app)
+    init_metrics(app)
+    init_load_shedder(app)
+    init_deferred_writes(app)
+    init_intent_cache(app)
+    init_intent_classifier(app)
+    init_spelling_corrector(app)
+    init_image_analyzer(app)
+    init_openai_client(app)
+    init_intent_batcher(app)
+    init_registry(app)
+    register_commands(app)
     
     # Registra blueprints
     app.register_blueprint(user_bp, url_prefix='/api')
@@ -43,7 +79,7 @@ def create_app(config_name=None):
         static_folder_path = app.static_folder
         if static_folder_path is None:
             return "Static folder not configured", 404
-
+        
         if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
             return send_from_directory(static_folder_path, path)
         else:
@@ -11,6 +11,9 @@ from .conexao_pessoal import ConexaoPessoal
 from .achado_perdido import AchadoPerdido
 from .reclamacao import Reclamacao
 from .conversa import Conversa
+from .mensagem_agrupada import MensagemAgrupada
+from .status_entrega import StatusEntrega
+from .reclassificacao import ReclassificacaoConversa
 
 __all__ = [
     'db',
@@ -20,6 +23,9 @@ __all__ = [
     'ConexaoPessoal',
     'AchadoPerdido',
     'Reclamacao',
-    'Conversa'
+    'Conversa',
+    'MensagemAgrupada',
+    'StatusEntrega',
+    'ReclassificacaoConversa'
 ]
 
@@ -161,10 +161,11 @@ class AchadoPerdido(db.Model):
         
         return query.order_by(AchadoPerdido.data_registro.desc()).limit(10).all()
     
-    def incrementar_visualizacao(self):
+    def incrementar_visualizacao(self, commit=True):
         """Incrementa o contador de visualizações"""
         self.visualizacoes += 1
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def incrementar_compartilhamento(self):
         """Incrementa o contador de compartilhamentos"""
@@ -101,10 +101,11 @@ class ConexaoPessoal(db.Model):
         
         return query.order_by(ConexaoPessoal.ultimo_acesso.desc()).all()
     
-    def incrementar_visualizacao(self):
+    def incrementar_visualizacao(self, commit=True):
         """Incrementa o contador de visualizações"""
         self.visualizacoes += 1
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def incrementar_like(self):
         """Incrementa o contador de likes"""
@@ -7,6 +7,7 @@ class Conversa(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    whatsapp_message_id = db.Column(db.String(100), unique=True, index=True)  # wamid da mensagem recebida
     mensagem_usuario = db.Column(db.Text, nullable=False)
     resposta_ia = db.Column(db.Text)
     tipo_comando = db.Column(db.String(100), index=True)  # cadastro, busca, venda, etc.
@@ -34,6 +35,7 @@ class Conversa(db.Model):
         return {
             'id': self.id,
             'usuario_id': self.usuario_id,
+            'whatsapp_message_id': self.whatsapp_message_id,
             'mensagem_usuario': self.mensagem_usuario,
             'resposta_ia': self.resposta_ia,
             'tipo_comando': self.tipo_comando,
@@ -53,6 +55,20 @@ class Conversa(db.Model):
             'sessao_id': self.sessao_id
         }
     
+    @staticmethod
+    def mensagem_ja_processada(whatsapp_message_id):
+        """Verifica se já existe conversa para o ID de mensagem do WhatsApp (também unida a outra)"""
+        if not whatsapp_message_id:
+            return False
+        
+        from .mensagem_agrupada import MensagemAgrupada
+        
+        return db.session.query(
+            Conversa.query.filter_by(whatsapp_message_id=whatsapp_message_id).exists()
+        ).scalar() or db.session.query(
+            MensagemAgrupada.query.filter_by(whatsapp_message_id=whatsapp_message_id).exists()
+        ).scalar()
+    
     @staticmethod
     def buscar_historico_usuario(usuario_id, limite=50):
         """Busca histórico de conversas de um usuário"""
@@ -0,0 +1,17 @@
+from . import db
+
+class MensagemAgrupada(db.Model):
+    """Mensagens do WhatsApp unidas a outra em uma única conversa (rajadas)
+    
+    A conversa guarda o wamid da primeira mensagem da rajada; os das demais
+    ficam aqui, para que a reentrega de qualquer uma delas seja reconhecida.
+    """
+    __tablename__ = 'mensagens_agrupadas'
+    
+    whatsapp_message_id = db.Column(db.String(100), primary_key=True)  # wamid da mensagem unida
+    conversa_id = db.Column(db.Integer, db.ForeignKey('conversas.id'), nullable=False, index=True)
+    
+    conversa = db.relationship('Conversa', backref=db.backref('mensagens_agrupadas', lazy='dynamic'))
+    
+    def __repr__(self):
+        return f'<MensagemAgrupada {self.whatsapp_message_id}>'
@@ -104,10 +104,11 @@ class Produto(db.Model):
         
         return query.order_by(Produto.data_publicacao.desc()).all()
     
-    def incrementar_visualizacao(self):
+    def incrementar_visualizacao(self, commit=True):
         """Incrementa o contador de visualizações"""
         self.visualizacoes += 1
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def incrementar_favorito(self):
         """Incrementa o contador de favoritos"""
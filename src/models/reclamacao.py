@@ -148,10 +148,11 @@ class Reclamacao(db.Model):
             'total_visualizacoes': sum([r.visualizacoes for r in reclamacoes])
         }
     
-    def incrementar_visualizacao(self):
+    def incrementar_visualizacao(self, commit=True):
         """Incrementa o contador de visualizações"""
         self.visualizacoes += 1
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def incrementar_like(self):
         """Incrementa o contador de likes (apoio)"""
@@ -0,0 +1,41 @@
+from . import db
+from datetime import datetime
+
+class ReclassificacaoConversa(db.Model):
+    """Resultado da reclassificação offline de uma conversa (flask reclassify-conversas)
+    
+    Tabela auxiliar: a conversa original não é alterada. Cada execução tem o
+    seu execucao_id, então execuções com padrões ou prompts diferentes
+    podem ser comparadas entre si.
+    """
+    __tablename__ = 'reclassificacoes_conversa'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    execucao_id = db.Column(db.String(64), nullable=False, index=True)
+    conversa_id = db.Column(db.Integer, db.ForeignKey('conversas.id'), nullable=False, index=True)
+    intencao_anterior = db.Column(db.String(200))
+    intencao_nova = db.Column(db.String(200))
+    tipo_comando = db.Column(db.String(100))
+    categoria = db.Column(db.String(100))
+    confianca = db.Column(db.Float)
+    origem = db.Column(db.String(30))  # padrao, classificador_local, openai, nenhuma
+    alterada = db.Column(db.Boolean, default=False, index=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ReclassificacaoConversa {self.execucao_id} - {self.conversa_id}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'execucao_id': self.execucao_id,
+            'conversa_id': self.conversa_id,
+            'intencao_anterior': self.intencao_anterior,
+            'intencao_nova': self.intencao_nova,
+            'tipo_comando': self.tipo_comando,
+            'categoria': self.categoria,
+            'confianca': self.confianca,
+            'origem': self.origem,
+            'alterada': self.alterada,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+        }
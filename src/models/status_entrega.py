@@ -0,0 +1,93 @@
+from . import db
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+
+class StatusEntrega(db.Model):
+    """Modelo para status de entrega das respostas enviadas (callbacks do WhatsApp)"""
+    __tablename__ = 'status_entrega'
+    
+    # Campo de data correspondente a cada status recebido do WhatsApp
+    CAMPOS_STATUS = {
+        'sent': 'enviado_em',
+        'delivered': 'entregue_em',
+        'read': 'lido_em',
+        'failed': 'falhou_em'
+    }
+    
+    whatsapp_message_id = db.Column(db.String(100), primary_key=True)  # wamid da resposta enviada
+    conversa_id = db.Column(db.Integer, db.ForeignKey('conversas.id'), index=True)
+    enviado_em = db.Column(db.DateTime)
+    entregue_em = db.Column(db.DateTime)
+    lido_em = db.Column(db.DateTime)
+    falhou_em = db.Column(db.DateTime)
+    erro_codigo = db.Column(db.Integer)
+    
+    conversa = db.relationship('Conversa', backref=db.backref('status_entrega', lazy='dynamic'))
+    
+    def __repr__(self):
+        return f'<StatusEntrega {self.whatsapp_message_id}>'
+    
+    def to_dict(self):
+        return {
+            'whatsapp_message_id': self.whatsapp_message_id,
+            'conversa_id': self.conversa_id,
+            'enviado_em': self.enviado_em.isoformat() if self.enviado_em else None,
+            'entregue_em': self.entregue_em.isoformat() if self.entregue_em else None,
+            'lido_em': self.lido_em.isoformat() if self.lido_em else None,
+            'falhou_em': self.falhou_em.isoformat() if self.falhou_em else None,
+            'erro_codigo': self.erro_codigo
+        }
+    
+    def aplicar_status(self, campos):
+        """Aplica datas de status mantendo a primeira ocorrência de cada uma"""
+        for campo, valor in campos.items():
+            if campo == 'erro_codigo':
+                self.erro_codigo = valor
+            elif getattr(self, campo) is None or valor < getattr(self, campo):
+                setattr(self, campo, valor)
+    
+    @staticmethod
+    def registrar_envio(whatsapp_message_id, conversa_id):
+        """Vincula a resposta enviada à conversa
+        
+        O callback de status pode chegar antes deste registro; nesse caso a
+        linha já existe e só recebe o vínculo.
+        """
+        if not whatsapp_message_id:
+            return
+        
+        status = StatusEntrega.query.get(whatsapp_message_id)
+        if status:
+            status.conversa_id = conversa_id
+            db.session.commit()
+            return
+        
+        db.session.add(StatusEntrega(whatsapp_message_id=whatsapp_message_id, conversa_id=conversa_id))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            StatusEntrega.query.filter_by(whatsapp_message_id=whatsapp_message_id).update({'conversa_id': conversa_id})
+            db.session.commit()
+    
+    @staticmethod
+    def gravar_lote(atualizacoes):
+        """Grava um lote de status {wamid: {campo: data}} com uma consulta e um commit"""
+        if not atualizacoes:
+            return
+        
+        existentes = {
+            status.whatsapp_message_id: status
+            for status in StatusEntrega.query.filter(
+                StatusEntrega.whatsapp_message_id.in_(list(atualizacoes.keys()))
+            )
+        }
+        
+        for whatsapp_message_id, campos in atualizacoes.items():
+            status = existentes.get(whatsapp_message_id)
+            if status is None:
+                status = StatusEntrega(whatsapp_message_id=whatsapp_message_id)
+                db.session.add(status)
+            status.aplicar_status(campos)
+        
+        db.session.commit()
@@ -37,14 +37,31 @@ class User(db.Model):
             'ativo': self.ativo
         }
     
-    def atualizar_ultimo_acesso(self):
+    def atualizar_ultimo_acesso(self, commit=True):
         """Atualiza o timestamp do último acesso"""
         self.ultimo_acesso = datetime.utcnow()
-        db.session.commit()
+        if commit:
+            db.session.commit()
+    
+    def registrar_acesso(self, intervalo_segundos=0):
+        """Atualiza o último acesso no máximo uma vez por intervalo (sem commit)
+        
+        Retorna True se o campo foi alterado.
+        """
+        agora = datetime.utcnow()
+        if self.ultimo_acesso and (agora - self.ultimo_acesso).total_seconds() < intervalo_segundos:
+            return False
+        
+        self.ultimo_acesso = agora
+        return True
     
     @staticmethod
-    def buscar_ou_criar(whatsapp_id, nome=None, telefone=None):
-        """Busca usuário existente ou cria novo"""
+    def buscar_ou_criar(whatsapp_id, nome=None, telefone=None, commit=True):
+        """Busca usuário existente ou cria novo
+        
+        Com commit=False o usuário fica apenas na sessão, para ser gravado
+        junto com o restante da unidade de trabalho.
+        """
         usuario = User.query.filter_by(whatsapp_id=whatsapp_id).first()
         
         if not usuario:
@@ -54,14 +71,15 @@ class User(db.Model):
                 telefone=telefone
             )
             db.session.add(usuario)
-            db.session.commit()
+            if commit:
+                db.session.commit()
         else:
             # Atualiza informações se fornecidas
             if nome and not usuario.nome:
                 usuario.nome = nome
             if telefone and not usuario.telefone:
                 usuario.telefone = telefone
-            usuario.atualizar_ultimo_acesso()
+            if commit:
+                usuario.atualizar_ultimo_acesso()
         
         return usuario
-
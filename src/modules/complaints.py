@@ -1,6 +1,10 @@
 from typing import Dict, Any, List
 from flask import current_app
 from src.models import db, User, Reclamacao, Conversa
+from src.modules.deferred_writes import record_view
+from src.modules.keyword_tables import freeze, keyword_table
+from src.modules.deadline import search_limit
+from src.modules.parsed_message import ParsedMessage, get_parsed
 import json
 import re
 from datetime import datetime, date
@@ -8,32 +12,33 @@ from datetime import datetime, date
 class ComplaintsModule:
     """Módulo para gerenciar reclamações e denúncias"""
     
-    def __init__(self):
-        self.company_categories = {
-            'telecomunicacoes': ['unitel', 'movicel', 'africell', 'operadora', 'telefone', 'internet'],
-            'banco': ['bai', 'bic', 'banco', 'bancario', 'cartao', 'credito', 'conta'],
-            'energia': ['ende', 'energia', 'eletricidade', 'luz', 'corrente'],
-            'agua': ['epal', 'agua', 'saneamento', 'torneira', 'canos'],
-            'transporte': ['transporte', 'taxi', 'autocarro', 'onibus', 'mototaxi'],
-            'educacao': ['escola', 'universidade', 'faculdade', 'ensino', 'educacao'],
-            'saude': ['hospital', 'clinica', 'medico', 'saude', 'medicamento'],
-            'comercio': ['loja', 'supermercado', 'shopping', 'comercio', 'vendas'],
-            'servicos': ['servico', 'atendimento', 'empresa', 'negocio'],
-            'governo': ['governo', 'ministerio', 'municipal', 'estado', 'publico']
-        }
-        
-        self.complaint_types = {
-            'atendimento': ['atendimento', 'mau atendimento', 'grosseria', 'descortesia'],
-            'produto': ['produto', 'defeito', 'qualidade', 'mercadoria'],
-            'servico': ['servico', 'prestacao', 'execucao', 'trabalho'],
-            'cobranca': ['cobranca', 'fatura', 'conta', 'preco', 'valor'],
-            'entrega': ['entrega', 'atraso', 'prazo', 'demora'],
-            'contrato': ['contrato', 'acordo', 'clausula', 'termo'],
-            'discriminacao': ['discriminacao', 'preconceito', 'racismo', 'machismo'],
-            'fraude': ['fraude', 'golpe', 'enganacao', 'roubo']
-        }
-        
-        self.urgency_keywords = ['urgente', 'grave', 'serio', 'importante', 'critico']
+    company_categories = keyword_table('complaints.company_categories', {
+        'telecomunicacoes': ['unitel', 'movicel', 'africell', 'operadora', 'telefone', 'internet'],
+        'banco': ['bai', 'bic', 'banco', 'bancario', 'cartao', 'credito', 'conta'],
+        'energia': ['ende', 'energia', 'eletricidade', 'luz', 'corrente'],
+        'agua': ['epal', 'agua', 'saneamento', 'torneira', 'canos'],
+        'transporte': ['transporte', 'taxi', 'autocarro', 'onibus', 'mototaxi'],
+        'educacao': ['escola', 'universidade', 'faculdade', 'ensino', 'educacao'],
+        'saude': ['hospital', 'clinica', 'medico', 'saude', 'medicamento'],
+        'comercio': ['loja', 'supermercado', 'shopping', 'comercio', 'vendas'],
+        'servicos': ['servico', 'atendimento', 'empresa', 'negocio'],
+        'governo': ['governo', 'ministerio', 'municipal', 'estado', 'publico']
+    })
+    
+    complaint_types = keyword_table('complaints.complaint_types', {
+        'atendimento': ['atendimento', 'mau atendimento', 'grosseria', 'descortesia'],
+        'produto': ['produto', 'defeito', 'qualidade', 'mercadoria'],
+        'servico': ['servico', 'prestacao', 'execucao', 'trabalho'],
+        'cobranca': ['cobranca', 'fatura', 'conta', 'preco', 'valor'],
+        'entrega': ['entrega', 'atraso', 'prazo', 'demora'],
+        'contrato': ['contrato', 'acordo', 'clausula', 'termo'],
+        'discriminacao': ['discriminacao', 'preconceito', 'racismo', 'machismo'],
+        'fraude': ['fraude', 'golpe', 'enganacao', 'roubo']
+    })
+    
+    urgency_keywords = freeze(['urgente', 'grave', 'serio', 'importante', 'critico'])
+    
+    anonymity_keywords = freeze(['anonimo', 'anonima', 'sem nome', 'confidencial', 'secreto'])
     
     def process_message(self, nlp_result: Dict[str, Any], user: User, conversa: Conversa) -> Dict[str, Any]:
         """Processa mensagem relacionada a reclamações"""
@@ -41,7 +46,7 @@ class ComplaintsModule:
             text = nlp_result.get('text', '')
             
             # Extrai informações da reclamação
-            complaint_info = self._extract_complaint_info(text, nlp_result.get('entities', {}))
+            complaint_info = self._extract_complaint_info(text, get_parsed(nlp_result), nlp_result.get('entities', {}))
             
             if not complaint_info.get('empresa'):
                 return self._request_company_info(user, conversa)
@@ -51,7 +56,7 @@ class ComplaintsModule:
             
             # Solicita detalhes completos
             return self._request_complaint_details(complaint_info, user, conversa)
-                
+        
         except Exception as e:
             current_app.logger.error(f'Erro no módulo de reclamações: {str(e)}')
             return {
@@ -60,7 +65,7 @@ class ComplaintsModule:
                 'error': str(e)
             }
     
-    def _extract_complaint_info(self, text: str, entities: Dict) -> Dict[str, Any]:
+    def _extract_complaint_info(self, text: str, parsed: ParsedMessage, entities: Dict) -> Dict[str, Any]:
         """Extrai informações da reclamação"""
         info = {}
         
@@ -68,24 +73,28 @@ class ComplaintsModule:
         info['empresa'] = self._extract_company(text)
         
         # Extrai categoria da empresa
-        info['categoria_empresa'] = self._extract_company_category(text)
+        info['categoria_empresa'] = self._extract_company_category(parsed)
         
         # Extrai tipo de reclamação
-        info['tipo_reclamacao'] = self._extract_complaint_type(text)
+        info['tipo_reclamacao'] = self._extract_complaint_type(parsed)
         
         # Extrai motivo
         info['motivo'] = self._extract_complaint_reason(text)
         
-        # Extrai valor envolvido
-        prices = entities.get('preco', [])
-        if prices:
-            info['valor_envolvido'] = self._parse_price(prices[0])
+        # Extrai valor envolvido e data do problema (já interpretados pelo NLP)
+        amounts = parsed.typed('preco')
+        if amounts:
+            info['valor_envolvido'] = amounts[0].valor
+        
+        dates = parsed.typed('data')
+        if dates:
+            info['data_problema'] = dates[0]
         
         # Verifica se é urgente
-        info['urgente'] = self._is_urgent(text)
+        info['urgente'] = self._is_urgent(parsed)
         
         # Verifica se quer anonimato
-        info['anonimo'] = self._wants_anonymity(text)
+        info['anonimo'] = self._wants_anonymity(parsed)
         
         return info
     
@@ -113,27 +122,13 @@ class ComplaintsModule:
         
         return None
     
-    def _extract_company_category(self, text: str) -> str:
+    def _extract_company_category(self, parsed: ParsedMessage) -> str:
         """Extrai categoria da empresa"""
-        text_lower = text.lower()
-        
-        for category, keywords in self.company_categories.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    return category
-        
-        return 'servicos'  # Padrão
+        return parsed.first_key(self.company_categories) or 'servicos'  # Padrão
     
-    def _extract_complaint_type(self, text: str) -> str:
+    def _extract_complaint_type(self, parsed: ParsedMessage) -> str:
         """Extrai tipo de reclamação"""
-        text_lower = text.lower()
-        
-        for comp_type, keywords in self.complaint_types.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    return comp_type
-        
-        return 'servico'  # Padrão
+        return parsed.first_key(self.complaint_types) or 'servico'  # Padrão
     
     def _extract_complaint_reason(self, text: str) -> str:
         """Extrai motivo da reclamação"""
@@ -154,28 +149,13 @@ class ComplaintsModule:
         
         return None
     
-    def _parse_price(self, price_str: str) -> float:
-        """Converte string de preço para float"""
-        try:
-            price_clean = re.sub(r'[^\d,.]', '', price_str)
-            if ',' in price_clean and '.' not in price_clean:
-                price_clean = price_clean.replace(',', '.')
-            elif ',' in price_clean and '.' in price_clean:
-                price_clean = price_clean.replace('.', '').replace(',', '.')
-            return float(price_clean)
-        except:
-            return 0.0
-    
-    def _is_urgent(self, text: str) -> bool:
+    def _is_urgent(self, parsed: ParsedMessage) -> bool:
         """Verifica se é urgente"""
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in self.urgency_keywords)
+        return parsed.has_any(self.urgency_keywords)
     
-    def _wants_anonymity(self, text: str) -> bool:
+    def _wants_anonymity(self, parsed: ParsedMessage) -> bool:
         """Verifica se quer anonimato"""
-        anonymity_keywords = ['anonimo', 'anonima', 'sem nome', 'confidencial', 'secreto']
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in anonymity_keywords)
+        return parsed.has_any(self.anonymity_keywords)
     
     def _request_company_info(self, user: User, conversa: Conversa) -> Dict[str, Any]:
         """Solicita informações da empresa"""
@@ -193,8 +173,7 @@ class ComplaintsModule:
         temp_data = {
             'step': 'collecting_company'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         return {
             'success': True,
@@ -222,8 +201,7 @@ class ComplaintsModule:
             'complaint_info': complaint_info,
             'step': 'collecting_reason'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         return {
             'success': True,
@@ -259,8 +237,7 @@ class ComplaintsModule:
             'complaint_info': complaint_info,
             'step': 'collecting_details'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         buttons = [
             {'id': 'anonymous_yes', 'title': '🔒 Anônimo'},
@@ -298,7 +275,7 @@ class ComplaintsModule:
         return query.order_by(
             Reclamacao.urgente.desc(),
             Reclamacao.data_reclamacao.desc()
-        ).limit(20).all()
+        ).limit(search_limit(20)).all()
     
     def get_company_statistics(self, empresa: str) -> Dict[str, Any]:
         """Retorna estatísticas de uma empresa"""
@@ -328,7 +305,7 @@ class ComplaintsModule:
             )
             
             db.session.add(complaint)
-            db.session.commit()
+            db.session.flush()
             
             # Gera número de protocolo interno
             protocol_number = f"SOL{complaint.id:06d}"
@@ -368,7 +345,7 @@ class ComplaintsModule:
                 'protocol': protocol_number,
                 'complaint_id': complaint.id
             }
-            
+        
         except Exception as e:
             current_app.logger.error(f'Erro ao registrar reclamação: {str(e)}')
             return {
@@ -395,7 +372,7 @@ class ComplaintsModule:
         
         for i, complaint in enumerate(complaints, 1):
             # Incrementa visualização
-            complaint.incrementar_visualizacao()
+            record_view(complaint)
             
             # Status emoji
             status_emoji = {
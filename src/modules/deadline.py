@@ -0,0 +1,97 @@
+import time
+from typing import Optional
+from flask import current_app, g, has_app_context
+from src.modules.metrics import get_metrics
+
+class Deadline:
+    """Orçamento de tempo de uma mensagem, contado desde a chegada no webhook
+    
+    O início é o start_time do webhook (relógio de parede, para valer também
+    no worker Celery). reserve é o tempo guardado para o commit e o envio da
+    resposta; o restante (available) é o que as etapas podem gastar. Quanto
+    menos sobra, mais barato é o caminho: sem OpenAI abaixo de openai_min,
+    buscas menores abaixo de search_min e resposta pronta quando acaba.
+    """
+    
+    __slots__ = ('expires_at', 'reserve', 'openai_min', 'search_min', 'search_limit')
+    
+    def __init__(self, start: float, budget: float, reserve: float = 2.0, openai_min: float = 1.5,
+                 search_min: float = 3.0, search_limit: int = 3):
+        self.expires_at = start + budget
+        self.reserve = reserve
+        self.openai_min = openai_min
+        self.search_min = search_min
+        self.search_limit = search_limit
+    
+    def remaining(self) -> float:
+        """Segundos até o fim do orçamento (negativo se já passou)"""
+        return self.expires_at - time.time()
+    
+    def available(self) -> float:
+        """Segundos para o processamento, descontada a reserva do envio"""
+        return self.remaining() - self.reserve
+    
+    def cap(self, timeout: float) -> float:
+        """Prazo de uma etapa: o configurado, limitado ao que ainda está disponível"""
+        return max(0.0, min(timeout, self.available()))
+    
+    def allows_openai(self) -> bool:
+        return self.available() >= self.openai_min
+    
+    def tight(self) -> bool:
+        return self.available() < self.search_min
+    
+    def exhausted(self) -> bool:
+        return self.available() <= 0
+
+def start_deadline(start_time: float) -> Optional[Deadline]:
+    """Abre o orçamento da mensagem em processamento (MESSAGE_DEADLINE_SECONDS=0 desliga)"""
+    config = current_app.config
+    budget = config.get('MESSAGE_DEADLINE_SECONDS', 15.0)
+    
+    deadline = None
+    if budget > 0:
+        deadline = Deadline(
+            start=start_time or time.time(),
+            budget=budget,
+            reserve=config.get('DEADLINE_REPLY_RESERVE_SECONDS', 2.0),
+            openai_min=config.get('DEADLINE_OPENAI_MIN_SECONDS', 1.5),
+            search_min=config.get('DEADLINE_SEARCH_MIN_SECONDS', 3.0),
+            search_limit=config.get('DEADLINE_SEARCH_LIMIT', 3)
+        )
+    
+    g.deadline = deadline
+    return deadline
+
+def get_deadline() -> Optional[Deadline]:
+    """Orçamento da mensagem em processamento (None fora do processamento de mensagens)"""
+    return g.get('deadline') if has_app_context() else None
+
+def cap_timeout(timeout: float) -> float:
+    """Prazo da etapa dentro do orçamento da mensagem atual"""
+    deadline = get_deadline()
+    return deadline.cap(timeout) if deadline else timeout
+
+def openai_allowed() -> bool:
+    """Indica se ainda há tempo para consultar o OpenAI"""
+    deadline = get_deadline()
+    return deadline is None or deadline.allows_openai()
+
+def search_limit(limit: int) -> int:
+    """Limite de resultados das buscas: menor quando o orçamento está no fim"""
+    deadline = get_deadline()
+    if deadline is None or not deadline.tight() or limit <= deadline.search_limit:
+        return limit
+    
+    get_metrics().increment('prazo_buscas_reduzidas')
+    return deadline.search_limit
+
+def budget_exhausted() -> bool:
+    """Indica se o orçamento da mensagem acabou (só resta o tempo do envio)"""
+    deadline = get_deadline()
+    return deadline is not None and deadline.exhausted()
+
+def send_timeout(timeout: float) -> float:
+    """Prazo das chamadas à Graph API: o que resta do orçamento, mas nunca menos que a reserva"""
+    deadline = get_deadline()
+    return min(timeout, max(deadline.remaining(), deadline.reserve)) if deadline else timeout
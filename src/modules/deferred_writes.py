@@ -0,0 +1,90 @@
+import atexit
+import threading
+import time
+from typing import Callable, Optional
+from flask import Flask, current_app
+from src.models import db
+from src.modules.load_shedder import is_degraded
+
+class DeferredCounters:
+    """Acumula incrementos de contadores não essenciais (visualizações)
+    
+    No modo degradado os incrementos não entram na transação da mensagem:
+    ficam em memória e são gravados depois, em um único UPDATE por registro,
+    quando a carga volta ao normal.
+    """
+    
+    def __init__(self, app: Flask, flush_interval: float = 10.0,
+                 can_flush: Optional[Callable[[], bool]] = None):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.can_flush = can_flush
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def add(self, model, record_id: int, column: str = 'visualizacoes', amount: int = 1):
+        """Registra um incremento adiado"""
+        key = (model, record_id, column)
+        
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + amount
+            
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='escritas-adiadas', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+    
+    def pending(self) -> int:
+        """Quantidade de registros com incrementos pendentes"""
+        return len(self._counts)
+    
+    def flush(self):
+        """Grava os incrementos acumulados"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        
+        if not counts:
+            return
+        
+        with self.app.app_context():
+            try:
+                for (model, record_id, column), amount in counts.items():
+                    field = getattr(model, column)
+                    model.query.filter(model.id == record_id).update(
+                        {field: field + amount}, synchronize_session=False
+                    )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f'Erro ao gravar contadores adiados: {str(e)}')
+    
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            
+            with self.app.app_context():
+                ready = self.can_flush is None or self.can_flush()
+            
+            if ready:
+                self.flush()
+
+def init_deferred_writes(app: Flask) -> DeferredCounters:
+    """Cria o acumulador de escritas adiadas da aplicação"""
+    shedder = app.extensions.get('load_shedder')
+    
+    counters = DeferredCounters(
+        app,
+        flush_interval=app.config.get('DEFERRED_WRITES_FLUSH_INTERVAL', 10.0),
+        can_flush=(lambda: not shedder.degraded()) if shedder else None
+    )
+    app.extensions['deferred_writes'] = counters
+    
+    return counters
+
+def record_view(record):
+    """Incrementa as visualizações do registro, adiando a escrita no modo degradado"""
+    if is_degraded():
+        current_app.extensions['deferred_writes'].add(type(record), record.id)
+    else:
+        record.incrementar_visualizacao(commit=False)
@@ -0,0 +1,158 @@
+import atexit
+import threading
+from datetime import datetime
+from typing import Any, Dict, List
+from flask import Flask, current_app
+from sqlalchemy.exc import IntegrityError
+from src.models import db, StatusEntrega
+from src.modules.metrics import get_metrics
+
+class StatusIngestor:
+    """Acumula os callbacks de status do WhatsApp e grava em lote
+    
+    Cada resposta gera até três callbacks (sent, delivered, read). Em vez de
+    uma escrita por callback, os status ficam em memória e são gravados com
+    uma consulta e um commit a cada STATUS_BATCH_SIZE itens ou
+    STATUS_FLUSH_INTERVAL segundos.
+    """
+    
+    def __init__(self, app: Flask, batch_size: int = 200, flush_interval: float = 2.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+    
+    def add(self, statuses: List[Dict[str, Any]]):
+        """Adiciona os status de um webhook ao lote"""
+        if not statuses:
+            return
+        
+        with self._lock:
+            self._buffer.extend(statuses)
+            full = len(self._buffer) >= self.batch_size
+            
+            if self._thread is None:
+                self._start()
+        
+        if full:
+            self._wakeup.set()
+    
+    def flush(self):
+        """Grava imediatamente os status acumulados"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        
+        if not batch:
+            return
+        
+        updates = self._merge(batch)
+        
+        # Um flush por vez, para que dois lotes não criem a mesma linha
+        with self._flush_lock, self.app.app_context():
+            error = None
+            for attempt in range(2):
+                try:
+                    StatusEntrega.gravar_lote(updates)
+                    return
+                except IntegrityError as e:
+                    # A linha foi criada em paralelo pelo registro do envio; tenta de novo
+                    db.session.rollback()
+                    error = e
+                except Exception as e:
+                    db.session.rollback()
+                    error = e
+                    break
+            
+            # O lote não é reenfileirado: um erro persistente o faria falhar para sempre
+            get_metrics().increment('status_entrega_descartados', len(updates))
+            current_app.logger.error(f'Erro ao gravar status de entrega, {len(updates)} descartados: {str(error)}')
+    
+    def _merge(self, batch: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Agrupa os status por wamid, mantendo a primeira data de cada status"""
+        updates = {}
+        
+        for status in batch:
+            field = StatusEntrega.CAMPOS_STATUS.get(status.get('status'))
+            message_id = status.get('id')
+            
+            if not field or not message_id:
+                continue
+            
+            try:
+                timestamp = datetime.fromtimestamp(int(status.get('timestamp')))
+            except (TypeError, ValueError):
+                timestamp = datetime.now()
+            
+            fields = updates.setdefault(message_id, {})
+            if field not in fields or timestamp < fields[field]:
+                fields[field] = timestamp
+            
+            if field == 'falhou_em' and status.get('errors'):
+                fields['erro_codigo'] = status['errors'][0].get('code')
+        
+        return updates
+    
+    def _start(self):
+        """Inicia a thread que grava os lotes periodicamente"""
+        self._thread = threading.Thread(target=self._run, name='status-entrega', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+def init_status_ingestor(app: Flask) -> StatusIngestor:
+    """Cria o acumulador de status de entrega da aplicação"""
+    ingestor = StatusIngestor(
+        app,
+        batch_size=app.config.get('STATUS_BATCH_SIZE', 200),
+        flush_interval=app.config.get('STATUS_FLUSH_INTERVAL', 2.0)
+    )
+    app.extensions['status_ingestor'] = ingestor
+    
+    return ingestor
+
+def get_status_ingestor() -> StatusIngestor:
+    """Retorna o acumulador de status de entrega da aplicação atual"""
+    return current_app.extensions['status_ingestor']
+
+def delivery_latency_histogram(rows: List[Any], buckets: List[float]) -> Dict[str, Dict[str, Any]]:
+    """Histograma por intenção do tempo entre a mensagem do usuário e a entrega da resposta
+    
+    rows: tuplas (intencao, timestamp da mensagem do usuário, entregue_em).
+    """
+    latencies = {}
+    
+    for intent, sent_at, delivered_at in rows:
+        if sent_at is None or delivered_at is None:
+            continue
+        
+        seconds = max((delivered_at - sent_at).total_seconds(), 0.0)
+        latencies.setdefault(intent or 'desconhecida', []).append(seconds)
+    
+    labels = [f'<={bucket:g}s' for bucket in buckets] + [f'>{buckets[-1]:g}s']
+    result = {}
+    
+    for intent, values in latencies.items():
+        counts = dict.fromkeys(labels, 0)
+        
+        for value in values:
+            index = next((i for i, bucket in enumerate(buckets) if value <= bucket), len(buckets))
+            counts[labels[index]] += 1
+        
+        values.sort()
+        result[intent] = {
+            'total': len(values),
+            'p50_s': round(values[int(0.50 * (len(values) - 1))], 2),
+            'p95_s': round(values[int(0.95 * (len(values) - 1))], 2),
+            'histograma': counts
+        }
+    
+    return result
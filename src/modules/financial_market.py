@@ -3,42 +3,48 @@ from flask import current_app
 import requests
 import json
 from datetime import datetime
+from src.modules.keyword_tables import freeze, keyword_table
+from src.modules.parsed_message import get_parsed
 
 class FinancialMarketModule:
     """Módulo para informações do mercado financeiro"""
     
-    def __init__(self):
-        self.currencies = {
-            'usd': ['dolar', 'dollar', 'usd'],
-            'eur': ['euro', 'eur'],
-            'gbp': ['libra', 'pound', 'gbp'],
-            'brl': ['real', 'brasileiro', 'brl'],
-            'zar': ['rand', 'sul africano', 'zar']
-        }
-        
-        self.cryptocurrencies = {
-            'bitcoin': ['bitcoin', 'btc'],
-            'ethereum': ['ethereum', 'eth'],
-            'cardano': ['cardano', 'ada'],
-            'solana': ['solana', 'sol'],
-            'dogecoin': ['dogecoin', 'doge']
-        }
+    currencies = keyword_table('financial_market.currencies', {
+        'usd': ['dolar', 'dollar', 'usd'],
+        'eur': ['euro', 'eur'],
+        'gbp': ['libra', 'pound', 'gbp'],
+        'brl': ['real', 'brasileiro', 'brl'],
+        'zar': ['rand', 'sul africano', 'zar']
+    })
+    
+    cryptocurrencies = keyword_table('financial_market.cryptocurrencies', {
+        'bitcoin': ['bitcoin', 'btc'],
+        'ethereum': ['ethereum', 'eth'],
+        'cardano': ['cardano', 'ada'],
+        'solana': ['solana', 'sol'],
+        'dogecoin': ['dogecoin', 'doge']
+    })
+    
+    stock_keywords = freeze(['acao', 'acoes', 'bolsa', 'stock'])
     
     def process_message(self, nlp_result: Dict[str, Any], user, conversa) -> Dict[str, Any]:
         """Processa mensagem sobre mercado financeiro"""
         try:
-            text = nlp_result.get('text', '').lower()
+            parsed = get_parsed(nlp_result)
             
             # Determina tipo de consulta
-            if any(crypto in text for cryptos in self.cryptocurrencies.values() for crypto in cryptos):
-                return self._handle_crypto_query(text)
-            elif any(curr in text for currs in self.currencies.values() for curr in currs):
-                return self._handle_currency_query(text)
-            elif any(word in text for word in ['acao', 'acoes', 'bolsa', 'stock']):
-                return self._handle_stock_query(text)
+            crypto = parsed.first_key(self.cryptocurrencies)
+            currency = parsed.first_key(self.currencies)
+            
+            if crypto:
+                return self._handle_crypto_query(crypto)
+            elif currency:
+                return self._handle_currency_query(currency)
+            elif parsed.has_any(self.stock_keywords):
+                return self._handle_stock_query()
             else:
                 return self._handle_general_market_info()
-                
+        
         except Exception as e:
             current_app.logger.error(f'Erro no módulo financeiro: {str(e)}')
             return {
@@ -47,15 +53,8 @@ class FinancialMarketModule:
                 'error': str(e)
             }
     
-    def _handle_crypto_query(self, text: str) -> Dict[str, Any]:
+    def _handle_crypto_query(self, crypto: str) -> Dict[str, Any]:
         """Trata consultas sobre criptomoedas"""
-        # Identifica criptomoeda
-        crypto = None
-        for crypto_name, keywords in self.cryptocurrencies.items():
-            if any(keyword in text for keyword in keywords):
-                crypto = crypto_name
-                break
-        
         # Dados simulados (integraria com API real como CoinGecko)
         crypto_data = self._get_mock_crypto_data(crypto)
         
@@ -86,15 +85,8 @@ class FinancialMarketModule:
             'buttons': buttons
         }
     
-    def _handle_currency_query(self, text: str) -> Dict[str, Any]:
+    def _handle_currency_query(self, currency: str) -> Dict[str, Any]:
         """Trata consultas sobre moedas"""
-        # Identifica moeda
-        currency = None
-        for curr_code, keywords in self.currencies.items():
-            if any(keyword in text for keyword in keywords):
-                currency = curr_code
-                break
-        
         # Dados simulados (integraria com API real como ExchangeRate-API)
         currency_data = self._get_mock_currency_data(currency)
         
@@ -124,7 +116,7 @@ class FinancialMarketModule:
             'buttons': buttons
         }
     
-    def _handle_stock_query(self, text: str) -> Dict[str, Any]:
+    def _handle_stock_query(self) -> Dict[str, Any]:
         """Trata consultas sobre ações"""
         # Dados simulados da bolsa angolana
         stock_data = {
@@ -0,0 +1,242 @@
+import hashlib
+import io
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+from flask import Flask, current_app
+from PIL import Image, ImageChops, ImageFilter, ImageStat
+from src.modules.lru_cache import LRUTTLCache
+from src.modules.metrics import get_metrics
+
+# Lado da miniatura usada nas estatísticas (a decodificação JPEG já reduz com draft)
+THUMBNAIL_SIZE = 128
+
+def dhash(image: Image.Image, size: int = 8) -> str:
+    """Hash perceptual por diferença (64 bits em hex): imagens parecidas diferem em poucos bits"""
+    gray = image.convert('L').resize((size + 1, size), Image.BILINEAR)
+    pixels = list(gray.getdata())
+    bits = 0
+    
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    
+    return f'{bits:0{size * size // 4}x}'
+
+def dominant_colors(image: Image.Image, count: int = 4) -> List[Dict[str, Any]]:
+    """Cores predominantes (paleta de 8 cores) com a fração da imagem de cada uma"""
+    quantized = image.quantize(colors=8, method=Image.Quantize.MEDIANCUT)
+    palette = quantized.getpalette()
+    total = quantized.width * quantized.height
+    colors = sorted(quantized.getcolors(), reverse=True)[:count]
+    
+    return [
+        {'hex': '#{:02x}{:02x}{:02x}'.format(*palette[index * 3:index * 3 + 3]), 'share': round(pixels / total, 3)}
+        for pixels, index in colors
+    ]
+
+def band_share(band: Image.Image, low: int, high: int) -> float:
+    """Fração dos pixels da banda com valor entre low e high"""
+    histogram = band.histogram()
+    return sum(histogram[low:high + 1]) / max(1, sum(histogram))
+
+def compute_image_features(data: bytes) -> Dict[str, Any]:
+    """Características baratas da imagem e o tipo provável (document, person, product ou photo)
+    
+    Roda no pool de processos: só Pillow, sem contexto da aplicação.
+    Pessoas têm bastante tom de pele; produtos costumam ter o fundo
+    uniforme e o objeto no centro, diferente das bordas; documentos são
+    claros, pouco saturados e com muitas bordas (texto).
+    """
+    image = Image.open(io.BytesIO(data))
+    width, height, image_format = image.width, image.height, image.format
+    has_exif = bool(image.getexif())
+    
+    image.draft('RGB', (THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2))
+    image = image.convert('RGB')
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    
+    gray = image.convert('L')
+    saturation = image.convert('HSV').getchannel('S')
+    edges = gray.filter(ImageFilter.FIND_EDGES)
+    _, cb, cr = image.convert('YCbCr').split()
+    
+    # Tom de pele no espaço YCbCr (Cb 77-127, Cr 133-173)
+    skin = ImageChops.multiply(cb.point(lambda v: 255 if 77 <= v <= 127 else 0),
+                               cr.point(lambda v: 255 if 133 <= v <= 173 else 0))
+    
+    # Uniformidade do fundo: faixas de 12% nas bordas contra o centro
+    margin_x, margin_y = max(1, gray.width * 12 // 100), max(1, gray.height * 12 // 100)
+    border = [
+        gray.crop((0, 0, gray.width, margin_y)), gray.crop((0, gray.height - margin_y, gray.width, gray.height)),
+        gray.crop((0, 0, margin_x, gray.height)), gray.crop((gray.width - margin_x, 0, gray.width, gray.height))
+    ]
+    center = gray.crop((gray.width // 4, gray.height // 4, gray.width * 3 // 4, gray.height * 3 // 4))
+    border_std = sum(ImageStat.Stat(strip).stddev[0] for strip in border) / len(border)
+    border_mean = sum(ImageStat.Stat(strip).mean[0] for strip in border) / len(border)
+    center_stat = ImageStat.Stat(center)
+    
+    features = {
+        'brightness': round(ImageStat.Stat(gray).mean[0], 1),
+        'contrast': round(ImageStat.Stat(gray).stddev[0], 1),
+        'saturation': round(ImageStat.Stat(saturation).mean[0], 1),
+        'bright_share': round(band_share(gray, 200, 255), 3),
+        'dark_share': round(band_share(gray, 0, 70), 3),
+        'edge_share': round(band_share(edges, 48, 255), 3),
+        'skin_share': round(band_share(skin, 128, 255), 3),
+        'border_std': round(border_std, 1),
+        'center_contrast': round(abs(center_stat.mean[0] - border_mean) + center_stat.stddev[0] - border_std, 1),
+        'has_exif': has_exif
+    }
+    
+    aspect = max(width, height) / max(1, min(width, height))
+    
+    if features['skin_share'] > 0.25:
+        image_type, confidence, description = 'person', 0.6, 'Foto com pessoa'
+    elif features['border_std'] < 20 and features['center_contrast'] > 25:
+        image_type, confidence, description = 'product', 0.65, 'Objeto em fundo uniforme'
+    elif features['saturation'] < 45 and features['bright_share'] > 0.45 and features['edge_share'] > 0.08:
+        # A4 (1.41) e cartões como o BI (1.58) reforçam a hipótese
+        image_type, confidence, description = 'document', 0.8 if 1.3 <= aspect <= 1.7 else 0.7, 'Documento ou texto'
+    else:
+        image_type, confidence, description = 'photo', 0.5, 'Fotografia'
+    
+    return {
+        'type': image_type,
+        'confidence': confidence,
+        'description': description,
+        'width': width,
+        'height': height,
+        'format': image_format,
+        'dominant_colors': dominant_colors(image),
+        'dhash': dhash(image),
+        'features': features
+    }
+
+class ImageAnalyzer:
+    """Baixa e analisa as imagens recebidas fora da thread do webhook
+    
+    prefetch() é chamado já no webhook e só agenda o trabalho: o download
+    roda em um pool de threads e as características (Pillow) em um pool de
+    processos. Cada mídia é baixada uma única vez (o Future fica em cache
+    pelo id) e o resultado fica em cache pelo sha256 do conteúdo, então a
+    mesma foto reenviada por outros usuários não é analisada de novo.
+    
+    analyze() espera o resultado por no máximo timeout segundos; se a
+    análise não terminar a tempo, a mensagem segue só com o texto.
+    """
+    
+    def __init__(self, download: Callable[[str], Optional[bytes]], workers: int = 2, download_workers: int = 4,
+                 timeout: float = 5.0, max_bytes: int = 10 * 1024 * 1024, cache_size: int = 2000,
+                 cache_ttl: float = 86400):
+        self.download = download
+        self.workers = workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self._downloads = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix='imagem')
+        self._pool = None
+        self._by_media = LRUTTLCache(max_size=cache_size, ttl_seconds=cache_ttl)
+        self._by_hash = LRUTTLCache(max_size=cache_size, ttl_seconds=cache_ttl)
+    
+    def prefetch(self, media_id: Optional[str]) -> Optional[Future]:
+        """Agenda o download e a análise da mídia (não bloqueia)"""
+        if not media_id:
+            return None
+        
+        future = Future()
+        if not self._by_media.add(media_id, future):
+            return self._by_media.get(media_id)
+        
+        self._downloads.submit(self._run, media_id, future)
+        return future
+    
+    def analyze(self, media_id: Optional[str], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Resultado da análise, esperando no máximo timeout segundos (None se não houver)"""
+        future = self.prefetch(media_id)
+        if future is None:
+            return None
+        
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            get_metrics().increment('imagens_prazo_esgotado')
+            return None
+    
+    def shutdown(self):
+        self._downloads.shutdown(wait=False)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+    
+    def _run(self, media_id: str, future: Future):
+        try:
+            result = self._analyze_media(media_id)
+        except Exception:
+            result = None
+        
+        # Falhas não ficam em cache: um reenvio da mídia tenta de novo
+        if result is None:
+            self._by_media.delete(media_id)
+        
+        future.set_result(result)
+    
+    def _analyze_media(self, media_id: str) -> Optional[Dict[str, Any]]:
+        data = self.download(media_id)
+        if not data or len(data) > self.max_bytes:
+            return None
+        
+        content_hash = hashlib.sha256(data).hexdigest()
+        cached = self._by_hash.get(content_hash)
+        if cached is not None:
+            return dict(cached, cached=True)
+        
+        if self.workers > 0:
+            result = self._process_pool().submit(compute_image_features, data).result()
+        else:
+            result = compute_image_features(data)
+        
+        result['content_hash'] = content_hash
+        self._by_hash.set(content_hash, result)
+        
+        return result
+    
+    def _process_pool(self) -> ProcessPoolExecutor:
+        # spawn: a aplicação já tem threads, e fork com threads pode herdar travas presas
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+def init_image_analyzer(app: Flask) -> Optional[ImageAnalyzer]:
+    """Cria o analisador de imagens (IMAGE_ANALYSIS_ENABLED=false desliga)
+    
+    O download usa a integração com o WhatsApp e roda nas threads do
+    analisador, por isso dentro do contexto da aplicação.
+    """
+    if not app.config.get('IMAGE_ANALYSIS_ENABLED', True):
+        app.extensions['image_analyzer'] = None
+        return None
+    
+    def download_in_context(media_id):
+        from src.modules.registry import get_whatsapp
+        with app.app_context():
+            data = get_whatsapp().download_media(media_id)
+            if data:
+                get_metrics().increment('imagens_baixadas')
+            return data
+    
+    analyzer = ImageAnalyzer(
+        download=download_in_context,
+        workers=app.config.get('IMAGE_ANALYSIS_WORKERS', 2),
+        download_workers=app.config.get('IMAGE_DOWNLOAD_WORKERS', 4),
+        timeout=app.config.get('IMAGE_ANALYSIS_TIMEOUT', 5.0),
+        max_bytes=app.config.get('IMAGE_ANALYSIS_MAX_BYTES', 10 * 1024 * 1024),
+        cache_size=app.config.get('IMAGE_ANALYSIS_CACHE_SIZE', 2000)
+    )
+    app.extensions['image_analyzer'] = analyzer
+    
+    return analyzer
+
+def get_image_analyzer() -> Optional[ImageAnalyzer]:
+    """Retorna o analisador de imagens da aplicação atual (None se desligado)"""
+    return current_app.extensions.get('image_analyzer')
@@ -0,0 +1,246 @@
+import json
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from flask import Flask, current_app
+from src.modules.deadline import cap_timeout
+from src.modules.metrics import get_metrics
+from src.modules.openai_client import CircuitOpenError, get_openai_client
+
+# Intenções que o OpenAI pode devolver
+OPENAI_INTENTS = (
+    'cadastro_prestador', 'busca_prestador', 'venda_produto', 'busca_produto', 'conexao_pessoal',
+    'achado_perdido', 'reclamacao', 'bolsa_estudo', 'mercado_financeiro', 'pesquisa_geral',
+    'saudacao', 'despedida', 'agradecimento', 'unknown'
+)
+
+BATCH_SYSTEM_PROMPT = (
+    'Você é um assistente especializado em análise de intenções para o sistema Solicite IA em Angola. '
+    'Responda sempre com um array JSON válido.'
+)
+
+def build_batch_prompt(items: List[Tuple[str, Dict]]) -> str:
+    """Instruções uma única vez, seguidas das mensagens numeradas"""
+    lines = [
+        'Analise cada mensagem de usuários do sistema Solicite IA (Angola) e determine a intenção principal '
+        f"({', '.join(OPENAI_INTENTS)}), a categoria específica (se aplicável), a confiança (0.0 a 1.0), "
+        'se requer esclarecimento e o contexto adicional.',
+        '',
+        'Mensagens:'
+    ]
+    
+    for index, (text, entities) in enumerate(items, start=1):
+        lines.append(f'{index}. {json.dumps(text, ensure_ascii=False)} '
+                     f'(entidades: {json.dumps(entities, ensure_ascii=False)})')
+    
+    lines += [
+        '',
+        'Responda APENAS com um array JSON, um objeto por mensagem, na mesma ordem:',
+        '[{"index": 1, "intent": "tipo_da_intencao", "category": "categoria_especifica", "confidence": 0.0, '
+        '"requires_clarification": false, "context": {"missing_info": [], "suggestions": []}}]'
+    ]
+    
+    return '\n'.join(lines)
+
+def parse_batch_response(content: str, size: int) -> List[Optional[Dict[str, Any]]]:
+    """Resultado de cada mensagem, na ordem do lote (None para as que faltarem)"""
+    content = content.strip()
+    if content.startswith('```'):
+        content = content.strip('`')
+        content = content[content.find('\n') + 1:] if '\n' in content else content
+    
+    data = json.loads(content)
+    if isinstance(data, dict):
+        data = next((value for value in data.values() if isinstance(value, list)), [data])
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * size
+    
+    for position, item in enumerate(data):
+        if not isinstance(item, dict):
+            continue
+        
+        index = item.pop('index', position + 1)
+        if isinstance(index, int) and 1 <= index <= size and results[index - 1] is None:
+            item['command_type'] = item.get('intent')
+            results[index - 1] = item
+    
+    return results
+
+def classify_batch_with_openai(items: List[Tuple[str, Dict]]) -> List[Optional[Dict[str, Any]]]:
+    """Classifica várias mensagens em uma única chamada ao OpenAI
+    
+    Mensagens que faltarem na resposta (ou todas, se o array vier inválido)
+    ficam com None e são classificadas sozinhas pelo chamador. Erros da
+    requisição e o disjuntor aberto são propagados: nesse caso não vale a
+    pena repetir a chamada mensagem a mensagem.
+    """
+    metrics = get_metrics()
+    
+    try:
+        response = get_openai_client().create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": build_batch_prompt(items)}
+            ],
+            max_tokens=100 + 150 * len(items),
+            temperature=0.1
+        )
+    
+    except CircuitOpenError:
+        metrics.increment('openai_disjuntor_aberto', len(items))
+        raise
+    
+    except Exception as e:
+        metrics.increment('openai_erros')
+        current_app.logger.error(f'Erro na análise OpenAI em lote: {str(e)}')
+        raise
+    
+    metrics.increment('openai_lotes')
+    metrics.increment('openai_mensagens_em_lote', len(items))
+    
+    try:
+        return parse_batch_response(response.choices[0].message.content, len(items))
+    except (ValueError, TypeError, AttributeError) as e:
+        current_app.logger.warning(f'Resposta em lote inválida do OpenAI: {str(e)}')
+        return [None] * len(items)
+
+class _Batch:
+    """Classificações pendentes dentro da janela"""
+    
+    __slots__ = ('items', 'futures', 'timer')
+    
+    def __init__(self):
+        self.items: List[Tuple[str, Dict]] = []
+        self.futures: List[Future] = []
+        self.timer = None
+
+class IntentBatcher:
+    """Agrupa as classificações pendentes em uma única requisição ao OpenAI
+    
+    A primeira mensagem sem padrão abre uma janela de window_ms; as que
+    chegarem dentro dela (até max_batch) vão na mesma requisição, que envia
+    as instruções uma única vez e recebe um array JSON. Cada chamador espera
+    apenas o seu resultado. Um lote cheio é enviado na hora, pela thread que
+    o completou.
+    
+    O agrupamento é por processo, como o das rajadas de mensagens.
+    """
+    
+    def __init__(self, window_ms: int = 20, max_batch: int = 8, timeout: float = 10.0,
+                 classify_batch: Optional[Callable[[List[Tuple[str, Dict]]], List[Optional[Dict]]]] = None):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.classify_batch = classify_batch
+        self._batch = None
+        self._lock = threading.Lock()
+    
+    def submit(self, text: str, entities: Dict) -> Future:
+        """Adiciona a mensagem ao lote aberto; o Future recebe a classificação (ou None)"""
+        future = Future()
+        
+        with self._lock:
+            batch = self._batch
+            if batch is None:
+                batch = _Batch()
+                batch.timer = threading.Timer(self.window, self._fire, args=(batch,))
+                batch.timer.daemon = True
+                self._batch = batch
+                batch.timer.start()
+            
+            batch.items.append((text, entities))
+            batch.futures.append(future)
+            
+            full = len(batch.items) >= self.max_batch
+            if full:
+                batch.timer.cancel()
+                self._batch = None
+        
+        if full:
+            self._emit(batch)
+        
+        return future
+    
+    def classify(self, text: str, entities: Dict,
+                 fallback: Optional[Callable[[str, Dict], Optional[Dict]]] = None) -> Optional[Dict[str, Any]]:
+        """Classificação da mensagem, esperando o lote (None em caso de erro ou prazo)
+        
+        A espera respeita o orçamento da mensagem; o lote em si segue com o
+        prazo completo, pois serve outras mensagens. Se a resposta do lote
+        chegou sem esta mensagem, ela é classificada sozinha pelo fallback.
+        """
+        try:
+            result = self.submit(text, entities).result(timeout=self.window + cap_timeout(self.timeout))
+        except FutureTimeoutError:
+            current_app.logger.error('Prazo esgotado aguardando a classificação em lote')
+            return None
+        except Exception:
+            # Requisição do lote falhou (já registrada por quem classificou)
+            return None
+        
+        if result is None and fallback is not None:
+            get_metrics().increment('openai_lote_individual')
+            return fallback(text, entities)
+        
+        return result
+    
+    def flush(self):
+        """Envia imediatamente o lote aberto, se houver"""
+        with self._lock:
+            batch = self._batch
+            self._batch = None
+            if batch is not None:
+                batch.timer.cancel()
+        
+        if batch is not None:
+            self._emit(batch)
+    
+    def _fire(self, batch: _Batch):
+        """Fim da janela"""
+        with self._lock:
+            if self._batch is not batch:
+                return
+            self._batch = None
+        
+        self._emit(batch)
+    
+    def _emit(self, batch: _Batch):
+        try:
+            results = self.classify_batch(batch.items)
+        except Exception as e:
+            for future in batch.futures:
+                future.set_exception(e)
+            return
+        
+        for future, result in zip(batch.futures, results):
+            future.set_result(result)
+
+def init_intent_batcher(app: Flask) -> Optional[IntentBatcher]:
+    """Cria o agrupador de classificações (OPENAI_BATCH_WINDOW_MS=0 desliga)
+    
+    O lote pode ser enviado pela thread do timer, por isso a chamada roda
+    dentro do contexto da aplicação.
+    """
+    window_ms = app.config.get('OPENAI_BATCH_WINDOW_MS', 0)
+    if window_ms <= 0:
+        app.extensions['intent_batcher'] = None
+        return None
+    
+    def classify_in_context(items):
+        with app.app_context():
+            return classify_batch_with_openai(items)
+    
+    batcher = IntentBatcher(
+        window_ms=window_ms,
+        max_batch=app.config.get('OPENAI_BATCH_MAX_SIZE', 8),
+        timeout=app.config.get('OPENAI_TIMEOUT', 8.0),
+        classify_batch=classify_in_context
+    )
+    app.extensions['intent_batcher'] = batcher
+    
+    return batcher
+
+def get_intent_batcher() -> Optional[IntentBatcher]:
+    """Retorna o agrupador de classificações da aplicação atual (None se desligado)"""
+    return current_app.extensions.get('intent_batcher')
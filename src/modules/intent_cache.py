@@ -0,0 +1,94 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+from flask import Flask, current_app
+from src.modules.lru_cache import LRUTTLCache
+from src.modules.metrics import get_metrics
+
+class IntentCache:
+    """Cache das classificações de intenção feitas pelo OpenAI
+    
+    A chave é o texto normalizado mais as entidades extraídas, então a mesma
+    pergunta com outra capitalização, acentuação ou pontuação reaproveita a
+    resposta. O nível local é um LRU com TTL; com Redis, um segundo nível é
+    compartilhado entre processos e sobrevive a reinícios.
+    
+    Os acertos e faltas ficam nos contadores da aplicação:
+    cache_intencao_hit_local, cache_intencao_hit_redis e cache_intencao_miss.
+    """
+    
+    REDIS_PREFIX = 'solicite_ia:intent:'
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: int = 86400, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUTTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.redis = None
+        
+        if redis_url:
+            import redis
+            self.redis = redis.Redis.from_url(redis_url)
+    
+    @staticmethod
+    def make_key(normalized_text: str, entities: Dict[str, List[str]]) -> str:
+        """Chave estável para o texto normalizado e as entidades (ordem irrelevante)"""
+        payload = json.dumps(
+            [normalized_text, {entity: sorted(values) for entity, values in entities.items()}],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Classificação armazenada (uma cópia nova a cada chamada) ou None"""
+        metrics = get_metrics()
+        
+        cached = self.local.get(key)
+        if cached is not None:
+            metrics.increment('cache_intencao_hit_local')
+            return json.loads(cached)
+        
+        if self.redis is not None:
+            try:
+                cached = self.redis.get(f'{self.REDIS_PREFIX}{key}')
+            except Exception as e:
+                current_app.logger.error(f'Erro ao consultar cache de intenções no Redis: {str(e)}')
+                cached = None
+            
+            if cached is not None:
+                metrics.increment('cache_intencao_hit_redis')
+                cached = cached.decode('utf-8')
+                self.local.set(key, cached)
+                return json.loads(cached)
+        
+        metrics.increment('cache_intencao_miss')
+        return None
+    
+    def set(self, key: str, analysis: Dict[str, Any]):
+        """Armazena a classificação nos dois níveis"""
+        serialized = json.dumps(analysis, ensure_ascii=False)
+        self.local.set(key, serialized)
+        
+        if self.redis is not None:
+            try:
+                self.redis.set(f'{self.REDIS_PREFIX}{key}', serialized, ex=self.ttl_seconds)
+            except Exception as e:
+                current_app.logger.error(f'Erro ao gravar cache de intenções no Redis: {str(e)}')
+
+def init_intent_cache(app: Flask) -> Optional[IntentCache]:
+    """Cria o cache de intenções da aplicação (INTENT_CACHE_BACKEND='none' desliga)"""
+    backend = app.config.get('INTENT_CACHE_BACKEND', 'memory')
+    if backend == 'none':
+        app.extensions['intent_cache'] = None
+        return None
+    
+    cache = IntentCache(
+        max_size=app.config.get('INTENT_CACHE_MAX_SIZE', 10000),
+        ttl_seconds=app.config.get('INTENT_CACHE_TTL', 86400),
+        redis_url=app.config.get('REDIS_URL') if backend == 'redis' else None
+    )
+    app.extensions['intent_cache'] = cache
+    
+    return cache
+
+def get_intent_cache() -> Optional[IntentCache]:
+    """Retorna o cache de intenções da aplicação atual (None se desligado)"""
+    return current_app.extensions.get('intent_cache')
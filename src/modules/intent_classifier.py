@@ -0,0 +1,170 @@
+import gzip
+import json
+import math
+import os
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from flask import Flask, current_app
+
+class NaiveBayesIntentClassifier:
+    """Naive Bayes multinomial sobre n-gramas de caracteres com hashing, em Python puro
+    
+    Treinado com o histórico de Conversa (mensagem -> intenção detectada).
+    Os n-gramas do texto normalizado são mapeados para n_features posições
+    com crc32 (estável entre processos). Só as posições vistas no treino
+    guardam pesos, então a predição percorre apenas os n-gramas da mensagem:
+        
+        score(c) = log P(c) + total * log(alpha / (N_c + alpha * V))
+                   + soma(contagem_f * log(1 + n_cf / alpha))
+    
+    A confiança é a probabilidade a posteriori da classe vencedora.
+    """
+    
+    FORMAT_VERSION = 1
+    
+    def __init__(self, n_features: int = 2 ** 20, ngram_min: int = 2, ngram_max: int = 4, alpha: float = 0.5):
+        self.n_features = n_features
+        self.ngram_min = ngram_min
+        self.ngram_max = ngram_max
+        self.alpha = alpha
+        self.labels: List[str] = []
+        self.bias: List[float] = []
+        self.unseen: List[float] = []
+        self.weights: Dict[int, List[Tuple[int, float]]] = {}
+    
+    def features(self, normalized_text: str) -> Counter:
+        """Contagem dos n-gramas de caracteres (com espaço nas bordas das palavras)"""
+        text = f' {normalized_text} '
+        counts = Counter()
+        
+        for size in range(self.ngram_min, self.ngram_max + 1):
+            for start in range(len(text) - size + 1):
+                gram = text[start:start + size]
+                counts[zlib.crc32(gram.encode('utf-8')) % self.n_features] += 1
+        
+        return counts
+    
+    def fit(self, texts: Iterable[str], labels: Iterable[str]) -> 'NaiveBayesIntentClassifier':
+        """Treina com textos normalizados e suas intenções"""
+        class_counts = Counter()
+        feature_counts: Dict[str, Counter] = {}
+        
+        for text, label in zip(texts, labels):
+            class_counts[label] += 1
+            feature_counts.setdefault(label, Counter()).update(self.features(text))
+        
+        self.labels = sorted(class_counts)
+        total_docs = sum(class_counts.values())
+        self.bias = [math.log(class_counts[label] / total_docs) for label in self.labels]
+        self.unseen = [
+            math.log(self.alpha / (sum(feature_counts[label].values()) + self.alpha * self.n_features))
+            for label in self.labels
+        ]
+        
+        self.weights = {}
+        for index, label in enumerate(self.labels):
+            for feature, count in feature_counts[label].items():
+                self.weights.setdefault(feature, []).append((index, math.log(1 + count / self.alpha)))
+        
+        return self
+    
+    def predict(self, normalized_text: str) -> Tuple[Optional[str], float]:
+        """Intenção mais provável e sua probabilidade"""
+        if not self.labels or not normalized_text:
+            return None, 0.0
+        
+        counts = self.features(normalized_text)
+        total = sum(counts.values())
+        scores = [bias + total * unseen for bias, unseen in zip(self.bias, self.unseen)]
+        
+        for feature, count in counts.items():
+            for index, weight in self.weights.get(feature, ()):
+                scores[index] += count * weight
+        
+        best = max(range(len(scores)), key=scores.__getitem__)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores)
+        
+        return self.labels[best], 1.0 / normalizer
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': self.FORMAT_VERSION,
+            'n_features': self.n_features,
+            'ngram_min': self.ngram_min,
+            'ngram_max': self.ngram_max,
+            'alpha': self.alpha,
+            'labels': self.labels,
+            'bias': self.bias,
+            'unseen': self.unseen,
+            'weights': {str(feature): weights for feature, weights in self.weights.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'NaiveBayesIntentClassifier':
+        if data.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Versão de modelo não suportada: {data.get('version')}")
+        
+        model = cls(data['n_features'], data['ngram_min'], data['ngram_max'], data['alpha'])
+        model.labels = data['labels']
+        model.bias = data['bias']
+        model.unseen = data['unseen']
+        model.weights = {
+            int(feature): [(index, weight) for index, weight in weights]
+            for feature, weights in data['weights'].items()
+        }
+        
+        return model
+    
+    def save(self, path: str):
+        """Grava o modelo em JSON compactado com gzip"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+    
+    @classmethod
+    def load(cls, path: str) -> 'NaiveBayesIntentClassifier':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+def evaluate(model: NaiveBayesIntentClassifier, texts: List[str], labels: List[str],
+             thresholds: Iterable[float]) -> List[Dict[str, float]]:
+    """Acurácia e taxa de fallback (mensagens que iriam para o OpenAI) por limiar"""
+    predictions = [model.predict(text) for text in texts]
+    report = []
+    
+    for threshold in thresholds:
+        answered = [(predicted, label) for (predicted, confidence), label in zip(predictions, labels)
+                    if confidence >= threshold]
+        correct = sum(1 for predicted, label in answered if predicted == label)
+        
+        report.append({
+            'threshold': threshold,
+            'accuracy': correct / len(answered) if answered else 0.0,
+            'fallback_rate': 1 - len(answered) / len(texts) if texts else 1.0
+        })
+    
+    return report
+
+def init_intent_classifier(app: Flask) -> Optional[NaiveBayesIntentClassifier]:
+    """Carrega o classificador local treinado (INTENT_CLASSIFIER_PATH), se existir"""
+    path = app.config.get('INTENT_CLASSIFIER_PATH')
+    model = None
+    
+    if path and os.path.exists(path):
+        try:
+            model = NaiveBayesIntentClassifier.load(path)
+            app.logger.info(f'Classificador local de intenções carregado: {len(model.labels)} intenções')
+        except Exception as e:
+            app.logger.error(f'Erro ao carregar classificador local de intenções: {str(e)}')
+    
+    app.extensions['intent_classifier'] = model
+    
+    return model
+
+def get_intent_classifier() -> Optional[NaiveBayesIntentClassifier]:
+    """Retorna o classificador local da aplicação atual (None se não houver modelo)"""
+    return current_app.extensions.get('intent_classifier')
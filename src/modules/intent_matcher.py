@@ -0,0 +1,68 @@
+import re
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Início literal de um padrão, antes do primeiro metacaractere
+LITERAL_PREFIX = re.compile(r'[a-z0-9 ]+')
+
+def literal_prefix(pattern: str) -> str:
+    """Texto que todo casamento do padrão contém (prefixo literal), ou '' se não houver"""
+    match = LITERAL_PREFIX.match(pattern)
+    if not match:
+        return ''
+    
+    prefix = match.group()
+    
+    # Um quantificador logo depois torna o último caractere opcional
+    if pattern[match.end():match.end() + 1] in ('?', '*', '{'):
+        prefix = prefix[:-1]
+    
+    return prefix.strip()
+
+class IntentMatcher:
+    """Detecção de comandos com padrões pré-compilados e filtro por palavra-chave
+    
+    Equivale a testar os padrões um a um, na ordem de command_patterns, e
+    ficar com o primeiro que casa. Cada padrão só é executado se o texto
+    contém o seu prefixo literal ('procur', 'quero', 'bitcoin'...); como
+    vários padrões compartilham o mesmo prefixo, cada palavra-chave é
+    procurada uma única vez. Uma mensagem sem comando normalmente não executa
+    nenhuma expressão regular.
+    """
+    
+    def __init__(self, command_patterns: Mapping[str, Sequence[str]], flags: int = re.IGNORECASE):
+        self.entries: List[Tuple[str, str, re.Pattern]] = []
+        self.keywords: Dict[str, List[int]] = {}
+        self.unfiltered: List[int] = []
+        
+        for command_type, patterns in command_patterns.items():
+            for pattern in patterns:
+                index = len(self.entries)
+                self.entries.append((command_type, pattern, re.compile(pattern, flags)))
+                
+                keyword = literal_prefix(pattern)
+                if keyword:
+                    self.keywords.setdefault(keyword, []).append(index)
+                else:
+                    self.unfiltered.append(index)
+    
+    def candidates(self, text: str) -> List[int]:
+        """Índices dos padrões que podem casar, em ordem de prioridade"""
+        text = text.lower()
+        indexes = list(self.unfiltered)
+        
+        for keyword, keyword_indexes in self.keywords.items():
+            if keyword in text:
+                indexes.extend(keyword_indexes)
+        
+        indexes.sort()
+        return indexes
+    
+    def match(self, text: str) -> Optional[Tuple[str, str, re.Match]]:
+        """Retorna (tipo de comando, padrão, casamento) do primeiro padrão que casa"""
+        for index in self.candidates(text):
+            command_type, pattern, compiled = self.entries[index]
+            match = compiled.search(text)
+            if match:
+                return command_type, pattern, match
+        
+        return None
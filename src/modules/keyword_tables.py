@@ -0,0 +1,165 @@
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+def freeze(table: Any) -> Any:
+    """Converte uma tabela de palavras-chave em estrutura imutável
+    
+    Dicionários viram MappingProxyType e listas viram tuplas, recursivamente.
+    As tabelas são atributos de classe compartilhados por todas as instâncias
+    e threads, por isso não podem ser alteradas.
+    """
+    if isinstance(table, dict):
+        return MappingProxyType({key: freeze(value) for key, value in table.items()})
+    
+    if isinstance(table, (list, tuple)):
+        return tuple(freeze(value) for value in table)
+    
+    return table
+
+@lru_cache(maxsize=None)
+def plural_forms(keyword: str) -> Tuple[str, ...]:
+    """Plurais regulares da última palavra da palavra-chave
+    
+    carro -> carros, dolar -> dolares, movel -> moveis, acao -> acoes/aes/aos,
+    fuzil -> fuzis/fuzeis, armazem -> armazens. Palavras com menos de 3 letras
+    (siglas como 'tv' e 'bi') não ganham plural.
+    """
+    head, _, last = keyword.rpartition(' ')
+    if len(last) < 3 or not last.isalpha():
+        return ()
+    
+    if last.endswith('ao'):
+        forms = [last[:-2] + 'oes', last[:-2] + 'aes', last + 's']
+    elif last.endswith('il'):
+        forms = [last[:-2] + 'is', last[:-2] + 'eis']
+    elif last.endswith('l'):
+        forms = [last[:-1] + 'is']
+    elif last.endswith('m'):
+        forms = [last[:-1] + 'ns']
+    elif last[-1] in 'rsz':
+        forms = [last + 'es']
+    else:
+        forms = [last + 's']
+    
+    prefix = f'{head} ' if head else ''
+    return tuple(prefix + form for form in forms)
+
+class KeywordTable(Mapping):
+    """Tabela categoria -> palavras-chave, imutável e registrada no gazetteer
+    
+    Funciona como o dicionário congelado de sempre; o nome identifica a
+    tabela nos resultados da varredura (ParsedMessage.hits).
+    """
+    
+    def __init__(self, name: str, table: Dict[str, List[str]]):
+        self.name = name
+        self._table = freeze(table)
+    
+    def __getitem__(self, key: str) -> Tuple[str, ...]:
+        return self._table[key]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table)
+    
+    def __len__(self) -> int:
+        return len(self._table)
+    
+    def __repr__(self) -> str:
+        return f'KeywordTable({self.name!r})'
+
+class Gazetteer:
+    """Autômato Aho-Corasick com as tabelas de palavras-chave de todos os módulos
+    
+    Uma única passada pelo texto normalizado encontra todas as ocorrências
+    (tabela, categoria). As palavras-chave são indexadas entre espaços
+    (' tv ') e o texto é varrido com um espaço em cada ponta, então só
+    palavras inteiras casam: 'tv' não casa dentro de 'tvi' nem 'bi' dentro
+    de 'bicicleta'. Os plurais regulares de cada palavra-chave também são
+    indexados ('carros', 'dolares', 'documentos').
+    """
+    
+    def __init__(self):
+        self.tables: Dict[str, KeywordTable] = {}
+        self._automaton = None
+        self._lock = threading.Lock()
+    
+    def add(self, table: KeywordTable):
+        """Registra uma tabela (o autômato é recompilado no próximo uso)"""
+        with self._lock:
+            self.tables[table.name] = table
+            self._automaton = None
+    
+    def compile(self):
+        """Monta o autômato com todas as tabelas registradas"""
+        with self._lock:
+            if self._automaton is None:
+                self._automaton = self._build()
+            return self._automaton
+    
+    def _build(self):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Tuple[str, str]]] = [[]]
+        
+        for name, table in self.tables.items():
+            for key, keywords in table.items():
+                for keyword in keywords:
+                    keyword = keyword.lower()
+                    for form in (keyword,) + plural_forms(keyword):
+                        state = 0
+                        for char in f' {form} ':
+                            next_state = goto[state].get(char)
+                            if next_state is None:
+                                next_state = len(goto)
+                                goto[state][char] = next_state
+                                goto.append({})
+                                outputs.append([])
+                            state = next_state
+                        if (name, key) not in outputs[state]:
+                            outputs[state].append((name, key))
+        
+        # Ligações de falha em largura; cada estado herda as saídas do seu sufixo
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        
+        for state in queue:
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                
+                target = goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+        
+        return goto, fail, outputs
+    
+    def scan(self, text: str) -> Dict[str, Set[str]]:
+        """Categorias encontradas no texto normalizado, por tabela"""
+        goto, fail, outputs = self._automaton or self.compile()
+        hits: Dict[str, Set[str]] = {}
+        state = 0
+        
+        for char in f' {text} ':
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            
+            for name, key in outputs[state]:
+                hits.setdefault(name, set()).add(key)
+        
+        return hits
+
+# Gazetteer único do processo; as tabelas se registram ao definir as classes dos módulos
+GAZETTEER = Gazetteer()
+
+def keyword_table(name: str, table: Dict[str, List[str]]) -> KeywordTable:
+    """Cria uma tabela de palavras-chave e a registra no gazetteer"""
+    registered = KeywordTable(name, table)
+    GAZETTEER.add(registered)
+    
+    return registered
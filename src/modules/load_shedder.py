@@ -0,0 +1,136 @@
+import threading
+import time
+from typing import List, Optional
+from flask import Flask, current_app, g, has_app_context
+
+class LoadShedder:
+    """Limita o trabalho em andamento e decide quando operar em modo degradado
+    
+    Localmente conta as mensagens agendadas nas faixas e ainda não
+    concluídas; no modo Celery com broker Redis também considera o tamanho
+    das filas. Acima de max_* o webhook recusa novas mensagens (503, o
+    WhatsApp reenvia depois); acima de degrade_* as mensagens são
+    processadas no modo degradado (sem OpenAI, respostas prontas para
+    módulos caros e escritas não essenciais adiadas).
+    """
+    
+    QUEUE_DEPTH_CACHE_SECONDS = 1.0
+    
+    def __init__(self, max_pending: int = 200, degrade_pending: int = 50,
+                 max_queue_depth: int = 0, degrade_queue_depth: int = 0,
+                 broker_url: Optional[str] = None, queue_names: Optional[List[str]] = None,
+                 force_degraded: bool = False):
+        self.max_pending = max_pending
+        self.degrade_pending = degrade_pending
+        self.max_queue_depth = max_queue_depth
+        self.degrade_queue_depth = degrade_queue_depth
+        self.queue_names = queue_names or []
+        self.force_degraded = force_degraded
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._queue_depth = 0
+        self._queue_depth_at = 0.0
+        self.redis = None
+        
+        if broker_url and broker_url.startswith('redis') and (max_queue_depth or degrade_queue_depth):
+            import redis
+            self.redis = redis.Redis.from_url(broker_url)
+    
+    @property
+    def pending(self) -> int:
+        return self._pending
+    
+    def task_started(self):
+        """Mensagem agendada para processamento local"""
+        with self._lock:
+            self._pending += 1
+    
+    def task_finished(self):
+        """Mensagem local concluída"""
+        with self._lock:
+            self._pending = max(self._pending - 1, 0)
+    
+    def queue_depth(self) -> int:
+        """Total de mensagens nas filas do broker (consultado no máximo uma vez por segundo)"""
+        if self.redis is None:
+            return 0
+        
+        now = time.monotonic()
+        if now - self._queue_depth_at < self.QUEUE_DEPTH_CACHE_SECONDS:
+            return self._queue_depth
+        
+        try:
+            pipe = self.redis.pipeline()
+            for name in self.queue_names:
+                pipe.llen(name)
+            self._queue_depth = sum(pipe.execute())
+        except Exception as e:
+            current_app.logger.error(f'Erro ao consultar tamanho da fila: {str(e)}')
+        
+        self._queue_depth_at = now
+        return self._queue_depth
+    
+    def should_shed(self) -> bool:
+        """Indica se novas mensagens devem ser recusadas"""
+        if self.max_pending and self._pending >= self.max_pending:
+            return True
+        
+        return bool(self.max_queue_depth) and self.queue_depth() >= self.max_queue_depth
+    
+    def degraded(self) -> bool:
+        """Indica se a carga atual exige o modo degradado"""
+        if self.force_degraded:
+            return True
+        
+        if self.degrade_pending and self._pending >= self.degrade_pending:
+            return True
+        
+        return bool(self.degrade_queue_depth) and self.queue_depth() >= self.degrade_queue_depth
+
+def init_load_shedder(app: Flask) -> LoadShedder:
+    """Cria o controle de carga da aplicação
+    
+    No modo Celery as mensagens não passam pelas faixas do processo web e o
+    contador local fica em zero: sem limite de fila configurado, valem os
+    mesmos limites aplicados ao tamanho das filas do broker.
+    """
+    base_queue = app.config.get('CELERY_MESSAGE_QUEUE', 'mensagens')
+    lane_queues = app.config.get('CELERY_LANE_QUEUES', 0)
+    queue_names = [base_queue] + [f'{base_queue}.{i}' for i in range(lane_queues)]
+    
+    max_pending = app.config.get('LOAD_SHED_MAX_PENDING', 200)
+    degrade_pending = app.config.get('LOAD_DEGRADE_PENDING', 50)
+    max_queue_depth = app.config.get('LOAD_SHED_MAX_QUEUE_DEPTH')
+    degrade_queue_depth = app.config.get('LOAD_DEGRADE_QUEUE_DEPTH')
+    broker_url = app.config.get('CELERY_BROKER_URL')
+    
+    if app.config.get('MESSAGE_PROCESSING_MODE') == 'celery':
+        max_queue_depth = max_pending if max_queue_depth is None else max_queue_depth
+        degrade_queue_depth = degrade_pending if degrade_queue_depth is None else degrade_queue_depth
+        if not (broker_url or '').startswith('redis'):
+            app.logger.warning('Broker sem suporte à consulta do tamanho da fila: controle de carga inativo')
+    
+    shedder = LoadShedder(
+        max_pending=max_pending,
+        degrade_pending=degrade_pending,
+        max_queue_depth=max_queue_depth or 0,
+        degrade_queue_depth=degrade_queue_depth or 0,
+        broker_url=broker_url,
+        queue_names=queue_names,
+        force_degraded=app.config.get('DEGRADED_MODE_FORCE', False)
+    )
+    app.extensions['load_shedder'] = shedder
+    
+    return shedder
+
+def get_load_shedder() -> LoadShedder:
+    """Retorna o controle de carga da aplicação atual"""
+    return current_app.extensions['load_shedder']
+
+def mark_degraded(degraded: bool):
+    """Define o modo da mensagem em processamento (vale para o contexto atual)"""
+    g.degraded = degraded
+
+def is_degraded() -> bool:
+    """Indica se a mensagem em processamento está no modo degradado"""
+    return has_app_context() and g.get('degraded', False)
@@ -1,6 +1,10 @@
 from typing import Dict, Any, List
 from flask import current_app
 from src.models import db, User, AchadoPerdido, Conversa
+from src.modules.keyword_tables import freeze, keyword_table
+from src.modules.deadline import search_limit
+from src.modules.parsed_message import ParsedMessage, get_parsed
+from src.modules.places import PLACES, location_filter
 import json
 import re
 from datetime import datetime, date
@@ -8,33 +12,42 @@ from datetime import datetime, date
 class LostFoundModule:
     """Módulo para gerenciar achados e perdidos"""
     
-    def __init__(self):
-        self.categories = {
-            'documento': ['carteira', 'bi', 'passaporte', 'carta', 'conducao', 'identidade', 'cedula', 'documento'],
-            'animal': ['cao', 'cachorro', 'gato', 'passaro', 'animal', 'pet', 'bicho'],
-            'objeto_pessoal': ['chave', 'carteira', 'bolsa', 'mala', 'mochila', 'oculos', 'relogio'],
-            'eletronico': ['telefone', 'celular', 'smartphone', 'tablet', 'laptop', 'computador', 'camera'],
-            'veiculo': ['carro', 'moto', 'bicicleta', 'bike', 'automovel', 'motocicleta'],
-            'joia': ['anel', 'colar', 'pulseira', 'brinco', 'joia', 'ouro', 'prata'],
-            'roupa': ['camisa', 'calca', 'vestido', 'sapato', 'tenis', 'roupa', 'casaco'],
-            'outros': ['outro', 'diversos', 'varios']
-        }
-        
-        self.urgency_keywords = ['urgente', 'importante', 'preciso', 'desesperado', 'ajuda']
+    categories = keyword_table('lost_found.categories', {
+        'documento': ['carteira', 'bi', 'passaporte', 'carta', 'conducao', 'identidade', 'cedula', 'documento'],
+        'animal': ['cao', 'cachorro', 'gato', 'passaro', 'animal', 'pet', 'bicho'],
+        'objeto_pessoal': ['chave', 'carteira', 'bolsa', 'mala', 'mochila', 'oculos', 'relogio'],
+        'eletronico': ['telefone', 'celular', 'smartphone', 'tablet', 'laptop', 'computador', 'camera'],
+        'veiculo': ['carro', 'moto', 'bicicleta', 'bike', 'automovel', 'motocicleta'],
+        'joia': ['anel', 'colar', 'pulseira', 'brinco', 'joia', 'ouro', 'prata'],
+        'roupa': ['camisa', 'calca', 'vestido', 'sapato', 'tenis', 'roupa', 'casaco'],
+        'outros': ['outro', 'diversos', 'varios']
+    })
+    
+    urgency_keywords = freeze(['urgente', 'importante', 'preciso', 'desesperado', 'ajuda'])
+    
+    lost_indicators = freeze(['perdi', 'perdeu', 'perdido', 'perdida', 'sumiu', 'desapareceu', 'nao encontro'])
+    
+    found_indicators = freeze(['encontrei', 'encontrado', 'encontrada', 'achei', 'achado', 'achada', 'encontrou'])
+    
+    characteristics = freeze({
+        'cor': ['preto', 'branco', 'azul', 'vermelho', 'verde', 'amarelo', 'rosa', 'roxo', 'marrom', 'cinza'],
+        'marca': ['samsung', 'iphone', 'apple', 'huawei', 'xiaomi', 'lg', 'sony', 'nokia'],
+        'tamanho': ['pequeno', 'medio', 'grande', 'mini', 'gigante']
+    })
     
     def process_message(self, nlp_result: Dict[str, Any], user: User, conversa: Conversa) -> Dict[str, Any]:
         """Processa mensagem relacionada a achados e perdidos"""
         try:
-            text = nlp_result.get('text', '')
+            parsed = get_parsed(nlp_result)
             
             # Determina se é item perdido ou encontrado
-            if self._is_lost_item(text):
+            if self._is_lost_item(parsed):
                 return self._handle_lost_item(nlp_result, user, conversa)
-            elif self._is_found_item(text):
+            elif self._is_found_item(parsed):
                 return self._handle_found_item(nlp_result, user, conversa)
             else:
                 return self._handle_general_inquiry(nlp_result, user, conversa)
-                
+        
         except Exception as e:
             current_app.logger.error(f'Erro no módulo achados e perdidos: {str(e)}')
             return {
@@ -43,17 +56,13 @@ class LostFoundModule:
                 'error': str(e)
             }
     
-    def _is_lost_item(self, text: str) -> bool:
+    def _is_lost_item(self, parsed: ParsedMessage) -> bool:
         """Determina se é um item perdido"""
-        lost_indicators = ['perdi', 'perdeu', 'perdido', 'sumiu', 'desapareceu', 'nao encontro']
-        text_lower = text.lower()
-        return any(indicator in text_lower for indicator in lost_indicators)
+        return parsed.has_any(self.lost_indicators)
     
-    def _is_found_item(self, text: str) -> bool:
+    def _is_found_item(self, parsed: ParsedMessage) -> bool:
         """Determina se é um item encontrado"""
-        found_indicators = ['encontrei', 'encontrado', 'achei', 'achado', 'encontrou']
-        text_lower = text.lower()
-        return any(indicator in text_lower for indicator in found_indicators)
+        return parsed.has_any(self.found_indicators)
     
     def _handle_lost_item(self, nlp_result: Dict, user: User, conversa: Conversa) -> Dict[str, Any]:
         """Trata registro de item perdido"""
@@ -61,7 +70,7 @@ class LostFoundModule:
         entities = nlp_result.get('entities', {})
         
         # Extrai informações do item perdido
-        item_info = self._extract_item_info(text, entities, 'perdido')
+        item_info = self._extract_item_info(text, get_parsed(nlp_result), entities, 'perdido')
         
         if not item_info.get('object'):
             return {
@@ -86,7 +95,7 @@ class LostFoundModule:
         entities = nlp_result.get('entities', {})
         
         # Extrai informações do item encontrado
-        item_info = self._extract_item_info(text, entities, 'encontrado')
+        item_info = self._extract_item_info(text, get_parsed(nlp_result), entities, 'encontrado')
         
         if not item_info.get('object'):
             return {
@@ -105,7 +114,7 @@ class LostFoundModule:
         # Solicita informações adicionais
         return self._request_found_item_details(item_info, user, conversa)
     
-    def _extract_item_info(self, text: str, entities: Dict, tipo: str) -> Dict[str, Any]:
+    def _extract_item_info(self, text: str, parsed: ParsedMessage, entities: Dict, tipo: str) -> Dict[str, Any]:
         """Extrai informações do item"""
         info = {'tipo': tipo}
         
@@ -113,7 +122,7 @@ class LostFoundModule:
         info['object'] = self._extract_object(text, tipo)
         
         # Extrai categoria
-        info['category'] = self._extract_category(text)
+        info['category'] = self._extract_category(parsed)
         
         # Extrai localização
         locations = entities.get('localizacao', [])
@@ -123,13 +132,14 @@ class LostFoundModule:
             info['location'] = self._extract_location_from_text(text)
         
         # Extrai características
-        info['characteristics'] = self._extract_characteristics(text)
+        info['characteristics'] = self._extract_characteristics(parsed)
         
         # Verifica urgência
-        info['urgent'] = self._is_urgent(text)
+        info['urgent'] = self._is_urgent(parsed)
         
-        # Extrai data (se mencionada)
-        info['date'] = self._extract_date(text)
+        # Extrai data (já interpretada pelo NLP; padrão: hoje)
+        dates = parsed.typed('data')
+        info['date'] = dates[0] if dates else date.today()
         
         return info
     
@@ -160,16 +170,9 @@ class LostFoundModule:
         
         return None
     
-    def _extract_category(self, text: str) -> str:
+    def _extract_category(self, parsed: ParsedMessage) -> str:
         """Extrai categoria do item"""
-        text_lower = text.lower()
-        
-        for category, keywords in self.categories.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    return category
-        
-        return 'outros'
+        return parsed.first_key(self.categories) or 'outros'
     
     def _extract_location_from_text(self, text: str) -> str:
         """Extrai localização do texto"""
@@ -184,78 +187,25 @@ class LostFoundModule:
             if match:
                 location = match.group(1).strip()
                 if len(location) > 2:
-                    return location
+                    place = PLACES.resolve(location)
+                    return place.nome if place else location
         
         return None
     
-    def _extract_characteristics(self, text: str) -> Dict[str, str]:
-        """Extrai características do item"""
+    def _extract_characteristics(self, parsed: ParsedMessage) -> Dict[str, str]:
+        """Extrai características do item (cor, marca e tamanho)"""
         characteristics = {}
         
-        # Cor
-        colors = ['preto', 'branco', 'azul', 'vermelho', 'verde', 'amarelo', 'rosa', 'roxo', 'marrom', 'cinza']
-        for color in colors:
-            if color in text.lower():
-                characteristics['cor'] = color
-                break
-        
-        # Marca
-        brands = ['samsung', 'iphone', 'apple', 'huawei', 'xiaomi', 'lg', 'sony', 'nokia']
-        for brand in brands:
-            if brand in text.lower():
-                characteristics['marca'] = brand
-                break
-        
-        # Tamanho
-        sizes = ['pequeno', 'medio', 'grande', 'mini', 'gigante']
-        for size in sizes:
-            if size in text.lower():
-                characteristics['tamanho'] = size
-                break
+        for characteristic, values in self.characteristics.items():
+            value = parsed.first(values)
+            if value:
+                characteristics[characteristic] = value
         
         return characteristics
     
-    def _is_urgent(self, text: str) -> bool:
+    def _is_urgent(self, parsed: ParsedMessage) -> bool:
         """Verifica se é urgente"""
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in self.urgency_keywords)
-    
-    def _extract_date(self, text: str) -> date:
-        """Extrai data da ocorrência"""
-        # Padrões de data
-        date_patterns = [
-            r'(?:hoje|hj)',
-            r'(?:ontem)',
-            r'(?:anteontem)',
-            r'(\d{1,2})/(\d{1,2})',
-            r'dia\s+(\d{1,2})'
-        ]
-        
-        today = date.today()
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text.lower())
-            if match:
-                if 'hoje' in match.group(0) or 'hj' in match.group(0):
-                    return today
-                elif 'ontem' in match.group(0):
-                    return date(today.year, today.month, today.day - 1)
-                elif 'anteontem' in match.group(0):
-                    return date(today.year, today.month, today.day - 2)
-                elif '/' in match.group(0):
-                    try:
-                        day, month = int(match.group(1)), int(match.group(2))
-                        return date(today.year, month, day)
-                    except:
-                        pass
-                elif 'dia' in match.group(0):
-                    try:
-                        day = int(match.group(1))
-                        return date(today.year, today.month, day)
-                    except:
-                        pass
-        
-        return today  # Padrão: hoje
+        return parsed.has_any(self.urgency_keywords)
     
     def _request_lost_item_details(self, item_info: Dict, user: User, conversa: Conversa) -> Dict[str, Any]:
         """Solicita detalhes do item perdido"""
@@ -284,8 +234,7 @@ class LostFoundModule:
             'item_info': item_info,
             'step': 'collecting_details'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         return {
             'success': True,
@@ -319,8 +268,7 @@ class LostFoundModule:
             'item_info': item_info,
             'step': 'collecting_details'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         return {
             'success': True,
@@ -380,16 +328,13 @@ class LostFoundModule:
         
         if search_criteria.get('local'):
             query = query.filter(
-                db.or_(
-                    AchadoPerdido.local.ilike(f'%{search_criteria["local"]}%'),
-                    AchadoPerdido.local_detalhado.ilike(f'%{search_criteria["local"]}%')
-                )
+                location_filter(search_criteria['local'], AchadoPerdido.local, AchadoPerdido.local_detalhado)
             )
         
         return query.order_by(
             AchadoPerdido.urgente.desc(),
             AchadoPerdido.data_registro.desc()
-        ).limit(20).all()
+        ).limit(search_limit(20)).all()
     
     def complete_item_registration(self, item_data: Dict, user: User) -> Dict[str, Any]:
         """Completa o registro do item"""
@@ -417,7 +362,7 @@ class LostFoundModule:
             )
             
             db.session.add(item)
-            db.session.commit()
+            db.session.flush()
             
             # Busca possíveis correspondências
             matches = []
@@ -445,7 +390,7 @@ class LostFoundModule:
                 'text': text,
                 'matches': [match.to_dict() for match in matches] if matches else []
             }
-            
+        
         except Exception as e:
             current_app.logger.error(f'Erro ao registrar item: {str(e)}')
             return {
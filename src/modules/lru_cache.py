@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class LRUTTLCache:
+    """Cache em memória com tamanho limitado (LRU) e expiração por tempo (TTL)
+
+    Todas as operações são O(1) e seguras para uso entre threads.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retorna o valor se existir e não tiver expirado"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Armazena o valor, removendo o item menos usado se necessário"""
+        expires_at = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            self._evict()
+
+    def add(self, key: Hashable, value: Any = True) -> bool:
+        """Armazena o valor apenas se a chave não existir. Retorna True se foi adicionado"""
+        now = time.monotonic()
+
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] >= now:
+                return False
+
+            self._data[key] = (value, now + self.ttl_seconds)
+            self._data.move_to_end(key)
+            self._evict()
+            return True
+
+    def delete(self, key: Hashable):
+        """Remove a chave do cache"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        """Remove itens mais antigos até respeitar o tamanho máximo"""
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
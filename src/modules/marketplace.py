@@ -1,25 +1,35 @@
 from typing import Dict, Any, List
 from flask import current_app
 from src.models import db, User, Produto, Conversa
+from src.modules.deferred_writes import record_view
+from src.modules.keyword_tables import freeze, keyword_table
+from src.modules.deadline import search_limit
+from src.modules.parsed_message import ParsedMessage, get_parsed
+from src.modules.places import location_filter
 import json
 import re
 
 class MarketplaceModule:
     """Módulo para gerenciar marketplace (compra e venda)"""
     
-    def __init__(self):
-        self.categories = {
-            'eletronicos': ['telefone', 'celular', 'smartphone', 'iphone', 'samsung', 'computador', 'laptop', 'tablet', 'tv', 'televisao', 'radio', 'som'],
-            'veiculos': ['carro', 'automovel', 'moto', 'motocicleta', 'bicicleta', 'bike', 'toyota', 'honda', 'nissan', 'hyundai'],
-            'casa_jardim': ['movel', 'sofa', 'cama', 'mesa', 'cadeira', 'geladeira', 'fogao', 'microondas', 'maquina', 'eletrodomestico'],
-            'roupas_acessorios': ['roupa', 'camisa', 'calca', 'vestido', 'sapato', 'tenis', 'bolsa', 'relogio', 'oculos', 'joia'],
-            'esportes_lazer': ['bola', 'futebol', 'basquete', 'tenis', 'academia', 'bicicleta', 'patins', 'jogo', 'livro'],
-            'bebes_criancas': ['bebe', 'crianca', 'brinquedo', 'carrinho', 'berco', 'cadeirinha', 'fralda', 'roupa infantil'],
-            'animais': ['cao', 'cachorro', 'gato', 'passaro', 'peixe', 'animal', 'pet', 'racao', 'gaiola'],
-            'servicos': ['curso', 'aula', 'treinamento', 'consultoria', 'design', 'fotografia', 'evento']
-        }
-        
-        self.conditions = ['novo', 'usado', 'seminovo', 'para pecas']
+    categories = keyword_table('marketplace.categories', {
+        'eletronicos': ['telefone', 'celular', 'smartphone', 'iphone', 'samsung', 'computador', 'laptop', 'tablet', 'tv', 'televisao', 'radio', 'som'],
+        'veiculos': ['carro', 'automovel', 'moto', 'motocicleta', 'bicicleta', 'bike', 'toyota', 'honda', 'nissan', 'hyundai'],
+        'casa_jardim': ['movel', 'sofa', 'cama', 'mesa', 'cadeira', 'geladeira', 'fogao', 'microondas', 'maquina', 'eletrodomestico'],
+        'roupas_acessorios': ['roupa', 'camisa', 'calca', 'vestido', 'sapato', 'tenis', 'bolsa', 'relogio', 'oculos', 'joia'],
+        'esportes_lazer': ['bola', 'futebol', 'basquete', 'tenis', 'academia', 'bicicleta', 'patins', 'jogo', 'livro'],
+        'bebes_criancas': ['bebe', 'crianca', 'brinquedo', 'carrinho', 'berco', 'cadeirinha', 'fralda', 'roupa infantil'],
+        'animais': ['cao', 'cachorro', 'gato', 'passaro', 'peixe', 'animal', 'pet', 'racao', 'gaiola'],
+        'servicos': ['curso', 'aula', 'treinamento', 'consultoria', 'design', 'fotografia', 'evento']
+    })
+    
+    conditions = freeze(['novo', 'usado', 'seminovo', 'para pecas'])
+    
+    brands = freeze([
+        'iphone', 'samsung', 'huawei', 'xiaomi', 'lg', 'sony',
+        'toyota', 'honda', 'nissan', 'hyundai', 'volkswagen',
+        'nike', 'adidas', 'puma', 'apple', 'microsoft'
+    ])
     
     def process_message(self, nlp_result: Dict[str, Any], user: User, conversa: Conversa) -> Dict[str, Any]:
         """Processa mensagem relacionada ao marketplace"""
@@ -35,7 +45,7 @@ class MarketplaceModule:
                     'success': False,
                     'text': 'Comando não reconhecido para marketplace.'
                 }
-                
+        
         except Exception as e:
             current_app.logger.error(f'Erro no módulo marketplace: {str(e)}')
             return {
@@ -50,7 +60,7 @@ class MarketplaceModule:
         entities = nlp_result.get('entities', {})
         
         # Extrai informações do produto
-        product_info = self._extract_product_info(text, entities)
+        product_info = self._extract_product_info(text, get_parsed(nlp_result), entities)
         
         if not product_info.get('name'):
             return {
@@ -69,17 +79,17 @@ class MarketplaceModule:
         # Solicita informações adicionais se necessário
         return self._request_product_details(product_info, user, conversa)
     
-    def _extract_product_info(self, text: str, entities: Dict) -> Dict[str, Any]:
+    def _extract_product_info(self, text: str, parsed: ParsedMessage, entities: Dict) -> Dict[str, Any]:
         """Extrai informações do produto do texto"""
         info = {}
         
         # Extrai nome do produto
         info['name'] = self._extract_product_name(text)
         
-        # Extrai preço
-        prices = entities.get('preco', [])
-        if prices:
-            info['price'] = self._parse_price(prices[0])
+        # Extrai preço (Decimal já interpretado pelo NLP)
+        amounts = parsed.typed('preco')
+        if amounts:
+            info['price'] = amounts[0].valor
         
         # Extrai localização
         locations = entities.get('localizacao', [])
@@ -87,13 +97,13 @@ class MarketplaceModule:
             info['location'] = locations[0]
         
         # Extrai condição
-        info['condition'] = self._extract_condition(text)
+        info['condition'] = self._extract_condition(parsed)
         
         # Extrai categoria
-        info['category'] = self._extract_category(text)
+        info['category'] = self._extract_category(parsed)
         
         # Extrai marca/modelo
-        info['brand'] = self._extract_brand(text)
+        info['brand'] = self._extract_brand(parsed)
         
         return info
     
@@ -118,66 +128,28 @@ class MarketplaceModule:
         
         return None
     
-    def _extract_condition(self, text: str) -> str:
+    def _extract_condition(self, parsed: ParsedMessage) -> str:
         """Extrai condição do produto"""
-        text_lower = text.lower()
-        
-        for condition in self.conditions:
-            if condition in text_lower:
-                return condition
+        condition = parsed.first(self.conditions)
+        if condition:
+            return condition
         
         # Padrões específicos
-        if any(word in text_lower for word in ['novo', 'lacrado', 'na caixa']):
+        if parsed.has_any(['lacrado', 'na caixa']):
             return 'novo'
-        elif any(word in text_lower for word in ['usado', 'segunda mao']):
+        elif parsed.has('segunda mao'):
             return 'usado'
-        elif 'seminovo' in text_lower:
-            return 'seminovo'
         
         return 'usado'  # Padrão
     
-    def _extract_category(self, text: str) -> str:
+    def _extract_category(self, parsed: ParsedMessage) -> str:
         """Extrai categoria do produto"""
-        text_lower = text.lower()
-        
-        for category, keywords in self.categories.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    return category
-        
-        return 'outros'
+        return parsed.first_key(self.categories) or 'outros'
     
-    def _extract_brand(self, text: str) -> str:
+    def _extract_brand(self, parsed: ParsedMessage) -> str:
         """Extrai marca do produto"""
-        brands = [
-            'iphone', 'samsung', 'huawei', 'xiaomi', 'lg', 'sony',
-            'toyota', 'honda', 'nissan', 'hyundai', 'volkswagen',
-            'nike', 'adidas', 'puma', 'apple', 'microsoft'
-        ]
-        
-        text_lower = text.lower()
-        for brand in brands:
-            if brand in text_lower:
-                return brand.title()
-        
-        return None
-    
-    def _parse_price(self, price_str: str) -> float:
-        """Converte string de preço para float"""
-        try:
-            # Remove caracteres não numéricos exceto vírgula e ponto
-            price_clean = re.sub(r'[^\d,.]', '', price_str)
-            
-            # Substitui vírgula por ponto se for decimal
-            if ',' in price_clean and '.' not in price_clean:
-                price_clean = price_clean.replace(',', '.')
-            elif ',' in price_clean and '.' in price_clean:
-                # Remove pontos de milhares e mantém vírgula decimal
-                price_clean = price_clean.replace('.', '').replace(',', '.')
-            
-            return float(price_clean)
-        except:
-            return 0.0
+        brand = parsed.first(self.brands)
+        return brand.title() if brand else None
     
     def _request_product_details(self, product_info: Dict, user: User, conversa: Conversa) -> Dict[str, Any]:
         """Solicita detalhes adicionais do produto"""
@@ -205,8 +177,7 @@ class MarketplaceModule:
             'product_info': product_info,
             'step': 'collecting_details'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         return {
             'success': True,
@@ -229,7 +200,7 @@ class MarketplaceModule:
             }
         
         # Extrai filtros
-        filters = self._extract_search_filters(text, entities)
+        filters = self._extract_search_filters(get_parsed(nlp_result), entities)
         
         # Busca produtos
         products = self._search_products(search_term, filters)
@@ -259,7 +230,7 @@ class MarketplaceModule:
         
         return None
     
-    def _extract_search_filters(self, text: str, entities: Dict) -> Dict[str, Any]:
+    def _extract_search_filters(self, parsed: ParsedMessage, entities: Dict) -> Dict[str, Any]:
         """Extrai filtros de busca"""
         filters = {}
         
@@ -269,17 +240,17 @@ class MarketplaceModule:
             filters['location'] = locations[0]
         
         # Preço
-        prices = entities.get('preco', [])
-        if prices:
-            filters['max_price'] = self._parse_price(prices[0])
+        amounts = parsed.typed('preco')
+        if amounts:
+            filters['max_price'] = amounts[0].valor
         
         # Condição
-        condition = self._extract_condition(text)
+        condition = self._extract_condition(parsed)
         if condition != 'usado':  # Se não for o padrão
             filters['condition'] = condition
         
         # Categoria
-        category = self._extract_category(text)
+        category = self._extract_category(parsed)
         if category != 'outros':
             filters['category'] = category
         
@@ -305,7 +276,7 @@ class MarketplaceModule:
         
         # Aplica filtros
         if filters.get('location'):
-            query = query.filter(Produto.localizacao.ilike(f'%{filters["location"]}%'))
+            query = query.filter(location_filter(filters['location'], Produto.localizacao))
         
         if filters.get('max_price'):
             query = query.filter(Produto.preco <= filters['max_price'])
@@ -319,7 +290,7 @@ class MarketplaceModule:
         return query.order_by(
             Produto.promovido.desc(),
             Produto.data_publicacao.desc()
-        ).limit(10).all()
+        ).limit(search_limit(10)).all()
     
     def _format_products_response(self, products: List[Produto], search_term: str) -> Dict[str, Any]:
         """Formata resposta com lista de produtos"""
@@ -329,36 +300,9 @@ class MarketplaceModule:
         
         for i, product in enumerate(products, 1):
             # Incrementa visualização
-            product.incrementar_visualizacao()
-            
-            # Monta texto do produto
-            product_text = f"*{product.nome}*\n"
-            product_text += f"💰 {product.preco:,.0f} kz"
-            
-            if product.negociavel:
-                product_text += " (negociável)"
-            
-            product_text += f"\n📍 {product.localizacao}\n"
-            product_text += f"📦 {product.condicao.title()}\n"
-            
-            if product.marca:
-                product_text += f"🏷️ {product.marca}\n"
-            
-            if product.entrega_disponivel:
-                entrega_text = "🚚 Entrega disponível"
-                if product.custo_entrega:
-                    entrega_text += f" (+{product.custo_entrega:,.0f} kz)"
-                product_text += entrega_text + "\n"
-            
-            if product.aceita_troca:
-                product_text += "🔄 Aceita troca\n"
+            record_view(product)
             
-            # Contato do vendedor
-            seller = User.query.get(product.usuario_id)
-            if seller:
-                product_text += f"📱 Contato: {seller.whatsapp_id}"
-            
-            text += f"{i}. {product_text}\n\n"
+            text += f"{i}. {self._format_product_text(product)}\n\n"
             
             # Adiciona à lista interativa
             price_text = f"{product.preco:,.0f} kz"
@@ -386,6 +330,62 @@ class MarketplaceModule:
             'buttons': buttons
         }
     
+    def _format_product_text(self, product: Produto) -> str:
+        """Monta o texto de um produto"""
+        product_text = f"*{product.nome}*\n"
+        product_text += f"💰 {product.preco:,.0f} kz"
+        
+        if product.negociavel:
+            product_text += " (negociável)"
+        
+        product_text += f"\n📍 {product.localizacao}\n"
+        product_text += f"📦 {product.condicao.title()}\n"
+        
+        if product.marca:
+            product_text += f"🏷️ {product.marca}\n"
+        
+        if product.entrega_disponivel:
+            entrega_text = "🚚 Entrega disponível"
+            if product.custo_entrega:
+                entrega_text += f" (+{product.custo_entrega:,.0f} kz)"
+            product_text += entrega_text + "\n"
+        
+        if product.aceita_troca:
+            product_text += "🔄 Aceita troca\n"
+        
+        # Contato do vendedor
+        seller = User.query.get(product.usuario_id)
+        if seller:
+            product_text += f"📱 Contato: {seller.whatsapp_id}"
+        
+        return product_text
+    
+    def show_product(self, product_id: int, user: User) -> Dict[str, Any]:
+        """Mostra o produto escolhido na lista interativa"""
+        product = Produto.query.get(product_id)
+        
+        if not product or not product.ativo:
+            return {
+                'success': True,
+                'text': "😔 Este produto não está mais disponível.\n\nDigite 'Procuro [produto]' para uma nova busca."
+            }
+        
+        record_view(product)
+        
+        text = self._format_product_text(product)
+        
+        if product.descricao:
+            text += f"\n\n📝 {product.descricao}"
+        
+        return {
+            'success': True,
+            'text': text,
+            'buttons': [
+                {'id': 'search_again', 'title': '🔍 Nova Busca'},
+                {'id': 'sell_product', 'title': '💰 Vender Produto'}
+            ]
+        }
+    
     def _handle_no_products_found(self, search_term: str, filters: Dict) -> Dict[str, Any]:
         """Trata caso onde não foram encontrados produtos"""
         text = f"😔 Não encontrei '{search_term}' no momento.\n\n"
@@ -430,7 +430,7 @@ class MarketplaceModule:
             )
             
             db.session.add(product)
-            db.session.commit()
+            db.session.flush()
             
             text = f"✅ *Produto anunciado com sucesso!*\n\n"
             text += f"📦 *Produto:* {product.nome}\n"
@@ -448,7 +448,7 @@ class MarketplaceModule:
                 'success': True,
                 'text': text
             }
-            
+        
         except Exception as e:
             current_app.logger.error(f'Erro ao cadastrar produto: {str(e)}')
             return {
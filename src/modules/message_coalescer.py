@@ -0,0 +1,167 @@
+import atexit
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+from flask import Flask, current_app
+
+def merge_messages(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Junta mensagens de texto em uma única mensagem lógica
+
+    Mantém o ID e o timestamp da primeira mensagem e guarda os IDs de
+    todas em 'coalesced_ids'.
+    """
+    if len(messages) == 1:
+        return messages[0]
+
+    bodies = [m.get('text', {}).get('body', '').strip() for m in messages]
+
+    merged = dict(messages[0])
+    merged['text'] = {'body': ' '.join(body for body in bodies if body)}
+    merged['coalesced_ids'] = [m.get('id') for m in messages]
+
+    return merged
+
+class _Burst:
+    """Mensagens pendentes de um usuário dentro da janela"""
+
+    __slots__ = ('messages', 'value', 'start_time', 'first_seen', 'timer', 'future')
+
+    def __init__(self, message: Dict[str, Any], value: Dict[str, Any], start_time: float):
+        self.messages = [message]
+        self.value = value
+        self.start_time = start_time
+        self.first_seen = time.monotonic()
+        self.timer = None
+        self.future = Future()
+
+class MessageCoalescer:
+    """Junta mensagens enviadas em sequência rápida pelo mesmo usuário
+
+    Cada mensagem de texto reinicia a janela do usuário (debounce). Quando a
+    janela termina sem novas mensagens, ou quando max_wait_ms é atingido, as
+    mensagens são unidas e entregues ao callback uma única vez. Mensagens
+    que não são texto (imagens, botões) liberam a rajada pendente e seguem
+    sozinhas, mantendo a ordem.
+
+    O agrupamento é feito por processo: rajadas divididas entre processos
+    diferentes do servidor web não são unidas.
+    """
+
+    def __init__(self, window_ms: int = 0, max_wait_ms: int = 4000,
+                 flush_callback: Optional[Callable[[Dict, Dict, float], Optional[Future]]] = None):
+        self.window = window_ms / 1000.0
+        self.max_wait = max_wait_ms / 1000.0
+        self.flush_callback = flush_callback
+        self._bursts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def add(self, key: str, message: Dict[str, Any], value: Dict[str, Any], start_time: float) -> Optional[Future]:
+        """Adiciona a mensagem à rajada do usuário
+
+        Retorna um Future resolvido quando a mensagem (unida ou não) for entregue ao callback.
+        """
+        if message.get('type') != 'text':
+            self.flush(key)
+            return self.flush_callback(message, value, start_time)
+
+        with self._lock:
+            burst = self._bursts.get(key)
+
+            if burst is None:
+                burst = _Burst(message, value, start_time)
+                self._bursts[key] = burst
+            else:
+                burst.messages.append(message)
+                burst.start_time = min(burst.start_time, start_time)
+                burst.timer.cancel()
+
+            # A janela é reiniciada, mas nunca passa do tempo máximo de espera
+            remaining = burst.first_seen + self.max_wait - time.monotonic()
+            delay = max(0.0, min(self.window, remaining))
+
+            burst.timer = threading.Timer(delay, self._fire, args=(key, burst))
+            burst.timer.daemon = True
+            burst.timer.start()
+
+            return burst.future
+
+    def flush(self, key: str):
+        """Entrega imediatamente a rajada pendente do usuário, se houver"""
+        with self._lock:
+            burst = self._bursts.pop(key, None)
+            if burst is not None:
+                burst.timer.cancel()
+
+        if burst is not None:
+            self._emit(burst)
+
+    def flush_all(self):
+        """Entrega todas as rajadas pendentes"""
+        with self._lock:
+            keys = list(self._bursts.keys())
+
+        for key in keys:
+            self.flush(key)
+
+    def _fire(self, key: str, burst: _Burst):
+        """Fim da janela do usuário"""
+        with self._lock:
+            if self._bursts.get(key) is not burst:
+                return
+            del self._bursts[key]
+
+        self._emit(burst)
+
+    def _emit(self, burst: _Burst):
+        """Une as mensagens e entrega ao callback"""
+        try:
+            merged = merge_messages(burst.messages)
+            inner = self.flush_callback(merged, burst.value, burst.start_time)
+        except Exception as e:
+            burst.future.set_exception(e)
+            return
+
+        if inner is None:
+            burst.future.set_result(None)
+        else:
+            inner.add_done_callback(lambda done: _copy_future(done, burst.future))
+
+def _copy_future(source: Future, target: Future):
+    """Propaga o resultado de um Future para outro"""
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+def init_message_coalescer(app: Flask, dispatch: Callable[[Dict, Dict, float], Optional[Future]]) -> MessageCoalescer:
+    """Cria o agrupador de rajadas da aplicação
+
+    O callback roda na thread do timer, por isso é executado dentro do contexto da aplicação.
+    As rajadas ficam só na memória do processo web: ao encerrar (reinício ou
+    deploy), as pendentes são entregues em vez de perdidas com os timers.
+    """
+
+    def dispatch_in_context(message, value, start_time):
+        with app.app_context():
+            return dispatch(message, value, start_time)
+
+    coalescer = MessageCoalescer(
+        window_ms=app.config.get('MESSAGE_COALESCE_WINDOW_MS', 0),
+        max_wait_ms=app.config.get('MESSAGE_COALESCE_MAX_WAIT_MS', 4000),
+        flush_callback=dispatch_in_context
+    )
+    app.extensions['message_coalescer'] = coalescer
+
+    if coalescer.enabled:
+        atexit.register(coalescer.flush_all)
+
+    return coalescer
+
+def get_message_coalescer() -> MessageCoalescer:
+    """Retorna o agrupador de rajadas da aplicação atual"""
+    return current_app.extensions['message_coalescer']
@@ -0,0 +1,70 @@
+from typing import Optional
+from flask import Flask, current_app
+from src.modules.lru_cache import LRUTTLCache
+
+class MessageDeduplicator:
+    """Descarta entregas repetidas da mesma mensagem do WhatsApp
+
+    O Meta reenvia o webhook quando a resposta demora, sempre com o mesmo
+    ID de mensagem (wamid). O controle local é um LRU com TTL; com Redis,
+    o controle é compartilhado entre processos.
+    """
+
+    REDIS_PREFIX = 'solicite_ia:msg:'
+
+    def __init__(self, max_size: int = 50000, ttl_seconds: int = 86400, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUTTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.redis = None
+
+        if redis_url:
+            import redis
+            self.redis = redis.Redis.from_url(redis_url)
+
+    def is_duplicate(self, message_id: Optional[str]) -> bool:
+        """Registra o ID e indica se a mensagem já tinha sido recebida"""
+        if not message_id:
+            return False
+
+        if not self.local.add(message_id):
+            return True
+
+        if self.redis is not None:
+            try:
+                added = self.redis.set(f'{self.REDIS_PREFIX}{message_id}', 1, nx=True, ex=self.ttl_seconds)
+                return not added
+            except Exception as e:
+                # Sem Redis, o controle local continua valendo
+                current_app.logger.error(f'Erro ao consultar Redis para deduplicação: {str(e)}')
+
+        return False
+
+    def forget(self, message_id: Optional[str]):
+        """Remove o ID, permitindo que uma nova entrega seja processada"""
+        if not message_id:
+            return
+
+        self.local.delete(message_id)
+
+        if self.redis is not None:
+            try:
+                self.redis.delete(f'{self.REDIS_PREFIX}{message_id}')
+            except Exception as e:
+                current_app.logger.error(f'Erro ao remover ID do Redis: {str(e)}')
+
+def init_message_dedup(app: Flask) -> MessageDeduplicator:
+    """Cria o deduplicador de mensagens da aplicação"""
+    redis_url = app.config.get('REDIS_URL') if app.config.get('MESSAGE_DEDUP_BACKEND') == 'redis' else None
+
+    deduplicator = MessageDeduplicator(
+        max_size=app.config.get('MESSAGE_DEDUP_MAX_SIZE', 50000),
+        ttl_seconds=app.config.get('MESSAGE_DEDUP_TTL', 86400),
+        redis_url=redis_url
+    )
+    app.extensions['message_dedup'] = deduplicator
+
+    return deduplicator
+
+def get_deduplicator() -> MessageDeduplicator:
+    """Retorna o deduplicador da aplicação atual"""
+    return current_app.extensions['message_dedup']
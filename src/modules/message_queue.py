@@ -0,0 +1,72 @@
+from typing import Dict, Any
+from celery import Celery, Task, shared_task
+from flask import Flask, current_app
+from src.modules.sharded_executor import lane_for_key
+
+def init_celery(app: Flask) -> Celery:
+    """Cria a instância Celery vinculada ao contexto da aplicação Flask"""
+
+    class FlaskTask(Task):
+        """Executa cada tarefa dentro do contexto da aplicação"""
+
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery_app = Celery(app.name, task_cls=FlaskTask)
+    celery_app.conf.update(
+        broker_url=app.config.get('CELERY_BROKER_URL'),
+        task_ignore_result=True,
+        task_serializer='json',
+        accept_content=['json'],
+        task_default_queue=app.config.get('CELERY_MESSAGE_QUEUE', 'mensagens'),
+        task_always_eager=app.config.get('CELERY_TASK_ALWAYS_EAGER', False),
+        # Só confirma a mensagem após o processamento, para não perder mensagens se o worker cair
+        task_acks_late=True,
+        worker_prefetch_multiplier=1
+    )
+    celery_app.set_default()
+    app.extensions['celery'] = celery_app
+
+    return celery_app
+
+@shared_task(name='solicite_ia.process_message')
+def process_message_task(message: Dict[str, Any], value: Dict[str, Any], start_time: float):
+    """Processa uma mensagem do WhatsApp em um worker Celery"""
+    # Import tardio para evitar import circular com o blueprint
+    from src.routes.whatsapp import process_message_in_order
+
+    process_message_in_order(message, value, start_time)
+
+def is_async_mode() -> bool:
+    """Indica se as mensagens devem ser processadas pelos workers Celery"""
+    return current_app.config.get('MESSAGE_PROCESSING_MODE') == 'celery'
+
+def enqueue_message(message: Dict[str, Any], value: Dict[str, Any], start_time: float) -> bool:
+    """Coloca a mensagem na fila de processamento"""
+    try:
+        # Envia apenas os metadados da mudança, sem a lista completa de mensagens do lote
+        metadata = {k: v for k, v in value.items() if k not in ('messages', 'statuses')}
+        process_message_task.apply_async(
+            args=(message, metadata, start_time),
+            queue=_queue_for_message(message)
+        )
+        return True
+
+    except Exception as e:
+        current_app.logger.error(f'Erro ao enfileirar mensagem: {str(e)}')
+        return False
+
+def _queue_for_message(message: Dict[str, Any]) -> str:
+    """Escolhe a fila da mensagem
+
+    Com CELERY_LANE_QUEUES > 0 cada usuário sempre cai na mesma fila; com um
+    worker de concorrência 1 por fila, a ordem por usuário é mantida entre processos.
+    """
+    base_queue = current_app.config.get('CELERY_MESSAGE_QUEUE', 'mensagens')
+    lane_queues = current_app.config.get('CELERY_LANE_QUEUES', 0)
+
+    if lane_queues > 0:
+        return f"{base_queue}.{lane_for_key(message.get('from'), lane_queues)}"
+
+    return base_queue
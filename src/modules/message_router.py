@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from flask import current_app
 from src.models import User, Conversa
 from src.modules.service_providers import ServiceProvidersModule
@@ -9,16 +9,68 @@ from src.modules.complaints import ComplaintsModule
 from src.modules.scholarships import ScholarshipsModule
 from src.modules.financial_market import FinancialMarketModule
 from src.modules.web_search import WebSearchModule
+from src.modules.load_shedder import is_degraded
+from src.modules.deadline import budget_exhausted
+from src.modules.metrics import get_metrics
+from src.modules.parsed_message import get_parsed
 
 class MessageRouter:
     """Roteador de mensagens para direcionar para módulos específicos"""
     
+    # Botões fixos: ID do botão -> método do roteador
+    BUTTON_HANDLERS = {
+        'help': '_handle_help_message',
+        'services': '_handle_services_button',
+        'marketplace': '_handle_marketplace_button',
+        'search_again': '_handle_search_again_button',
+        'sell_product': '_handle_sell_product_button',
+        'register_provider': '_handle_register_provider_button'
+    }
+    
+    # "Nova Busca": instruções conforme a última busca do usuário
+    SEARCH_AGAIN_PROMPTS = {
+        'busca_produto': "🔍 *NOVA BUSCA*\n\nDiga o que procura: 'Procuro [produto]'\n\nExemplo: 'Procuro telefone usado em Luanda'",
+        'busca_prestador': "🔍 *NOVA BUSCA*\n\nDiga o serviço e o local: 'Procuro [profissão] em [local]'\n\nExemplo: 'Procuro eletricista em Luanda'",
+        'conexao_pessoal': "🔍 *NOVA BUSCA*\n\nDescreva quem procura: 'Procuro [homem/mulher] para [amizade/namoro]'\n\nExemplo: 'Procuro mulher para namoro em Luanda'",
+        'bolsa_estudo': "🔍 *NOVA BUSCA*\n\nDiga o curso ou o país: 'Bolsa de [curso] em [país]'\n\nExemplo: 'Bolsa de engenharia em Portugal'"
+    }
+    
+    # Módulos que dependem de serviços externos: no modo degradado recebem resposta pronta
+    DEGRADED_REPLIES = {
+        'bolsa_estudo': "🎓 A busca de bolsas está temporariamente indisponível devido ao alto volume de pedidos.\n\nTente novamente em alguns minutos.",
+        'mercado_financeiro': "💰 As cotações estão temporariamente indisponíveis devido ao alto volume de pedidos.\n\nTente novamente em alguns minutos.",
+        'pesquisa_geral': "🌐 A pesquisa geral está temporariamente indisponível devido ao alto volume de pedidos.\n\nTente novamente em alguns minutos."
+    }
+    
+    # Orçamento da mensagem esgotado antes do módulo: resposta pronta em vez de uma resposta atrasada
+    DEADLINE_REPLY = "⏳ Sua mensagem está demorando mais do que o normal para ser processada.\n\nPor favor, envie novamente em alguns instantes."
+    
+    # Sugestões para mensagens não compreendidas: palavras-chave (normalizadas) -> exemplo
+    UNKNOWN_SUGGESTIONS = (
+        (('servico', 'trabalho', 'profissional'), "🔧 Para serviços: 'Procuro eletricista em Luanda' ou 'Sou pintor em Benguela'"),
+        (('vender', 'comprar', 'produto'), "🛒 Para marketplace: 'Vendo carro Toyota' ou 'Procuro telefone usado'"),
+        (('namoro', 'amizade', 'relacionamento'), "💕 Para conexões: 'Homem, 25 anos, solteiro' ou 'Procuro mulher para namoro'"),
+        (('perdi', 'encontrei', 'perdido'), "🔍 Para achados: 'Perdi carteira no Kinaxixi' ou 'Encontrei cão na Maianga'"),
+        (('reclamar', 'problema', 'empresa'), "📢 Para reclamações: 'Problema com empresa X por motivo Y'")
+    )
+    
+    # Itens de listas interativas ('product_12'): prefixo -> (comando do módulo, método)
+    ITEM_HANDLERS = {
+        'product': ('busca_produto', 'show_product'),
+        'provider': ('busca_prestador', 'show_provider'),
+        'connection': ('conexao_pessoal', 'show_connection')
+    }
+    
     def __init__(self):
+        # Cadastro e busca usam a mesma instância do módulo
+        service_providers = ServiceProvidersModule()
+        marketplace = MarketplaceModule()
+        
         self.modules = {
-            'cadastro_prestador': ServiceProvidersModule(),
-            'busca_prestador': ServiceProvidersModule(),
-            'venda_produto': MarketplaceModule(),
-            'busca_produto': MarketplaceModule(),
+            'cadastro_prestador': service_providers,
+            'busca_prestador': service_providers,
+            'venda_produto': marketplace,
+            'busca_produto': marketplace,
             'conexao_pessoal': PersonalConnectionsModule(),
             'achado_perdido': LostFoundModule(),
             'reclamacao': ComplaintsModule(),
@@ -33,26 +85,46 @@ class MessageRouter:
             intent = nlp_result.get('intent')
             command_type = nlp_result.get('command_type')
             
+            # Mensagem já normalizada pelo NLP, compartilhada com os módulos
+            parsed = get_parsed(nlp_result)
+            
             # Mensagens de saudação e cortesia
             if intent in ['saudacao', 'agradecimento', 'despedida']:
                 return self._handle_courtesy_message(intent, nlp_result, user)
             
             # Mensagens de ajuda
-            if intent == 'ajuda' or 'ajuda' in nlp_result.get('text', '').lower():
+            if intent == 'ajuda' or parsed.has('ajuda'):
                 return self._handle_help_message(user)
             
             # Mensagens desconhecidas ou com baixa confiança
             if intent == 'unknown' or nlp_result.get('confidence', 0) < 0.5:
                 return self._handle_unknown_message(nlp_result, user)
             
+            # Sob carga alta, módulos caros recebem resposta pronta
+            if is_degraded() and command_type in self.DEGRADED_REPLIES:
+                get_metrics().increment('respostas_degradadas')
+                return {
+                    'success': True,
+                    'text': self.DEGRADED_REPLIES[command_type],
+                    'type': 'degraded'
+                }
+            
             # Roteia para módulo específico
             module = self.modules.get(command_type)
+            if module and budget_exhausted():
+                get_metrics().increment('prazo_respostas_prontas')
+                return {
+                    'success': True,
+                    'text': self.DEADLINE_REPLY,
+                    'type': 'deadline'
+                }
+            
             if module:
                 return module.process_message(nlp_result, user, conversa)
             else:
                 current_app.logger.warning(f'Módulo não encontrado para comando: {command_type}')
                 return self._handle_unknown_message(nlp_result, user)
-                
+        
         except Exception as e:
             current_app.logger.error(f'Erro no roteamento de mensagem: {str(e)}')
             return {
@@ -152,25 +224,10 @@ Precisa de ajuda específica? Digite sua dúvida!
     
     def _handle_unknown_message(self, nlp_result: Dict, user: User) -> Dict[str, Any]:
         """Trata mensagens não compreendidas"""
-        text = nlp_result.get('text', '')
+        parsed = get_parsed(nlp_result)
         
         # Tenta dar sugestões baseadas em palavras-chave
-        suggestions = []
-        
-        if any(word in text.lower() for word in ['serviço', 'trabalho', 'profissional']):
-            suggestions.append("🔧 Para serviços: 'Procuro eletricista em Luanda' ou 'Sou pintor em Benguela'")
-        
-        if any(word in text.lower() for word in ['vender', 'comprar', 'produto']):
-            suggestions.append("🛒 Para marketplace: 'Vendo carro Toyota' ou 'Procuro telefone usado'")
-        
-        if any(word in text.lower() for word in ['namoro', 'amizade', 'relacionamento']):
-            suggestions.append("💕 Para conexões: 'Homem, 25 anos, solteiro' ou 'Procuro mulher para namoro'")
-        
-        if any(word in text.lower() for word in ['perdi', 'encontrei', 'perdido']):
-            suggestions.append("🔍 Para achados: 'Perdi carteira no Kinaxixi' ou 'Encontrei cão na Maianga'")
-        
-        if any(word in text.lower() for word in ['reclamar', 'problema', 'empresa']):
-            suggestions.append("📢 Para reclamações: 'Problema com empresa X por motivo Y'")
+        suggestions = [suggestion for keywords, suggestion in self.UNKNOWN_SUGGESTIONS if parsed.has_any(keywords)]
         
         response_text = "Desculpe, não compreendi sua solicitação. 🤔\n\n"
         
@@ -217,26 +274,67 @@ Precisa de ajuda específica? Digite sua dúvida!
         
         return status
     
-    def handle_button_response(self, button_id: str, user: User) -> Dict[str, Any]:
-        """Trata respostas de botões interativos"""
-        button_handlers = {
-            'help': lambda: self._handle_help_message(user),
-            'services': lambda: {
-                'success': True,
-                'text': "🔧 *SERVIÇOS DISPONÍVEIS*\n\nPara cadastrar: 'Sou [profissão] em [local]'\nPara buscar: 'Procuro [profissão] em [local]'\n\nExemplo: 'Procuro eletricista em Luanda'"
-            },
-            'marketplace': lambda: {
-                'success': True,
-                'text': "🛒 *MARKETPLACE*\n\nPara vender: 'Vendo [produto], [preço]'\nPara comprar: 'Procuro [produto]'\n\nExemplo: 'Vendo iPhone 12, 150.000kz'"
-            }
+    def handle_button_response(self, button_id: str, user: User) -> Optional[Dict[str, Any]]:
+        """Trata respostas de botões interativos sem passar pelo NLP
+        
+        Retorna None quando o ID não é reconhecido, para que a mensagem siga o fluxo normal.
+        """
+        if not button_id:
+            return None
+        
+        # Botões fixos: uma consulta no dicionário
+        handler_name = self.BUTTON_HANDLERS.get(button_id)
+        if handler_name:
+            return getattr(self, handler_name)(user)
+        
+        # Itens de lista: prefixo + ID do registro (busca pela chave primária)
+        prefix, _, item_id = button_id.partition('_')
+        item_handler = self.ITEM_HANDLERS.get(prefix)
+        if item_handler and item_id.isdigit():
+            command_type, method_name = item_handler
+            return getattr(self.modules[command_type], method_name)(int(item_id), user)
+        
+        return None
+    
+    def _handle_services_button(self, user: User) -> Dict[str, Any]:
+        """Botão de serviços"""
+        return {
+            'success': True,
+            'text': "🔧 *SERVIÇOS DISPONÍVEIS*\n\nPara cadastrar: 'Sou [profissão] em [local]'\nPara buscar: 'Procuro [profissão] em [local]'\n\nExemplo: 'Procuro eletricista em Luanda'"
         }
+    
+    def _handle_search_again_button(self, user: User) -> Dict[str, Any]:
+        """Botão de nova busca (usado por vários módulos)"""
+        last_search = Conversa.query.with_entities(Conversa.tipo_comando).filter(
+            Conversa.usuario_id == user.id,
+            Conversa.tipo_comando.in_(list(self.SEARCH_AGAIN_PROMPTS))
+        ).order_by(Conversa.timestamp.desc()).first()
         
-        handler = button_handlers.get(button_id)
-        if handler:
-            return handler()
-        else:
-            return {
-                'success': False,
-                'text': 'Opção não reconhecida. Digite sua solicitação.'
-            }
-
+        if not last_search:
+            return self._handle_help_message(user)
+        
+        return {
+            'success': True,
+            'text': self.SEARCH_AGAIN_PROMPTS[last_search.tipo_comando]
+        }
+    
+    def _handle_sell_product_button(self, user: User) -> Dict[str, Any]:
+        """Botão de venda de produto"""
+        return {
+            'success': True,
+            'text': "💰 *VENDER PRODUTO*\n\nDescreva o produto, o estado e o preço: 'Vendo [produto], [estado], [preço]'\n\nExemplo: 'Vendo iPhone 12, usado, 150.000kz'"
+        }
+    
+    def _handle_register_provider_button(self, user: User) -> Dict[str, Any]:
+        """Botão de cadastro de prestador"""
+        return {
+            'success': True,
+            'text': "➕ *CADASTRO DE PRESTADOR*\n\nDiga a sua profissão e onde atende: 'Sou [profissão] em [local]'\n\nExemplo: 'Sou eletricista em Luanda'"
+        }
+    
+    def _handle_marketplace_button(self, user: User) -> Dict[str, Any]:
+        """Botão de marketplace"""
+        return {
+            'success': True,
+            'text': "🛒 *MARKETPLACE*\n\nPara vender: 'Vendo [produto], [preço]'\nPara comprar: 'Procuro [produto]'\n\nExemplo: 'Vendo iPhone 12, 150.000kz'"
+        }
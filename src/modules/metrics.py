@@ -0,0 +1,43 @@
+import threading
+from typing import Dict
+from flask import Flask, current_app
+
+class Metrics:
+    """Contadores simples do processo (thread-safe)
+    
+    Os valores são por processo: com vários workers, cada um reporta os seus.
+    """
+    
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+    
+    def increment(self, name: str, amount: int = 1):
+        """Soma ao contador"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+    
+    def get(self, name: str) -> int:
+        """Valor atual do contador"""
+        return self._counters.get(name, 0)
+    
+    def snapshot(self) -> Dict[str, int]:
+        """Cópia de todos os contadores"""
+        with self._lock:
+            return dict(self._counters)
+    
+    def reset(self):
+        """Zera todos os contadores"""
+        with self._lock:
+            self._counters.clear()
+
+def init_metrics(app: Flask) -> Metrics:
+    """Cria os contadores da aplicação"""
+    metrics = Metrics()
+    app.extensions['metrics'] = metrics
+    
+    return metrics
+
+def get_metrics() -> Metrics:
+    """Retorna os contadores da aplicação atual"""
+    return current_app.extensions['metrics']
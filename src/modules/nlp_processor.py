@@ -1,121 +1,113 @@
-import re
 import json
 import logging
 from typing import Dict, List, Optional, Any
 from flask import current_app
-import openai
+from src.modules.load_shedder import is_degraded
+from src.modules.deadline import cap_timeout, openai_allowed
+from src.modules.keyword_tables import freeze
+from src.modules.intent_matcher import IntentMatcher
+from src.modules.parsed_message import ParsedMessage, Span, normalize_text
+from src.modules.places import PLACES
+from src.modules.typed_entities import extract_typed_spans
+from src.modules.spelling import get_spelling_corrector, register_pattern_words
+from src.modules.intent_cache import get_intent_cache
+from src.modules.intent_classifier import NaiveBayesIntentClassifier, get_intent_classifier
+from src.modules.metrics import get_metrics
+from src.modules.image_analysis import get_image_analyzer
+from src.modules.intent_batcher import OPENAI_INTENTS, get_intent_batcher
+from src.modules.openai_client import CircuitOpenError, ResilientOpenAIClient, get_openai_client
 
 class NLPProcessor:
     """Processador de linguagem natural para interpretar comandos dos usuários"""
     
-    def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=current_app.config.get('OPENAI_API_KEY'))
-        
-        # Padrões de comando para detecção rápida
-        self.command_patterns = {
-            'cadastro_prestador': [
-                r'cadastrar?\s+servi[çc]o',
-                r'sou\s+(.*?)\s+em\s+(.*)',
-                r'trabalho\s+como\s+(.*)',
-                r'ofere[çc]o\s+servi[çc]os?\s+de\s+(.*)',
-                r'prestador\s+de\s+(.*)'
-            ],
-            'busca_prestador': [
-                r'procur[ao]\s+(.*?)\s+em\s+(.*)',
-                r'preciso\s+de\s+um[a]?\s+(.*)',
-                r'quero\s+contratar\s+(.*)',
-                r'buscar?\s+(.*?)\s+(canalizador|eletricista|pintor|cabeleireira|mecanico)',
-                r'ver\s+(.*?)\s+disponivel'
-            ],
-            'venda_produto': [
-                r'vender?\s+(.*)',
-                r'tenho\s+para\s+venda\s+(.*)',
-                r'estou\s+vendendo\s+(.*)',
-                r'produto\s+para\s+venda',
-                r'anunciar\s+(.*)'
-            ],
-            'busca_produto': [
-                r'comprar?\s+(.*)',
-                r'procur[ao]\s+para\s+comprar\s+(.*)',
-                r'quero\s+comprar\s+(.*)',
-                r'buscar?\s+produto\s+(.*)',
-                r'tem\s+para\s+venda\s+(.*)'
-            ],
-            'conexao_pessoal': [
-                r'relacionamento',
-                r'procur[ao]\s+(homem|mulher|pessoa)',
-                r'namoro',
-                r'amizade',
-                r'conhecer\s+pessoas',
-                r'solteiro[a]?',
-                r'casamento'
-            ],
-            'achado_perdido': [
-                r'perdi\s+(.*)',
-                r'encontrei\s+(.*)',
-                r'achei\s+(.*)',
-                r'perdido\s+(.*)',
-                r'encontrado\s+(.*)',
-                r'sumiu\s+(.*)'
-            ],
-            'reclamacao': [
-                r'reclamar?\s+(.*)',
-                r'denunciar?\s+(.*)',
-                r'problema\s+com\s+(.*)',
-                r'insatisfeito\s+com\s+(.*)',
-                r'empresa\s+(.*)\s+problema'
-            ],
-            'bolsa_estudo': [
-                r'bolsa\s+de\s+estudo',
-                r'bolsa\s+para\s+(.*)',
-                r'estudar\s+em\s+(.*)',
-                r'curso\s+gratuito',
-                r'faculdade\s+gratuita',
-                r'mestrado\s+em\s+(.*)'
-            ],
-            'mercado_financeiro': [
-                r'a[çc][ãa]o\s+(.*)',
-                r'criptomoeda\s+(.*)',
-                r'bitcoin',
-                r'dolar',
-                r'euro',
-                r'cambio',
-                r'bolsa\s+de\s+valores'
-            ],
-            'pesquisa_geral': [
-                r'pesquisar?\s+(.*)',
-                r'qual\s+(.*)',
-                r'como\s+(.*)',
-                r'onde\s+(.*)',
-                r'quando\s+(.*)',
-                r'por\s+que\s+(.*)'
-            ]
-        }
-        
-        # Entidades comuns para extração
-        self.entity_patterns = {
-            'localizacao': [
-                r'em\s+(luanda|benguela|huambo|lobito|cabinda|namibe|malanje|uige|zaire|cuando\s+cubango|cunene|huila|lunda\s+norte|lunda\s+sul|moxico|bengo|bie)',
-                r'em\s+(cacuaco|viana|cazenga|sambizanga|maianga|ingombota|rangel|kilamba|talatona|zango)',
-                r'na\s+(marginal|baixa|cidade\s+alta|miramar|alvalade|maianga)'
-            ],
-            'preco': [
-                r'(\d+(?:\.\d{3})*(?:,\d{2})?)\s*(?:kz|kwanza|akz)',
-                r'(\d+(?:\.\d{3})*(?:,\d{2})?)\s*(?:usd|dolar|dollar)',
-                r'(\d+(?:\.\d{3})*(?:,\d{2})?)\s*(?:eur|euro)'
-            ],
-            'telefone': [
-                r'(\+244\s*)?([9][0-9]{8})',
-                r'(\+244\s*)?([2][0-9]{8})'
-            ],
-            'email': [
-                r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})'
-            ],
-            'idade': [
-                r'(\d{1,2})\s*anos?',
-                r'idade\s*:?\s*(\d{1,2})'
-            ]
-        }
+    # Padrões de comando para detecção rápida
+    command_patterns = freeze({
+        'cadastro_prestador': [
+            r'cadastrar?\s+servi[çc]o',
+            r'sou\s+(.*?)\s+em\s+(.*)',
+            r'trabalho\s+como\s+(.*)',
+            r'ofere[çc]o\s+servi[çc]os?\s+de\s+(.*)',
+            r'prestador\s+de\s+(.*)'
+        ],
+        'busca_prestador': [
+            r'procur[ao]\s+(.*?)\s+em\s+(.*)',
+            r'preciso\s+de\s+um[a]?\s+(.*)',
+            r'quero\s+contratar\s+(.*)',
+            r'buscar?\s+(.*?)\s+(canalizador|eletricista|pintor|cabeleireira|mecanico)',
+            r'ver\s+(.*?)\s+disponivel'
+        ],
+        'venda_produto': [
+            r'vender?\s+(.*)',
+            r'tenho\s+para\s+venda\s+(.*)',
+            r'estou\s+vendendo\s+(.*)',
+            r'produto\s+para\s+venda',
+            r'anunciar\s+(.*)'
+        ],
+        'busca_produto': [
+            r'comprar?\s+(.*)',
+            r'procur[ao]\s+para\s+comprar\s+(.*)',
+            r'quero\s+comprar\s+(.*)',
+            r'buscar?\s+produto\s+(.*)',
+            r'tem\s+para\s+venda\s+(.*)'
+        ],
+        'conexao_pessoal': [
+            r'relacionamento',
+            r'procur[ao]\s+(homem|mulher|pessoa)',
+            r'namoro',
+            r'amizade',
+            r'conhecer\s+pessoas',
+            r'solteiro[a]?',
+            r'casamento'
+        ],
+        'achado_perdido': [
+            r'perdi\s+(.*)',
+            r'encontrei\s+(.*)',
+            r'achei\s+(.*)',
+            r'perdido\s+(.*)',
+            r'encontrado\s+(.*)',
+            r'sumiu\s+(.*)'
+        ],
+        'reclamacao': [
+            r'reclamar?\s+(.*)',
+            r'denunciar?\s+(.*)',
+            r'problema\s+com\s+(.*)',
+            r'insatisfeito\s+com\s+(.*)',
+            r'empresa\s+(.*)\s+problema'
+        ],
+        'bolsa_estudo': [
+            r'bolsa\s+de\s+estudo',
+            r'bolsa\s+para\s+(.*)',
+            r'estudar\s+em\s+(.*)',
+            r'curso\s+gratuito',
+            r'faculdade\s+gratuita',
+            r'mestrado\s+em\s+(.*)'
+        ],
+        'mercado_financeiro': [
+            r'a[çc][ãa]o\s+(.*)',
+            r'criptomoeda\s+(.*)',
+            r'bitcoin',
+            r'dolar',
+            r'euro',
+            r'cambio',
+            r'bolsa\s+de\s+valores'
+        ],
+        'pesquisa_geral': [
+            r'pesquisar?\s+(.*)',
+            r'qual\s+(.*)',
+            r'como\s+(.*)',
+            r'onde\s+(.*)',
+            r'quando\s+(.*)',
+            r'por\s+que\s+(.*)'
+        ]
+    })
+    
+    # Todos os padrões de comando compilados juntos, na mesma ordem de prioridade
+    command_matcher = IntentMatcher(command_patterns)
+    
+    @property
+    def openai_client(self) -> ResilientOpenAIClient:
+        """Cliente OpenAI da aplicação (prazo, disjuntor e hedge)"""
+        return get_openai_client()
     
     def process_message(self, text: str, image_url: Optional[str] = None, user_id: Optional[int] = None) -> Dict[str, Any]:
         """Processa mensagem e retorna análise completa"""
@@ -139,8 +131,11 @@ class NLPProcessor:
                 result['requires_clarification'] = True
                 return result
             
-            # Normaliza texto
-            normalized_text = self._normalize_text(text)
+            # Normaliza e tokeniza uma única vez; os módulos recebem a mesma representação
+            normalized_text = self._correct_spelling(self._normalize_text(text))
+            spans = self._extract_entity_spans(normalized_text, text)
+            parsed = ParsedMessage(text, normalized_text, spans)
+            result['parsed'] = parsed
             
             # Detecção rápida de padrões
             quick_detection = self._quick_pattern_detection(normalized_text)
@@ -148,14 +143,25 @@ class NLPProcessor:
                 result.update(quick_detection)
             
             # Extração de entidades
-            entities = self._extract_entities(normalized_text)
+            entities = self._extract_entities(normalized_text, spans)
             result['entities'] = entities
             
-            # Se não detectou padrão, usa OpenAI para análise mais profunda
-            if not result['intent'] or result['confidence'] < 0.7:
-                ai_analysis = self._analyze_with_openai(text, entities)
-                if ai_analysis:
-                    result.update(ai_analysis)
+            # Sem padrão, tenta o classificador local antes do OpenAI
+            if not result['intent']:
+                local_detection = self._local_classification(normalized_text)
+                if local_detection:
+                    result.update(local_detection)
+            
+            # Se não detectou padrão, usa OpenAI para análise mais profunda (não no modo degradado
+            # nem sem tempo no orçamento da mensagem; o classificador local já aplicou o seu próprio limiar)
+            low_confidence = result['confidence'] < 0.7 and result.get('intent_source') != 'classificador_local'
+            if (not result['intent'] or low_confidence) and not is_degraded():
+                if openai_allowed():
+                    ai_analysis = self._cached_openai_analysis(text, normalized_text, entities)
+                    if ai_analysis:
+                        result.update(ai_analysis)
+                else:
+                    get_metrics().increment('prazo_openai_pulado')
             
             # Processamento de imagem se fornecida
             if image_url:
@@ -169,7 +175,7 @@ class NLPProcessor:
             result['suggested_actions'] = self._get_suggested_actions(result)
             
             return result
-            
+        
         except Exception as e:
             current_app.logger.error(f'Erro no processamento NLP: {str(e)}')
             return {
@@ -183,82 +189,145 @@ class NLPProcessor:
     
     def _normalize_text(self, text: str) -> str:
         """Normaliza texto para processamento"""
-        if not text:
-            return ""
-        
-        # Converte para minúsculas
-        text = text.lower()
-        
-        # Remove acentos
-        replacements = {
-            'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a',
-            'é': 'e', 'ê': 'e',
-            'í': 'i', 'î': 'i',
-            'ó': 'o', 'ô': 'o', 'õ': 'o',
-            'ú': 'u', 'û': 'u',
-            'ç': 'c'
-        }
+        return normalize_text(text)
+    
+    def _correct_spelling(self, normalized_text: str) -> str:
+        """Corrige grafias informais e erros de digitação antes dos padrões ("kero", "eletrecista")"""
+        corrector = get_spelling_corrector()
+        if corrector is None:
+            return normalized_text
         
-        for old, new in replacements.items():
-            text = text.replace(old, new)
+        corrected = corrector.correct(normalized_text)
+        if corrected != normalized_text:
+            get_metrics().increment('ortografia_correcoes')
         
-        # Remove caracteres especiais extras
-        text = re.sub(r'[^\w\s]', ' ', text)
+        return corrected
+    
+    def _quick_pattern_detection(self, text: str) -> Optional[Dict[str, Any]]:
+        """Detecção rápida usando padrões regex (uma varredura na maioria dos casos)"""
+        detection = self.command_matcher.match(text)
+        if not detection:
+            return None
         
-        # Remove espaços extras
-        text = re.sub(r'\s+', ' ', text).strip()
+        command_type, pattern, match = detection
+        confidence = 0.8  # Alta confiança para padrões específicos
         
-        return text
+        # Determina categoria baseada no tipo de comando
+        category = self._get_category_from_command(command_type)
+        
+        return {
+            'intent': command_type,
+            'command_type': command_type,
+            'category': category,
+            'confidence': confidence,
+            'matched_pattern': pattern,
+            'matched_groups': match.groups() if match.groups() else []
+        }
     
-    def _quick_pattern_detection(self, text: str) -> Optional[Dict[str, Any]]:
-        """Detecção rápida usando padrões regex"""
-        for command_type, patterns in self.command_patterns.items():
-            for pattern in patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    confidence = 0.8  # Alta confiança para padrões específicos
-                    
-                    # Determina categoria baseada no tipo de comando
-                    category = self._get_category_from_command(command_type)
-                    
-                    return {
-                        'intent': command_type,
-                        'command_type': command_type,
-                        'category': category,
-                        'confidence': confidence,
-                        'matched_pattern': pattern,
-                        'matched_groups': match.groups() if match.groups() else []
-                    }
-        
-        return None
+    def _extract_entity_spans(self, text: str, original: Optional[str] = None) -> List[Span]:
+        """Extrai as entidades do texto como trechos tipados
+        
+        Localizações vêm do texto normalizado; valores, telefones, idades,
+        datas e emails do texto original (que mantém a pontuação), já
+        interpretados uma única vez para todos os módulos.
+        """
+        spans = []
+        
+        # Localizações: nome canônico e id, com tolerância a erros de digitação
+        for match in PLACES.find(text):
+            spans.append(Span('localizacao', match.inicio, match.fim, match.place.nome))
+            spans.append(Span('localizacao_id', match.inicio, match.fim, match.place.id))
+        
+        spans.extend(extract_typed_spans(original if original is not None else text))
+        
+        return spans
     
-    def _extract_entities(self, text: str) -> Dict[str, List[str]]:
+    def _extract_entities(self, text: str, spans: Optional[List[Span]] = None) -> Dict[str, List[str]]:
         """Extrai entidades do texto"""
+        if spans is None:
+            spans = self._extract_entity_spans(text)
+        
         entities = {}
+        for span in spans:
+            entities.setdefault(span.tipo, []).append(span.valor)
         
-        for entity_type, patterns in self.entity_patterns.items():
-            entities[entity_type] = []
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    # Flatten se necessário (para grupos de captura)
-                    flat_matches = []
-                    for match in matches:
-                        if isinstance(match, tuple):
-                            flat_matches.extend([m for m in match if m])
-                        else:
-                            flat_matches.append(match)
-                    
-                    entities[entity_type].extend(flat_matches)
-            
-            # Remove duplicatas
-            entities[entity_type] = list(set(entities[entity_type]))
+        # Remove duplicatas
+        return {entity_type: list(set(values)) for entity_type, values in entities.items()}
+    
+    def detect_intent_locally(self, normalized_text: str, classifier: Optional[NaiveBayesIntentClassifier] = None,
+                              threshold: float = 0.9) -> Optional[Dict[str, Any]]:
+        """Padrões e classificador local, sem OpenAI nem contexto da aplicação
+        
+        Usado pela reclassificação offline, que roda em processos separados.
+        """
+        detection = self._quick_pattern_detection(normalized_text)
+        if detection:
+            detection['intent_source'] = 'padrao'
+            return detection
         
-        # Remove entidades vazias
-        entities = {k: v for k, v in entities.items() if v}
+        if classifier is None:
+            return None
+        
+        return self._classifier_detection(classifier, normalized_text, threshold)
+    
+    def analyze_with_openai(self, text: str, normalized_text: str) -> Optional[Dict[str, Any]]:
+        """Só a etapa OpenAI (sem padrões, classificador local, cache nem micro-lote)
+        
+        Usado pela reclassificação offline, que já normalizou e corrigiu o texto
+        com o dicionário escolhido no comando.
+        """
+        entities = self._extract_entities(normalized_text, self._extract_entity_spans(normalized_text, text))
+        return self._analyze_with_openai(text, entities)
+    
+    def _local_classification(self, text: str) -> Optional[Dict[str, Any]]:
+        """Classificação pelo modelo local treinado com o histórico (só acima do limiar)"""
+        classifier = get_intent_classifier()
+        if classifier is None:
+            return None
+        
+        detection = self._classifier_detection(classifier, text, current_app.config.get('INTENT_CLASSIFIER_THRESHOLD', 0.9))
+        get_metrics().increment('classificador_local_respostas' if detection else 'classificador_local_fallback')
         
-        return entities
+        return detection
+    
+    def _classifier_detection(self, classifier: NaiveBayesIntentClassifier, text: str,
+                              threshold: float) -> Optional[Dict[str, Any]]:
+        intent, probability = classifier.predict(text)
+        if not intent or probability < threshold:
+            return None
+        
+        return {
+            'intent': intent,
+            'command_type': intent,
+            'category': self._get_category_from_command(intent),
+            'confidence': probability,
+            'intent_source': 'classificador_local'
+        }
+    
+    def _cached_openai_analysis(self, text: str, normalized_text: str, entities: Dict) -> Optional[Dict[str, Any]]:
+        """Análise OpenAI com cache: mensagens repetidas não fazem uma nova chamada"""
+        cache = get_intent_cache()
+        if cache is None:
+            return self._classify_with_openai(text, entities)
+        
+        key = cache.make_key(normalized_text, entities)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        
+        analysis = self._classify_with_openai(text, entities)
+        if analysis:
+            cache.set(key, analysis)
+        
+        return analysis
+    
+    def _classify_with_openai(self, text: str, entities: Dict) -> Optional[Dict[str, Any]]:
+        """Análise OpenAI, agrupada com outras mensagens quando o micro-lote está ligado"""
+        batcher = get_intent_batcher()
+        if batcher is None:
+            return self._analyze_with_openai(text, entities)
+        
+        return batcher.classify(text, entities, fallback=self._analyze_with_openai)
     
     def _analyze_with_openai(self, text: str, entities: Dict) -> Optional[Dict[str, Any]]:
         """Análise mais profunda usando OpenAI"""
@@ -270,7 +339,7 @@ class NLPProcessor:
             Entidades detectadas: {json.dumps(entities, ensure_ascii=False)}
             
             Determine:
-            1. Intenção principal (cadastro_prestador, busca_prestador, venda_produto, busca_produto, conexao_pessoal, achado_perdido, reclamacao, bolsa_estudo, mercado_financeiro, pesquisa_geral, saudacao, despedida, agradecimento, unknown)
+            1. Intenção principal ({', '.join(OPENAI_INTENTS)})
             2. Categoria específica (se aplicável)
             3. Confiança (0.0 a 1.0)
             4. Se requer esclarecimento
@@ -289,7 +358,7 @@ class NLPProcessor:
             }}
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = self.openai_client.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "Você é um assistente especializado em análise de intenções para o sistema Solicite IA em Angola. Responda sempre em JSON válido."},
@@ -303,22 +372,31 @@ class NLPProcessor:
             result['command_type'] = result.get('intent')
             
             return result
-            
+        
+        except CircuitOpenError:
+            # OpenAI instável: segue só com os padrões até o disjuntor fechar
+            get_metrics().increment('openai_disjuntor_aberto')
+            return None
+        
         except Exception as e:
+            get_metrics().increment('openai_erros')
             current_app.logger.error(f'Erro na análise OpenAI: {str(e)}')
             return None
     
     def _analyze_image(self, image_url: str) -> Optional[Dict[str, Any]]:
-        """Analisa imagem para determinar contexto"""
+        """Analisa imagem para determinar contexto
+        
+        image_url é o id da mídia no WhatsApp. A análise normalmente já foi
+        agendada no webhook; aqui só se espera o resultado (no modo
+        degradado, apenas se já estiver pronto), dentro do orçamento da mensagem.
+        """
         try:
-            # Aqui seria implementada a análise de imagem
-            # Por enquanto, retorna análise básica
-            return {
-                'type': 'unknown',
-                'confidence': 0.5,
-                'description': 'Imagem recebida para análise'
-            }
+            analyzer = get_image_analyzer()
+            if not analyzer:
+                return None
             
+            return analyzer.analyze(image_url, timeout=0 if is_degraded() else cap_timeout(analyzer.timeout))
+        
         except Exception as e:
             current_app.logger.error(f'Erro na análise de imagem: {str(e)}')
             return None
@@ -400,3 +478,5 @@ class NLPProcessor:
         
         return actions
 
+# O corretor ortográfico nunca troca as palavras dos padrões de comando
+register_pattern_words(NLPProcessor.command_patterns)
@@ -0,0 +1,275 @@
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Optional, Tuple
+import openai
+from flask import Flask, current_app
+from src.modules.deadline import cap_timeout
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o disjuntor do OpenAI está aberto"""
+
+class OpenAITimeoutError(Exception):
+    """Nenhuma resposta do OpenAI dentro do prazo"""
+
+class CircuitBreaker:
+    """Disjuntor das chamadas ao OpenAI (fechado -> aberto -> meio-aberto)
+    
+    Guarda o resultado das últimas window_size chamadas. Com pelo menos
+    min_calls na janela, abre se a fração de erros passar de error_rate ou a
+    de chamadas acima de slow_call_ms passar de slow_rate. Aberto, recusa
+    tudo por open_seconds; depois deixa passar uma chamada de teste, que
+    fecha o disjuntor se der certo ou o reabre se falhar.
+    """
+    
+    CLOSED = 'fechado'
+    OPEN = 'aberto'
+    HALF_OPEN = 'meio_aberto'
+    
+    def __init__(self, window_size: int = 20, min_calls: int = 5, error_rate: float = 0.5,
+                 slow_call_ms: float = 5000, slow_rate: float = 0.5, open_seconds: float = 30,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.open_seconds:
+                return self.HALF_OPEN
+            return self._state
+    
+    def allow(self) -> bool:
+        """Indica se uma chamada pode ser feita agora"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            
+            if self._state == self.OPEN and self.clock() - self._opened_at < self.open_seconds:
+                return False
+            
+            # Meio-aberto: uma única chamada de teste por vez
+            if self._probing:
+                return False
+            
+            self._state = self.HALF_OPEN
+            self._probing = True
+            return True
+    
+    def record_success(self, latency_ms: float):
+        """Registra uma chamada bem-sucedida e a sua latência"""
+        self._record(ok=True, slow=latency_ms >= self.slow_call_ms)
+    
+    def record_failure(self):
+        """Registra um erro ou estouro de prazo"""
+        self._record(ok=False, slow=False)
+    
+    def _record(self, ok: bool, slow: bool):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probing = False
+                if ok and not slow:
+                    self._state = self.CLOSED
+                    self._window.clear()
+                else:
+                    self._open()
+                return
+            
+            self._window.append((ok, slow))
+            if self._state != self.CLOSED or len(self._window) < self.min_calls:
+                return
+            
+            total = len(self._window)
+            errors = sum(1 for success, _ in self._window if not success)
+            slow_calls = sum(1 for _, is_slow in self._window if is_slow)
+            
+            if errors / total >= self.error_rate or slow_calls / total >= self.slow_rate:
+                self._open()
+    
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+        self._window.clear()
+
+class LatencyTracker:
+    """Latências recentes das chamadas bem-sucedidas, para o percentil do hedge"""
+    
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._samples)
+    
+    def add(self, latency_ms: float):
+        with self._lock:
+            self._samples.append(latency_ms)
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        """Percentil pelo método nearest-rank (None sem amostras)"""
+        with self._lock:
+            ordered = sorted(self._samples)
+        
+        if not ordered:
+            return None
+        
+        index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+        return ordered[min(index, len(ordered) - 1)]
+
+class ResilientOpenAIClient:
+    """Chamadas de chat ao OpenAI com prazo, disjuntor e hedge opcional
+    
+    Cada chamada tem um prazo total (timeout); o SDK recebe o tempo restante
+    e as suas próprias novas tentativas ficam em max_retries. Com o disjuntor
+    aberto, create() falha na hora com CircuitOpenError e o NLPProcessor
+    segue só com os padrões. Com hedge ligado, se a primeira requisição passa
+    do p95 recente (no mínimo hedge_min_delay_ms), uma segunda é enviada e
+    vale a que responder primeiro.
+    
+    base_url permite apontar para um proxy ou para um servidor de teste local.
+    """
+    
+    HEDGE_MIN_SAMPLES = 20
+    
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = 8.0, max_retries: int = 0,
+                 breaker: Optional[CircuitBreaker] = None,
+                 hedge: bool = False, hedge_min_delay_ms: float = 500, hedge_max_workers: int = 8):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_max_workers = hedge_max_workers
+        self.latencies = LatencyTracker()
+        self._client = None
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    @property
+    def client(self) -> openai.OpenAI:
+        """Cliente do SDK, criado apenas no primeiro uso"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = openai.OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        timeout=self.timeout,
+                        max_retries=self.max_retries
+                    )
+        return self._client
+    
+    def hedge_delay(self) -> float:
+        """Segundos de espera antes da requisição duplicada"""
+        # Com poucas amostras o p95 é praticamente o máximo; vale o atraso mínimo
+        p95 = self.latencies.percentile(95) if len(self.latencies) >= self.HEDGE_MIN_SAMPLES else None
+        return max(p95 or 0.0, self.hedge_min_delay_ms) / 1000.0
+    
+    def create(self, **kwargs) -> Any:
+        """Equivalente a chat.completions.create, com prazo, disjuntor e hedge
+        
+        O prazo é o menor entre o timeout e o que resta do orçamento da
+        mensagem em processamento; sem tempo, falha sem contar no disjuntor.
+        """
+        timeout = cap_timeout(self.timeout)
+        if timeout <= 0:
+            raise OpenAITimeoutError('Orçamento da mensagem esgotado')
+        
+        if not self.breaker.allow():
+            raise CircuitOpenError('Disjuntor do OpenAI aberto')
+        
+        started = time.monotonic()
+        deadline = started + timeout
+        
+        try:
+            if self.hedge:
+                response = self._hedged_call(deadline, kwargs)
+            else:
+                response = self._call(deadline, kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        self.latencies.add(latency_ms)
+        self.breaker.record_success(latency_ms)
+        
+        return response
+    
+    def _call(self, deadline: float, kwargs: dict) -> Any:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise OpenAITimeoutError('Prazo da chamada ao OpenAI esgotado')
+        
+        return self.client.chat.completions.create(timeout=remaining, **kwargs)
+    
+    def _hedged_call(self, deadline: float, kwargs: dict) -> Any:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.hedge_max_workers,
+                                                        thread_name_prefix='openai-hedge')
+        
+        futures = {self._executor.submit(self._call, deadline, kwargs)}
+        done, _ = wait(futures, timeout=min(self.hedge_delay(), max(deadline - time.monotonic(), 0)))
+        
+        if not done and time.monotonic() < deadline:
+            futures.add(self._executor.submit(self._call, deadline, kwargs))
+            current_app.logger.debug('Requisição duplicada (hedge) enviada ao OpenAI')
+        
+        # A primeira resposta válida vence; erros só contam se todas falharem
+        error = None
+        while futures:
+            done, futures = wait(futures, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        
+        raise error or OpenAITimeoutError('Prazo da chamada ao OpenAI esgotado')
+
+def init_openai_client(app: Flask) -> ResilientOpenAIClient:
+    """Cria o cliente OpenAI da aplicação (o SDK só é instanciado no primeiro uso)"""
+    breaker = CircuitBreaker(
+        window_size=app.config.get('OPENAI_BREAKER_WINDOW', 20),
+        min_calls=app.config.get('OPENAI_BREAKER_MIN_CALLS', 5),
+        error_rate=app.config.get('OPENAI_BREAKER_ERROR_RATE', 0.5),
+        slow_call_ms=app.config.get('OPENAI_BREAKER_SLOW_MS', 5000),
+        slow_rate=app.config.get('OPENAI_BREAKER_SLOW_RATE', 0.5),
+        open_seconds=app.config.get('OPENAI_BREAKER_OPEN_SECONDS', 30)
+    )
+    
+    client = ResilientOpenAIClient(
+        api_key=app.config.get('OPENAI_API_KEY'),
+        base_url=app.config.get('OPENAI_BASE_URL'),
+        timeout=app.config.get('OPENAI_TIMEOUT', 8.0),
+        max_retries=app.config.get('OPENAI_MAX_RETRIES', 0),
+        breaker=breaker,
+        hedge=app.config.get('OPENAI_HEDGE_ENABLED', False),
+        hedge_min_delay_ms=app.config.get('OPENAI_HEDGE_MIN_DELAY_MS', 500)
+    )
+    app.extensions['openai_client'] = client
+    
+    return client
+
+def get_openai_client() -> ResilientOpenAIClient:
+    """Retorna o cliente OpenAI da aplicação atual"""
+    return current_app.extensions['openai_client']
@@ -0,0 +1,110 @@
+import re
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional
+from src.modules.keyword_tables import GAZETTEER, KeywordTable, plural_forms
+
+# Remoção de acentos (mesma tabela usada desde o início pelo NLPProcessor)
+ACCENTS = str.maketrans({
+    'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a',
+    'é': 'e', 'ê': 'e',
+    'í': 'i', 'î': 'i',
+    'ó': 'o', 'ô': 'o', 'õ': 'o',
+    'ú': 'u', 'û': 'u',
+    'ç': 'c'
+})
+
+NON_WORD = re.compile(r'[^\w\s]')
+SPACES = re.compile(r'\s+')
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos, sem pontuação e com espaços simples"""
+    if not text:
+        return ""
+    
+    text = text.lower().translate(ACCENTS)
+    text = NON_WORD.sub(' ', text)
+    
+    return SPACES.sub(' ', text).strip()
+
+class Span(NamedTuple):
+    """Trecho tipado do texto normalizado (entidade extraída)
+    
+    Valores, telefones, idades e datas são extraídos do texto original:
+    as posições referem-se a ele e dado traz o valor já interpretado.
+    """
+    tipo: str
+    inicio: int
+    fim: int
+    valor: str
+    dado: Any = None
+
+class ParsedMessage:
+    """Mensagem já normalizada e tokenizada, compartilhada por todos os módulos
+    
+    Produzida uma única vez pelo NLPProcessor e entregue pelo MessageRouter em
+    nlp_result['parsed']. As palavras-chave dos módulos já estão normalizadas
+    (minúsculas, sem acentos): palavras simples são consultadas no conjunto de
+    tokens e expressões com espaço no texto normalizado, sempre respeitando
+    os limites de palavra e aceitando os plurais regulares. As tabelas
+    registradas no gazetteer (KeywordTable) são todas verificadas de uma
+    vez, na criação, e ficam em hits.
+    """
+    
+    __slots__ = ('text', 'normalized', 'tokens', 'token_set', 'spans', 'hits', '_padded')
+    
+    def __init__(self, text: str, normalized: Optional[str] = None, spans: Optional[List[Span]] = None):
+        self.text = text or ''
+        self.normalized = normalize_text(self.text) if normalized is None else normalized
+        self.tokens = tuple(self.normalized.split())
+        self.token_set = frozenset(self.tokens)
+        self.spans = spans or []
+        self.hits = GAZETTEER.scan(self.normalized)
+        self._padded = f' {self.normalized} '
+    
+    def has(self, keyword: str) -> bool:
+        """Indica se a palavra (ou expressão) aparece na mensagem, no singular ou no plural"""
+        forms = (keyword,) + plural_forms(keyword)
+        if ' ' in keyword:
+            return any(f' {form} ' in self._padded for form in forms)
+        return any(form in self.token_set for form in forms)
+    
+    def has_any(self, keywords: Iterable[str]) -> bool:
+        """Indica se alguma das palavras aparece na mensagem"""
+        return any(self.has(keyword) for keyword in keywords)
+    
+    def first(self, keywords: Iterable[str]) -> Optional[str]:
+        """Primeira palavra da lista que aparece na mensagem"""
+        return next((keyword for keyword in keywords if self.has(keyword)), None)
+    
+    def matches(self, table: Mapping[str, Iterable[str]]) -> List[str]:
+        """Chaves da tabela com alguma palavra presente na mensagem, na ordem da tabela"""
+        if isinstance(table, KeywordTable):
+            keys = self.hits.get(table.name)
+            return [key for key in table if key in keys] if keys else []
+        
+        return [key for key, keywords in table.items() if self.has_any(keywords)]
+    
+    def first_key(self, table: Mapping[str, Iterable[str]]) -> Optional[str]:
+        """Primeira chave da tabela com alguma palavra presente na mensagem"""
+        if isinstance(table, KeywordTable):
+            keys = self.hits.get(table.name)
+            return next((key for key in table if key in keys), None) if keys else None
+        
+        return next((key for key, keywords in table.items() if self.has_any(keywords)), None)
+    
+    def values(self, tipo: str) -> List[str]:
+        """Valores dos trechos de um tipo, na ordem em que foram extraídos"""
+        return [span.valor for span in self.spans if span.tipo == tipo]
+    
+    def typed(self, tipo: str) -> List[Any]:
+        """Valores já interpretados (Amount, date, int...) dos trechos de um tipo, na ordem do texto"""
+        return [span.dado for span in self.spans if span.tipo == tipo and span.dado is not None]
+
+def get_parsed(nlp_result: Dict[str, Any]) -> ParsedMessage:
+    """ParsedMessage do resultado do NLP (criada aqui se o resultado não tiver uma)"""
+    parsed = nlp_result.get('parsed')
+    
+    if parsed is None:
+        parsed = ParsedMessage(nlp_result.get('text') or '')
+        nlp_result['parsed'] = parsed
+    
+    return parsed
@@ -1,38 +1,62 @@
 from typing import Dict, Any, List
 from flask import current_app
 from src.models import db, User, ConexaoPessoal, Conversa
+from src.modules.deferred_writes import record_view
+from src.modules.keyword_tables import freeze, keyword_table
+from src.modules.deadline import search_limit
+from src.modules.parsed_message import ParsedMessage, get_parsed
+from src.modules.places import location_filter
 import json
 import re
 
 class PersonalConnectionsModule:
     """Módulo para gerenciar conexões pessoais e relacionamentos"""
     
-    def __init__(self):
-        self.interests = {
-            'amizade': ['amizade', 'amigo', 'amiga', 'conhecer pessoas', 'fazer amigos'],
-            'namoro': ['namoro', 'namorar', 'relacionamento', 'parceiro', 'parceira'],
-            'casamento': ['casamento', 'casar', 'matrimonio', 'esposo', 'esposa'],
-            'networking': ['networking', 'profissional', 'negocios', 'trabalho', 'carreira']
-        }
-        
-        self.physical_types = {
-            'atletico': ['atletico', 'musculoso', 'forte', 'academia'],
-            'magro': ['magro', 'esbelto', 'fino'],
-            'normal': ['normal', 'medio', 'comum'],
-            'plus_size': ['plus size', 'gordinho', 'cheio', 'robusto']
-        }
+    interests = keyword_table('personal_connections.interests', {
+        'amizade': ['amizade', 'amigo', 'amiga', 'conhecer pessoas', 'fazer amigos'],
+        'namoro': ['namoro', 'namorar', 'relacionamento', 'parceiro', 'parceira'],
+        'casamento': ['casamento', 'casar', 'matrimonio', 'esposo', 'esposa'],
+        'networking': ['networking', 'profissional', 'negocios', 'trabalho', 'carreira']
+    })
+    
+    physical_types = keyword_table('personal_connections.physical_types', {
+        'atletico': ['atletico', 'musculoso', 'forte', 'academia'],
+        'magro': ['magro', 'esbelto', 'fino'],
+        'normal': ['normal', 'medio', 'comum'],
+        'plus_size': ['plus size', 'gordinho', 'cheio', 'robusto']
+    })
+    
+    registration_indicators = freeze([
+        'sou', 'tenho', 'anos', 'idade', 'meu nome',
+        'me chamo', 'trabalho como', 'profissao'
+    ])
+    
+    genders = keyword_table('personal_connections.genders', {
+        'masculino': ['homem', 'masculino', 'rapaz', 'senhor'],
+        'feminino': ['mulher', 'feminino', 'rapariga', 'senhora', 'dama']
+    })
+    
+    target_genders = keyword_table('personal_connections.target_genders', {
+        'masculino': ['procuro homem', 'quero homem', 'homem para'],
+        'feminino': ['procuro mulher', 'quero mulher', 'mulher para']
+    })
+    
+    marital_statuses = keyword_table('personal_connections.marital_statuses', {
+        'solteiro': ['solteiro', 'solteira', 'single'],
+        'casado': ['casado', 'casada', 'esposo', 'esposa'],
+        'divorciado': ['divorciado', 'divorciada', 'separado', 'separada'],
+        'viuvo': ['viuvo', 'viuva']
+    })
     
     def process_message(self, nlp_result: Dict[str, Any], user: User, conversa: Conversa) -> Dict[str, Any]:
         """Processa mensagem relacionada a conexões pessoais"""
         try:
-            text = nlp_result.get('text', '')
-            
             # Verifica se é cadastro ou busca
-            if self._is_registration(text):
+            if self._is_registration(get_parsed(nlp_result)):
                 return self._handle_connection_registration(nlp_result, user, conversa)
             else:
                 return self._handle_connection_search(nlp_result, user, conversa)
-                
+        
         except Exception as e:
             current_app.logger.error(f'Erro no módulo de conexões: {str(e)}')
             return {
@@ -41,15 +65,9 @@ class PersonalConnectionsModule:
                 'error': str(e)
             }
     
-    def _is_registration(self, text: str) -> bool:
+    def _is_registration(self, parsed: ParsedMessage) -> bool:
         """Determina se é um cadastro ou busca"""
-        registration_indicators = [
-            'sou', 'tenho', 'anos', 'idade', 'meu nome',
-            'me chamo', 'trabalho como', 'profissao'
-        ]
-        
-        text_lower = text.lower()
-        return any(indicator in text_lower for indicator in registration_indicators)
+        return parsed.has_any(self.registration_indicators)
     
     def _handle_connection_registration(self, nlp_result: Dict, user: User, conversa: Conversa) -> Dict[str, Any]:
         """Trata cadastro de perfil pessoal"""
@@ -57,7 +75,7 @@ class PersonalConnectionsModule:
         entities = nlp_result.get('entities', {})
         
         # Extrai informações básicas
-        profile_info = self._extract_profile_info(text, entities)
+        profile_info = self._extract_profile_info(text, get_parsed(nlp_result), entities)
         
         # Verifica se já tem perfil
         existing = ConexaoPessoal.query.filter_by(usuario_id=user.id).first()
@@ -80,23 +98,20 @@ class PersonalConnectionsModule:
         # Solicita informações adicionais
         return self._request_additional_profile_info(profile_info, user, conversa)
     
-    def _extract_profile_info(self, text: str, entities: Dict) -> Dict[str, Any]:
+    def _extract_profile_info(self, text: str, parsed: ParsedMessage, entities: Dict) -> Dict[str, Any]:
         """Extrai informações do perfil"""
         info = {}
         
         # Extrai gênero
-        info['gender'] = self._extract_gender(text)
+        info['gender'] = self._extract_gender(parsed)
         
         # Extrai idade
-        ages = entities.get('idade', [])
+        ages = parsed.typed('idade')
         if ages:
-            try:
-                info['age'] = int(ages[0])
-            except:
-                pass
+            info['age'] = ages[0]
         
         # Extrai interesse
-        info['interest'] = self._extract_interest(text)
+        info['interest'] = self._extract_interest(parsed)
         
         # Extrai localização
         locations = entities.get('localizacao', [])
@@ -104,61 +119,31 @@ class PersonalConnectionsModule:
             info['location'] = locations[0]
         
         # Extrai estado civil
-        info['marital_status'] = self._extract_marital_status(text)
+        info['marital_status'] = self._extract_marital_status(parsed)
         
         # Extrai tipo físico
-        info['physical_type'] = self._extract_physical_type(text)
+        info['physical_type'] = self._extract_physical_type(parsed)
         
         # Extrai profissão
         info['profession'] = self._extract_profession(text)
         
         return info
     
-    def _extract_gender(self, text: str) -> str:
+    def _extract_gender(self, parsed: ParsedMessage) -> str:
         """Extrai gênero do texto"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['homem', 'masculino', 'rapaz', 'senhor']):
-            return 'masculino'
-        elif any(word in text_lower for word in ['mulher', 'feminino', 'rapariga', 'senhora', 'dama']):
-            return 'feminino'
-        
-        return None
+        return parsed.first_key(self.genders)
     
-    def _extract_interest(self, text: str) -> str:
+    def _extract_interest(self, parsed: ParsedMessage) -> str:
         """Extrai tipo de interesse"""
-        text_lower = text.lower()
-        
-        for interest, keywords in self.interests.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return interest
-        
-        return 'amizade'  # Padrão
+        return parsed.first_key(self.interests) or 'amizade'  # Padrão
     
-    def _extract_marital_status(self, text: str) -> str:
+    def _extract_marital_status(self, parsed: ParsedMessage) -> str:
         """Extrai estado civil"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['solteiro', 'solteira', 'single']):
-            return 'solteiro'
-        elif any(word in text_lower for word in ['casado', 'casada', 'esposo', 'esposa']):
-            return 'casado'
-        elif any(word in text_lower for word in ['divorciado', 'divorciada', 'separado', 'separada']):
-            return 'divorciado'
-        elif any(word in text_lower for word in ['viuvo', 'viuva']):
-            return 'viuvo'
-        
-        return 'solteiro'  # Padrão
+        return parsed.first_key(self.marital_statuses) or 'solteiro'  # Padrão
     
-    def _extract_physical_type(self, text: str) -> str:
+    def _extract_physical_type(self, parsed: ParsedMessage) -> str:
         """Extrai tipo físico"""
-        text_lower = text.lower()
-        
-        for phys_type, keywords in self.physical_types.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return phys_type
-        
-        return None
+        return parsed.first_key(self.physical_types)
     
     def _extract_profession(self, text: str) -> str:
         """Extrai profissão"""
@@ -227,8 +212,7 @@ class PersonalConnectionsModule:
             'missing_info': missing_info,
             'step': 'collecting_required'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         return {
             'success': True,
@@ -268,8 +252,7 @@ class PersonalConnectionsModule:
             'profile_info': profile_info,
             'step': 'collecting_additional'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         buttons = [
             {'id': 'complete_profile', 'title': '✅ Finalizar Perfil'},
@@ -285,11 +268,10 @@ class PersonalConnectionsModule:
     
     def _handle_connection_search(self, nlp_result: Dict, user: User, conversa: Conversa) -> Dict[str, Any]:
         """Trata busca por conexões"""
-        text = nlp_result.get('text', '')
         entities = nlp_result.get('entities', {})
         
         # Extrai critérios de busca
-        search_criteria = self._extract_search_criteria(text, entities)
+        search_criteria = self._extract_search_criteria(get_parsed(nlp_result), entities)
         
         # Busca conexões
         connections = self._search_connections(search_criteria, user.id)
@@ -299,23 +281,20 @@ class PersonalConnectionsModule:
         
         return self._format_connections_response(connections, search_criteria)
     
-    def _extract_search_criteria(self, text: str, entities: Dict) -> Dict[str, Any]:
+    def _extract_search_criteria(self, parsed: ParsedMessage, entities: Dict) -> Dict[str, Any]:
         """Extrai critérios de busca"""
         criteria = {}
         
         # Gênero procurado
-        criteria['gender'] = self._extract_target_gender(text)
+        criteria['gender'] = self._extract_target_gender(parsed)
         
         # Interesse
-        criteria['interest'] = self._extract_interest(text)
+        criteria['interest'] = self._extract_interest(parsed)
         
         # Idade
-        ages = entities.get('idade', [])
+        ages = parsed.typed('idade')
         if ages:
-            try:
-                criteria['age'] = int(ages[0])
-            except:
-                pass
+            criteria['age'] = ages[0]
         
         # Localização
         locations = entities.get('localizacao', [])
@@ -323,20 +302,13 @@ class PersonalConnectionsModule:
             criteria['location'] = locations[0]
         
         # Tipo físico
-        criteria['physical_type'] = self._extract_physical_type(text)
+        criteria['physical_type'] = self._extract_physical_type(parsed)
         
         return criteria
     
-    def _extract_target_gender(self, text: str) -> str:
+    def _extract_target_gender(self, parsed: ParsedMessage) -> str:
         """Extrai gênero procurado"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['procuro homem', 'quero homem', 'homem para']):
-            return 'masculino'
-        elif any(word in text_lower for word in ['procuro mulher', 'quero mulher', 'mulher para']):
-            return 'feminino'
-        
-        return None
+        return parsed.first_key(self.target_genders)
     
     def _search_connections(self, criteria: Dict, exclude_user_id: int) -> List[ConexaoPessoal]:
         """Busca conexões baseado nos critérios"""
@@ -362,7 +334,7 @@ class PersonalConnectionsModule:
             )
         
         if criteria.get('location'):
-            query = query.filter(ConexaoPessoal.localizacao.ilike(f'%{criteria["location"]}%'))
+            query = query.filter(location_filter(criteria['location'], ConexaoPessoal.localizacao))
         
         if criteria.get('physical_type'):
             query = query.filter(ConexaoPessoal.categoria_fisica.ilike(f'%{criteria["physical_type"]}%'))
@@ -370,7 +342,7 @@ class PersonalConnectionsModule:
         return query.order_by(
             ConexaoPessoal.verificado.desc(),
             ConexaoPessoal.ultimo_acesso.desc()
-        ).limit(10).all()
+        ).limit(search_limit(10)).all()
     
     def _get_compatible_interests(self, interest: str) -> List[str]:
         """Retorna interesses compatíveis"""
@@ -391,33 +363,9 @@ class PersonalConnectionsModule:
         
         for i, connection in enumerate(connections, 1):
             # Incrementa visualização
-            connection.incrementar_visualizacao()
-            
-            # Monta texto da conexão (sem dados sensíveis)
-            conn_text = f"*{connection.nome}*\n"
-            conn_text += f"👤 {connection.genero.title()}, {connection.idade} anos\n"
-            conn_text += f"📍 {connection.localizacao}\n"
-            conn_text += f"💕 Interesse: {connection.interesse}\n"
-            
-            if connection.profissao:
-                conn_text += f"💼 {connection.profissao}\n"
+            record_view(connection)
             
-            if connection.categoria_fisica:
-                conn_text += f"🏃 {connection.categoria_fisica}\n"
-            
-            if connection.altura:
-                conn_text += f"📏 {connection.altura}\n"
-            
-            if connection.verificado:
-                conn_text += "✅ Perfil verificado\n"
-            
-            if connection.bio:
-                bio_short = connection.bio[:100] + "..." if len(connection.bio) > 100 else connection.bio
-                conn_text += f"📝 {bio_short}\n"
-            
-            conn_text += f"👁️ {connection.visualizacoes} visualizações"
-            
-            text += f"{i}. {conn_text}\n\n"
+            text += f"{i}. {self._format_connection_text(connection)}\n\n"
             
             # Adiciona à lista interativa
             list_items.append({
@@ -441,6 +389,53 @@ class PersonalConnectionsModule:
             'buttons': buttons
         }
     
+    def _format_connection_text(self, connection: ConexaoPessoal) -> str:
+        """Monta o texto de um perfil (sem dados sensíveis)"""
+        conn_text = f"*{connection.nome}*\n"
+        conn_text += f"👤 {connection.genero.title()}, {connection.idade} anos\n"
+        conn_text += f"📍 {connection.localizacao}\n"
+        conn_text += f"💕 Interesse: {connection.interesse}\n"
+        
+        if connection.profissao:
+            conn_text += f"💼 {connection.profissao}\n"
+        
+        if connection.categoria_fisica:
+            conn_text += f"🏃 {connection.categoria_fisica}\n"
+        
+        if connection.altura:
+            conn_text += f"📏 {connection.altura}\n"
+        
+        if connection.verificado:
+            conn_text += "✅ Perfil verificado\n"
+        
+        if connection.bio:
+            bio_short = connection.bio[:100] + "..." if len(connection.bio) > 100 else connection.bio
+            conn_text += f"📝 {bio_short}\n"
+        
+        conn_text += f"👁️ {connection.visualizacoes} visualizações"
+        
+        return conn_text
+    
+    def show_connection(self, connection_id: int, user: User) -> Dict[str, Any]:
+        """Mostra o perfil escolhido na lista interativa"""
+        connection = ConexaoPessoal.query.get(connection_id)
+        
+        if not connection or not connection.ativo:
+            return {
+                'success': True,
+                'text': "😔 Este perfil não está mais disponível.\n\nDigite 'Procuro [homem/mulher] para [interesse]' para uma nova busca."
+            }
+        
+        record_view(connection)
+        
+        return {
+            'success': True,
+            'text': self._format_connection_text(connection),
+            'buttons': [
+                {'id': 'search_again', 'title': '🔍 Nova Busca'}
+            ]
+        }
+    
     def _handle_no_connections_found(self, criteria: Dict) -> Dict[str, Any]:
         """Trata caso onde não foram encontradas conexões"""
         text = "😔 Não encontrei pessoas com esse perfil no momento.\n\n"
@@ -489,7 +484,7 @@ class PersonalConnectionsModule:
             )
             
             db.session.add(profile)
-            db.session.commit()
+            db.session.flush()
             
             text = f"✅ *Perfil criado com sucesso!*\n\n"
             text += f"👤 *Nome:* {profile.nome}\n"
@@ -508,7 +503,7 @@ class PersonalConnectionsModule:
                 'success': True,
                 'text': text
             }
-            
+        
         except Exception as e:
             current_app.logger.error(f'Erro ao criar perfil: {str(e)}')
             return {
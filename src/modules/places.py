@@ -0,0 +1,383 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import func, or_
+from src.modules.parsed_message import ACCENTS, normalize_text
+
+class Place(NamedTuple):
+    """Localidade canônica do gazetteer"""
+    id: str
+    nome: str
+    tipo: str  # provincia, municipio ou bairro
+    provincia: str  # id da província
+
+class PlaceMatch(NamedTuple):
+    """Localidade encontrada no texto normalizado"""
+    place: Place
+    inicio: int
+    fim: int
+    distancia: int
+
+# (id, nome, tipo, província, variantes além do nome)
+PLACE_DATA = (
+    # Províncias (divisão de 2024, mais Cuando Cubango, ainda muito usada)
+    ('bengo', 'Bengo', 'provincia', 'bengo', ()),
+    ('benguela', 'Benguela', 'provincia', 'benguela', ()),
+    ('bie', 'Bié', 'provincia', 'bie', ()),
+    ('cabinda', 'Cabinda', 'provincia', 'cabinda', ()),
+    ('cuando', 'Cuando', 'provincia', 'cuando', ()),
+    ('cubango', 'Cubango', 'provincia', 'cubango', ()),
+    ('cuando_cubango', 'Cuando Cubango', 'provincia', 'cuando_cubango', ('kuando kubango',)),
+    ('cuanza_norte', 'Cuanza Norte', 'provincia', 'cuanza_norte', ('kwanza norte',)),
+    ('cuanza_sul', 'Cuanza Sul', 'provincia', 'cuanza_sul', ('kwanza sul',)),
+    ('cunene', 'Cunene', 'provincia', 'cunene', ()),
+    ('huambo', 'Huambo', 'provincia', 'huambo', ()),
+    ('huila', 'Huíla', 'provincia', 'huila', ()),
+    ('icolo_e_bengo', 'Icolo e Bengo', 'provincia', 'icolo_e_bengo', ('icolo bengo',)),
+    ('luanda', 'Luanda', 'provincia', 'luanda', ()),
+    ('lunda_norte', 'Lunda Norte', 'provincia', 'lunda_norte', ()),
+    ('lunda_sul', 'Lunda Sul', 'provincia', 'lunda_sul', ()),
+    ('malanje', 'Malanje', 'provincia', 'malanje', ('malange',)),
+    ('moxico', 'Moxico', 'provincia', 'moxico', ()),
+    ('moxico_leste', 'Moxico Leste', 'provincia', 'moxico_leste', ()),
+    ('namibe', 'Namibe', 'provincia', 'namibe', ()),
+    ('uige', 'Uíge', 'provincia', 'uige', ()),
+    ('zaire', 'Zaire', 'provincia', 'zaire', ()),
+    
+    # Municípios e cidades
+    ('belas', 'Belas', 'municipio', 'luanda', ()),
+    ('cacuaco', 'Cacuaco', 'municipio', 'luanda', ()),
+    ('cazenga', 'Cazenga', 'municipio', 'luanda', ()),
+    ('kilamba_kiaxi', 'Kilamba Kiaxi', 'municipio', 'luanda', ('kilamba kiaxe', 'quilamba quiaxi')),
+    ('talatona', 'Talatona', 'municipio', 'luanda', ()),
+    ('viana', 'Viana', 'municipio', 'luanda', ()),
+    ('quicama', 'Quiçama', 'municipio', 'luanda', ('kissama', 'quissama')),
+    ('catete', 'Catete', 'municipio', 'icolo_e_bengo', ()),
+    ('caxito', 'Caxito', 'municipio', 'bengo', ()),
+    ('dande', 'Dande', 'municipio', 'bengo', ()),
+    ('lobito', 'Lobito', 'municipio', 'benguela', ()),
+    ('catumbela', 'Catumbela', 'municipio', 'benguela', ()),
+    ('baia_farta', 'Baía Farta', 'municipio', 'benguela', ()),
+    ('cubal', 'Cubal', 'municipio', 'benguela', ()),
+    ('lubango', 'Lubango', 'municipio', 'huila', ()),
+    ('matala', 'Matala', 'municipio', 'huila', ()),
+    ('chibia', 'Chibia', 'municipio', 'huila', ()),
+    ('caala', 'Caála', 'municipio', 'huambo', ()),
+    ('kuito', 'Kuito', 'municipio', 'bie', ('cuito',)),
+    ('saurimo', 'Saurimo', 'municipio', 'lunda_sul', ()),
+    ('dundo', 'Dundo', 'municipio', 'lunda_norte', ()),
+    ('menongue', 'Menongue', 'municipio', 'cubango', ()),
+    ('ondjiva', 'Ondjiva', 'municipio', 'cunene', ('ongiva',)),
+    ('mbanza_kongo', 'Mbanza Kongo', 'municipio', 'zaire', ('mbanza congo',)),
+    ('soyo', 'Soyo', 'municipio', 'zaire', ()),
+    ('negage', 'Negage', 'municipio', 'uige', ()),
+    ('sumbe', 'Sumbe', 'municipio', 'cuanza_sul', ()),
+    ('porto_amboim', 'Porto Amboim', 'municipio', 'cuanza_sul', ()),
+    ('gabela', 'Gabela', 'municipio', 'cuanza_sul', ()),
+    ('ndalatando', "N'dalatando", 'municipio', 'cuanza_norte', ('ndalatando',)),
+    ('luena', 'Luena', 'municipio', 'moxico', ()),
+    ('mocamedes', 'Moçâmedes', 'municipio', 'namibe', ()),
+    ('tombwa', 'Tômbwa', 'municipio', 'namibe', ('tombua',)),
+    
+    # Bairros e zonas de Luanda
+    ('ingombota', 'Ingombota', 'bairro', 'luanda', ()),
+    ('maianga', 'Maianga', 'bairro', 'luanda', ()),
+    ('rangel', 'Rangel', 'bairro', 'luanda', ()),
+    ('sambizanga', 'Sambizanga', 'bairro', 'luanda', ()),
+    ('samba', 'Samba', 'bairro', 'luanda', ()),
+    ('kilamba', 'Kilamba', 'bairro', 'luanda', ('centralidade do kilamba', 'cidade do kilamba')),
+    ('zango', 'Zango', 'bairro', 'luanda', ()),
+    ('benfica', 'Benfica', 'bairro', 'luanda', ()),
+    ('camama', 'Camama', 'bairro', 'luanda', ()),
+    ('golfe', 'Golfe', 'bairro', 'luanda', ()),
+    ('prenda', 'Prenda', 'bairro', 'luanda', ()),
+    ('alvalade', 'Alvalade', 'bairro', 'luanda', ()),
+    ('miramar', 'Miramar', 'bairro', 'luanda', ()),
+    ('marginal', 'Marginal', 'bairro', 'luanda', ()),
+    ('baixa', 'Baixa', 'bairro', 'luanda', ('baixa de luanda',)),
+    ('cidade_alta', 'Cidade Alta', 'bairro', 'luanda', ()),
+    ('maculusso', 'Maculusso', 'bairro', 'luanda', ()),
+    ('mutamba', 'Mutamba', 'bairro', 'luanda', ()),
+    ('kinaxixi', 'Kinaxixi', 'bairro', 'luanda', ('quinaxixe', 'kinaxixe')),
+    ('palanca', 'Palanca', 'bairro', 'luanda', ()),
+    ('hoji_ya_henda', 'Hoji ya Henda', 'bairro', 'luanda', ()),
+    ('cassenda', 'Cassenda', 'bairro', 'luanda', ()),
+    ('morro_bento', 'Morro Bento', 'bairro', 'luanda', ()),
+    ('futungo', 'Futungo', 'bairro', 'luanda', ('futungo de belas',)),
+    ('patriota', 'Patriota', 'bairro', 'luanda', ()),
+    ('nova_vida', 'Nova Vida', 'bairro', 'luanda', ()),
+    ('sequele', 'Sequele', 'bairro', 'luanda', ()),
+    ('mulenvos', 'Mulenvos', 'bairro', 'luanda', ()),
+    ('kikolo', 'Kikolo', 'bairro', 'luanda', ('quicolo',)),
+    ('tala_hady', 'Tala Hady', 'bairro', 'luanda', ()),
+    ('kapalanga', 'Kapalanga', 'bairro', 'luanda', ()),
+    ('estalagem', 'Estalagem', 'bairro', 'luanda', ()),
+    ('kikuxi', 'Kikuxi', 'bairro', 'luanda', ()),
+    ('mussulo', 'Mussulo', 'bairro', 'luanda', ()),
+    ('ilha_de_luanda', 'Ilha de Luanda', 'bairro', 'luanda', ('ilha do cabo',)),
+    ('chicala', 'Chicala', 'bairro', 'luanda', ()),
+    ('coqueiros', 'Coqueiros', 'bairro', 'luanda', ()),
+    ('bairro_operario', 'Bairro Operário', 'bairro', 'luanda', ()),
+    ('rocha_pinto', 'Rocha Pinto', 'bairro', 'luanda', ()),
+    ('vila_alice', 'Vila Alice', 'bairro', 'luanda', ()),
+    ('cruzeiro', 'Cruzeiro', 'bairro', 'luanda', ())
+)
+
+# Nomes que também são palavras comuns ("preço baixa", "jogo do benfica", "quando"):
+# só valem depois de uma preposição de lugar
+AMBIGUOUS_PLACES = frozenset({
+    'belas', 'samba', 'benfica', 'golfe', 'prenda', 'marginal', 'baixa', 'palanca',
+    'patriota', 'nova_vida', 'estalagem', 'coqueiros', 'cruzeiro', 'cuando'
+})
+
+# Palavras que introduzem um lugar; as fortes valem também para os nomes ambíguos
+STRONG_CUES = frozenset({
+    'em', 'no', 'na', 'nos', 'nas', 'para', 'pra', 'ate', 'bairro', 'zona', 'municipio',
+    'provincia', 'centralidade', 'perto', 'proximo', 'moro', 'vivo'
+})
+WEAK_CUES = frozenset({'de', 'do', 'da', 'dos', 'das'})
+
+CUE_NONE, CUE_WEAK, CUE_STRONG = 0, 1, 2
+
+TOKEN = re.compile(r'\S+')
+
+HARD_C = re.compile(r'c(?=[aou])')
+
+@lru_cache(maxsize=65536)
+def fold(text: str) -> str:
+    """Grafia simplificada: 'Quilamba' e 'Kilamba', 'Cacuaco' e 'Kakuako' viram a mesma chave"""
+    text = text.replace('qu', 'k').replace('ll', 'l').replace('ss', 's').replace('w', 'u').replace('y', 'i')
+    return HARD_C.sub('k', text)
+
+def max_distance(length: int) -> int:
+    """Erros de digitação tolerados para uma chave deste tamanho"""
+    if length < 5:
+        return 0
+    return 1 if length < 9 else 2
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Distância de Damerau-Levenshtein (transposições adjacentes); limit + 1 se passar do limite"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    
+    return previous[-1]
+
+def deletes(key: str, distance: int) -> Set[str]:
+    """Variantes da chave com até distance caracteres removidos (índice SymSpell)"""
+    variants = {key}
+    frontier = {key}
+    
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        variants |= frontier
+    
+    return variants
+
+class PlaceGazetteer:
+    """Províncias, municípios e bairros de Angola com busca aproximada (SymSpell)
+    
+    As variantes de cada localidade são indexadas normalizadas e com a
+    grafia simplificada (fold), junto com as suas remoções de até 2
+    caracteres. Uma passada pelos tokens da mensagem testa as expressões
+    de até max_words palavras, da mais longa para a mais curta: a consulta
+    exata é um acesso ao dicionário; a aproximada (só depois de 'em', 'no',
+    'de'...) gera as remoções da consulta e confirma os candidatos com a
+    distância de edição.
+    """
+    
+    def __init__(self, data: Iterable[Tuple[str, str, str, str, Tuple[str, ...]]] = PLACE_DATA,
+                 ambiguous: Iterable[str] = AMBIGUOUS_PLACES):
+        self.places: Dict[str, Place] = {}
+        self.names: Dict[str, Tuple[str, ...]] = {}
+        self.ambiguous = frozenset(ambiguous)
+        self.exact: Dict[str, Place] = {}
+        self.index: Dict[str, Set[str]] = {}
+        self.lengths: Dict[int, Set[int]] = {}
+        self.first_words: Dict[str, int] = {}
+        self.multi_word_starts: Set[str] = set()
+        self.max_words = 1
+        
+        for place_id, nome, tipo, provincia, variants in data:
+            place = Place(place_id, nome, tipo, provincia)
+            self.places[place_id] = place
+            self.names[place_id] = tuple(normalize_text(variant) for variant in (nome,) + tuple(variants))
+            
+            for variant in (nome,) + tuple(variants):
+                key = fold(normalize_text(variant))
+                self.exact.setdefault(key, place)
+                words = key.split()
+                self.lengths.setdefault(len(words), set()).add(len(key))
+                self.first_words[words[0]] = max(self.first_words.get(words[0], 1), len(words))
+                if len(words) > 1:
+                    self.multi_word_starts |= deletes(words[0], 1 if len(words[0]) >= 5 else 0)
+                self.max_words = max(self.max_words, len(words))
+                
+                for deleted in deletes(key, max_distance(len(key))):
+                    self.index.setdefault(deleted, set()).add(key)
+    
+    def get(self, place_id: str) -> Optional[Place]:
+        return self.places.get(place_id)
+    
+    def lookup(self, key: str, fuzzy: bool = True) -> Optional[Tuple[Place, int]]:
+        """Localidade da chave (já com fold) e a distância, ou None"""
+        place = self.exact.get(key)
+        if place is not None:
+            return place, 0
+        
+        if not fuzzy:
+            return None
+        
+        limit = max_distance(len(key))
+        if not limit:
+            return None
+        
+        # Nenhuma chave com o mesmo número de palavras e tamanho próximo: nem gera as remoções
+        lengths = self.lengths.get(key.count(' ') + 1, ())
+        if not any(abs(length - len(key)) <= limit for length in lengths):
+            return None
+        
+        best = None
+        candidates = set()
+        for deleted in deletes(key, limit):
+            candidates |= self.index.get(deleted, set())
+        
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, min(limit, max_distance(len(candidate))))
+            if distance <= min(limit, max_distance(len(candidate))) and (best is None or distance < best[1]):
+                best = (self.exact[candidate], distance)
+        
+        return best
+    
+    def find(self, normalized_text: str) -> List[PlaceMatch]:
+        """Localidades mencionadas no texto normalizado, em ordem"""
+        tokens = [(m.start(), m.end(), fold(m.group())) for m in TOKEN.finditer(normalized_text)]
+        matches = []
+        i = 0
+        
+        while i < len(tokens):
+            cue = self._cue(tokens, i)
+            match = None
+            
+            # Primeiro a grafia exata (mais longa primeiro), depois a aproximada
+            for fuzzy in (False, True) if cue else (False,):
+                # A consulta exata só tenta expressões que começam por uma palavra indexada
+                longest = self.max_words if fuzzy else self.first_words.get(tokens[i][2], 0)
+                
+                for size in range(min(longest, len(tokens) - i), 0, -1):
+                    words = tokens[i:i + size]
+                    # Na busca aproximada, expressões com números, preposições ou começando
+                    # por palavras curtas ('um', 'os') não são nomes de lugar
+                    if fuzzy and (len(words[0][2]) < 3 or any(
+                            word.isdigit() or word in STRONG_CUES or word in WEAK_CUES for _, _, word in words)):
+                        continue
+                    
+                    # Expressões de várias palavras só se a primeira lembra o início de um nome composto
+                    if fuzzy and size > 1 and not self._starts_multi_word(words[0][2]):
+                        continue
+                    
+                    found = self.lookup(' '.join(word for _, _, word in words), fuzzy=fuzzy)
+                    if found and self._accept(found[0], found[1], cue):
+                        match = PlaceMatch(found[0], words[0][0], words[-1][1], found[1])
+                        i += size
+                        break
+                if match:
+                    break
+            
+            if match:
+                matches.append(match)
+            else:
+                i += 1
+        
+        return matches
+    
+    def resolve(self, text: str) -> Optional[Place]:
+        """Localidade de um trecho que já é um nome de lugar ('em Benguella' -> Benguela)"""
+        normalized = normalize_text(text)
+        for prefix in ('em ', 'no ', 'na '):
+            if normalized.startswith(prefix):
+                normalized = normalized[len(prefix):]
+                break
+        
+        found = self.lookup(fold(normalized))
+        return found[0] if found else None
+    
+    def search_names(self, location: str) -> Tuple[str, ...]:
+        """Grafias normalizadas que identificam a localidade nos registros gravados
+        
+        A primeira é a do nome canônico. Um texto que não é uma localidade
+        conhecida vale como está, normalizado.
+        """
+        place = self.resolve(location)
+        if place is not None:
+            return self.names[place.id]
+        
+        normalized = normalize_text(location)
+        return (normalized,) if normalized else ()
+    
+    def _starts_multi_word(self, word: str) -> bool:
+        if word in self.multi_word_starts:
+            return True
+        return len(word) >= 5 and any(variant in self.multi_word_starts for variant in deletes(word, 1))
+    
+    def _cue(self, tokens: List[Tuple[int, int, str]], i: int) -> int:
+        if i == 0:
+            return CUE_NONE
+        
+        previous = tokens[i - 1][2]
+        if previous in STRONG_CUES:
+            return CUE_STRONG
+        if previous in WEAK_CUES:
+            return CUE_WEAK
+        return CUE_NONE
+    
+    def _accept(self, place: Place, distance: int, cue: int) -> bool:
+        if place.id in self.ambiguous:
+            return cue == CUE_STRONG
+        if distance:
+            return cue != CUE_NONE
+        return True
+
+# Gazetteer único do processo (imutável depois de criado)
+PLACES = PlaceGazetteer()
+
+def folded_column(column):
+    """Expressão SQL da coluna como normalize_text (minúsculas, sem acentos nem apóstrofos)"""
+    expression = func.lower(column)
+    for accented, plain in ACCENTS.items():
+        expression = func.replace(expression, chr(accented), plain)
+    
+    return func.replace(expression, "'", ' ')
+
+def location_filter(location: str, *columns):
+    """Condição que encontra a localidade nas colunas, com ou sem acentos
+    
+    Os registros guardam o nome para exibição ('Huíla'), mas os antigos têm
+    o trecho capturado pelas regex anteriores ('huila', e só 'kilamba' para
+    Kilamba Kiaxi): vale qualquer grafia conhecida da localidade contida no
+    valor, ou o valor igual à primeira palavra do nome composto.
+    """
+    names = PLACES.search_names(location)
+    conditions = []
+    
+    for column in columns:
+        value = folded_column(column)
+        conditions.extend(value.contains(name, autoescape=True) for name in names)
+        if names and ' ' in names[0]:
+            conditions.append(value == names[0].split()[0])
+    
+    return or_(*conditions)
@@ -0,0 +1,69 @@
+import threading
+from typing import Any, Callable
+from flask import Flask, current_app
+from src.modules.nlp_processor import NLPProcessor
+from src.modules.message_router import MessageRouter
+from src.modules.whatsapp_integration import WhatsAppIntegration
+from src.modules.keyword_tables import GAZETTEER
+
+class ComponentRegistry:
+    """Componentes compartilhados da aplicação, criados uma única vez e sob demanda
+    
+    NLPProcessor, MessageRouter (com os módulos) e WhatsAppIntegration não
+    guardam estado por mensagem, então uma instância por aplicação/worker
+    atende todas as threads.
+    """
+    
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.Lock()
+    
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Registra a função que cria o componente"""
+        self._factories[name] = factory
+    
+    def get(self, name: str) -> Any:
+        """Retorna o componente, criando-o no primeiro uso"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+    
+    def reset(self):
+        """Descarta as instâncias criadas (são recriadas no próximo uso)"""
+        with self._lock:
+            self._instances.clear()
+
+def init_registry(app: Flask) -> ComponentRegistry:
+    """Cria o registro de componentes da aplicação"""
+    registry = ComponentRegistry()
+    registry.register('nlp_processor', NLPProcessor)
+    registry.register('message_router', MessageRouter)
+    registry.register('whatsapp', WhatsAppIntegration)
+    app.extensions['registry'] = registry
+    
+    # Todas as tabelas de palavras-chave já foram registradas com a importação dos módulos
+    GAZETTEER.compile()
+    
+    return registry
+
+def get_component(name: str) -> Any:
+    """Retorna um componente compartilhado da aplicação atual"""
+    return current_app.extensions['registry'].get(name)
+
+def get_nlp_processor() -> NLPProcessor:
+    """Processador NLP compartilhado"""
+    return get_component('nlp_processor')
+
+def get_message_router() -> MessageRouter:
+    """Roteador de mensagens compartilhado (com todos os módulos)"""
+    return get_component('message_router')
+
+def get_whatsapp() -> WhatsAppIntegration:
+    """Integração WhatsApp compartilhada"""
+    return get_component('whatsapp')
@@ -2,57 +2,56 @@ from typing import Dict, Any, List
 from flask import current_app
 import requests
 import json
+from src.modules.keyword_tables import keyword_table
+from src.modules.parsed_message import ParsedMessage, get_parsed
 
 class ScholarshipsModule:
     """Módulo para buscar bolsas de estudo"""
     
-    def __init__(self):
-        self.areas = {
-            'engenharia': ['engenharia', 'engenheiro', 'tecnico'],
-            'medicina': ['medicina', 'medico', 'saude', 'enfermagem'],
-            'direito': ['direito', 'advogado', 'juridico'],
-            'economia': ['economia', 'economista', 'financas'],
-            'educacao': ['educacao', 'pedagogia', 'professor'],
-            'informatica': ['informatica', 'computacao', 'programacao', 'ti'],
-            'administracao': ['administracao', 'gestao', 'negocios'],
-            'psicologia': ['psicologia', 'psicologo'],
-            'arquitetura': ['arquitetura', 'arquiteto'],
-            'jornalismo': ['jornalismo', 'comunicacao', 'media']
-        }
-        
-        self.levels = {
-            'graduacao': ['graduacao', 'licenciatura', 'bacharelado'],
-            'mestrado': ['mestrado', 'master'],
-            'doutorado': ['doutorado', 'phd', 'doutor'],
-            'pos_graduacao': ['pos graduacao', 'especializacao'],
-            'tecnico': ['tecnico', 'profissionalizante']
-        }
-        
-        self.countries = {
-            'portugal': ['portugal', 'portugues', 'lisboa', 'porto'],
-            'brasil': ['brasil', 'brasileiro', 'sao paulo', 'rio'],
-            'eua': ['eua', 'estados unidos', 'america', 'americano'],
-            'canada': ['canada', 'canadense'],
-            'alemanha': ['alemanha', 'alemao', 'berlin'],
-            'franca': ['franca', 'frances', 'paris'],
-            'reino_unido': ['reino unido', 'inglaterra', 'londres'],
-            'china': ['china', 'chines', 'beijing'],
-            'africa_sul': ['africa do sul', 'sul africano']
-        }
+    areas = keyword_table('scholarships.areas', {
+        'engenharia': ['engenharia', 'engenheiro', 'tecnico'],
+        'medicina': ['medicina', 'medico', 'saude', 'enfermagem'],
+        'direito': ['direito', 'advogado', 'juridico'],
+        'economia': ['economia', 'economista', 'financas'],
+        'educacao': ['educacao', 'pedagogia', 'professor'],
+        'informatica': ['informatica', 'computacao', 'programacao', 'ti'],
+        'administracao': ['administracao', 'gestao', 'negocios'],
+        'psicologia': ['psicologia', 'psicologo'],
+        'arquitetura': ['arquitetura', 'arquiteto'],
+        'jornalismo': ['jornalismo', 'comunicacao', 'media']
+    })
+    
+    levels = keyword_table('scholarships.levels', {
+        'graduacao': ['graduacao', 'licenciatura', 'bacharelado'],
+        'mestrado': ['mestrado', 'master'],
+        'doutorado': ['doutorado', 'phd', 'doutor'],
+        'pos_graduacao': ['pos graduacao', 'especializacao'],
+        'tecnico': ['tecnico', 'profissionalizante']
+    })
+    
+    countries = keyword_table('scholarships.countries', {
+        'portugal': ['portugal', 'portugues', 'lisboa', 'porto'],
+        'brasil': ['brasil', 'brasileiro', 'sao paulo', 'rio'],
+        'eua': ['eua', 'estados unidos', 'america', 'americano'],
+        'canada': ['canada', 'canadense'],
+        'alemanha': ['alemanha', 'alemao', 'berlin'],
+        'franca': ['franca', 'frances', 'paris'],
+        'reino_unido': ['reino unido', 'inglaterra', 'londres'],
+        'china': ['china', 'chines', 'beijing'],
+        'africa_sul': ['africa do sul', 'sul africano']
+    })
     
     def process_message(self, nlp_result: Dict[str, Any], user, conversa) -> Dict[str, Any]:
         """Processa mensagem sobre bolsas de estudo"""
         try:
-            text = nlp_result.get('text', '')
-            
             # Extrai critérios de busca
-            criteria = self._extract_search_criteria(text)
+            criteria = self._extract_search_criteria(get_parsed(nlp_result))
             
             # Busca bolsas
             scholarships = self._search_scholarships(criteria)
             
             return self._format_scholarships_response(scholarships, criteria)
-            
+        
         except Exception as e:
             current_app.logger.error(f'Erro no módulo de bolsas: {str(e)}')
             return {
@@ -61,28 +60,15 @@ class ScholarshipsModule:
                 'error': str(e)
             }
     
-    def _extract_search_criteria(self, text: str) -> Dict[str, Any]:
+    def _extract_search_criteria(self, parsed: ParsedMessage) -> Dict[str, Any]:
         """Extrai critérios de busca"""
         criteria = {}
-        text_lower = text.lower()
-        
-        # Área de estudo
-        for area, keywords in self.areas.items():
-            if any(keyword in text_lower for keyword in keywords):
-                criteria['area'] = area
-                break
-        
-        # Nível
-        for level, keywords in self.levels.items():
-            if any(keyword in text_lower for keyword in keywords):
-                criteria['level'] = level
-                break
         
-        # País
-        for country, keywords in self.countries.items():
-            if any(keyword in text_lower for keyword in keywords):
-                criteria['country'] = country
-                break
+        # Área de estudo, nível e país: primeira categoria de cada tabela presente no texto
+        for criterion, table in (('area', self.areas), ('level', self.levels), ('country', self.countries)):
+            value = parsed.first_key(table)
+            if value:
+                criteria[criterion] = value
         
         return criteria
     
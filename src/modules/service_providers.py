@@ -1,28 +1,31 @@
 from typing import Dict, Any, List
 from flask import current_app
 from src.models import db, User, PrestadorServico, Conversa
+from src.modules.keyword_tables import keyword_table
+from src.modules.deadline import search_limit
+from src.modules.parsed_message import ParsedMessage, get_parsed
+from src.modules.places import PLACES, location_filter
 import json
 
 class ServiceProvidersModule:
     """Módulo para gerenciar prestadores de serviços"""
     
-    def __init__(self):
-        self.specialties = {
-            'eletricista': ['eletricista', 'eletrico', 'instalacao eletrica', 'fiacao'],
-            'canalizador': ['canalizador', 'encanador', 'canos', 'agua', 'torneira'],
-            'pintor': ['pintor', 'pintura', 'tinta', 'parede'],
-            'mecanico': ['mecanico', 'carro', 'automovel', 'motor'],
-            'cabeleireira': ['cabeleireira', 'cabelo', 'penteado', 'corte'],
-            'costureira': ['costureira', 'costura', 'roupa', 'alfaiate'],
-            'soldador': ['soldador', 'solda', 'ferro', 'metal'],
-            'carpinteiro': ['carpinteiro', 'madeira', 'movel', 'porta'],
-            'pedreiro': ['pedreiro', 'construcao', 'obra', 'tijolo'],
-            'jardineiro': ['jardineiro', 'jardim', 'plantas', 'grama'],
-            'domestica': ['domestica', 'limpeza', 'casa', 'empregada'],
-            'seguranca': ['seguranca', 'guarda', 'vigilante', 'porteiro'],
-            'professor': ['professor', 'ensino', 'aulas', 'explicacoes'],
-            'motorista': ['motorista', 'condutor', 'transporte', 'taxi']
-        }
+    specialties = keyword_table('service_providers.specialties', {
+        'eletricista': ['eletricista', 'eletrico', 'instalacao eletrica', 'fiacao'],
+        'canalizador': ['canalizador', 'encanador', 'canos', 'agua', 'torneira'],
+        'pintor': ['pintor', 'pintura', 'tinta', 'parede'],
+        'mecanico': ['mecanico', 'carro', 'automovel', 'motor'],
+        'cabeleireira': ['cabeleireira', 'cabelo', 'penteado', 'corte'],
+        'costureira': ['costureira', 'costura', 'roupa', 'alfaiate'],
+        'soldador': ['soldador', 'solda', 'ferro', 'metal'],
+        'carpinteiro': ['carpinteiro', 'madeira', 'movel', 'porta'],
+        'pedreiro': ['pedreiro', 'construcao', 'obra', 'tijolo'],
+        'jardineiro': ['jardineiro', 'jardim', 'plantas', 'grama'],
+        'domestica': ['domestica', 'limpeza', 'casa', 'empregada'],
+        'seguranca': ['seguranca', 'guarda', 'vigilante', 'porteiro'],
+        'professor': ['professor', 'ensino', 'aulas', 'explicacoes'],
+        'motorista': ['motorista', 'condutor', 'transporte', 'taxi']
+    })
     
     def process_message(self, nlp_result: Dict[str, Any], user: User, conversa: Conversa) -> Dict[str, Any]:
         """Processa mensagem relacionada a prestadores de serviços"""
@@ -38,7 +41,7 @@ class ServiceProvidersModule:
                     'success': False,
                     'text': 'Comando não reconhecido para prestadores de serviços.'
                 }
-                
+        
         except Exception as e:
             current_app.logger.error(f'Erro no módulo de prestadores: {str(e)}')
             return {
@@ -53,7 +56,7 @@ class ServiceProvidersModule:
         entities = nlp_result.get('entities', {})
         
         # Extrai especialidade do texto
-        specialty = self._extract_specialty(text)
+        specialty = self._extract_specialty(get_parsed(nlp_result))
         if not specialty:
             return {
                 'success': True,
@@ -88,9 +91,9 @@ class ServiceProvidersModule:
             }
         
         # Solicita informações adicionais
-        return self._request_additional_info(specialty, location, user)
+        return self._request_additional_info(specialty, location, user, conversa)
     
-    def _request_additional_info(self, specialty: str, location: str, user: User) -> Dict[str, Any]:
+    def _request_additional_info(self, specialty: str, location: str, user: User, conversa: Conversa) -> Dict[str, Any]:
         """Solicita informações adicionais para completar cadastro"""
         text = f"Perfeito! Vou cadastrar você como *{specialty}* em *{location}*.\n\n"
         text += "Para completar seu perfil, preciso de mais algumas informações:\n\n"
@@ -111,8 +114,7 @@ class ServiceProvidersModule:
             'location': location,
             'step': 'collecting_info'
         }
-        conversa.contexto_conversa = json.dumps(temp_data)
-        db.session.commit()
+        conversa.contexto_conversa = json.dumps(temp_data, default=str)
         
         return {
             'success': True,
@@ -126,7 +128,7 @@ class ServiceProvidersModule:
         entities = nlp_result.get('entities', {})
         
         # Extrai especialidade procurada
-        specialty = self._extract_specialty(text)
+        specialty = self._extract_specialty(get_parsed(nlp_result))
         if not specialty:
             return {
                 'success': True,
@@ -153,13 +155,13 @@ class ServiceProvidersModule:
         )
         
         if location:
-            query = query.filter(PrestadorServico.localizacao.ilike(f'%{location}%'))
+            query = query.filter(location_filter(location, PrestadorServico.localizacao))
         
         return query.order_by(
             PrestadorServico.avaliacao_media.desc(),
             PrestadorServico.verificado.desc(),
             PrestadorServico.data_cadastro.desc()
-        ).limit(10).all()
+        ).limit(search_limit(10)).all()
     
     def _format_providers_response(self, providers: List[PrestadorServico], specialty: str, location: str) -> Dict[str, Any]:
         """Formata resposta com lista de prestadores"""
@@ -169,26 +171,7 @@ class ServiceProvidersModule:
         list_items = []
         
         for i, provider in enumerate(providers, 1):
-            # Monta texto do prestador
-            provider_text = f"*{provider.nome}*\n"
-            provider_text += f"📍 {provider.localizacao}\n"
-            
-            if provider.avaliacao_media > 0:
-                stars = "⭐" * int(provider.avaliacao_media)
-                provider_text += f"{stars} ({provider.avaliacao_media:.1f})\n"
-            
-            if provider.verificado:
-                provider_text += "✅ Verificado\n"
-            
-            if provider.preco_minimo and provider.preco_maximo:
-                provider_text += f"💰 {provider.preco_minimo:,.0f} - {provider.preco_maximo:,.0f} kz\n"
-            
-            if provider.disponibilidade:
-                provider_text += f"🕐 {provider.disponibilidade}\n"
-            
-            provider_text += f"📱 {provider.contato}"
-            
-            text += f"{i}. {provider_text}\n\n"
+            text += f"{i}. {self._format_provider_text(provider)}\n\n"
             
             # Adiciona à lista interativa
             list_items.append({
@@ -212,6 +195,53 @@ class ServiceProvidersModule:
             'buttons': buttons
         }
     
+    def _format_provider_text(self, provider: PrestadorServico) -> str:
+        """Monta o texto de um prestador"""
+        provider_text = f"*{provider.nome}*\n"
+        provider_text += f"📍 {provider.localizacao}\n"
+        
+        if provider.avaliacao_media > 0:
+            stars = "⭐" * int(provider.avaliacao_media)
+            provider_text += f"{stars} ({provider.avaliacao_media:.1f})\n"
+        
+        if provider.verificado:
+            provider_text += "✅ Verificado\n"
+        
+        if provider.preco_minimo and provider.preco_maximo:
+            provider_text += f"💰 {provider.preco_minimo:,.0f} - {provider.preco_maximo:,.0f} kz\n"
+        
+        if provider.disponibilidade:
+            provider_text += f"🕐 {provider.disponibilidade}\n"
+        
+        provider_text += f"📱 {provider.contato}"
+        
+        return provider_text
+    
+    def show_provider(self, provider_id: int, user: User) -> Dict[str, Any]:
+        """Mostra o prestador escolhido na lista interativa"""
+        provider = PrestadorServico.query.get(provider_id)
+        
+        if not provider or not provider.ativo:
+            return {
+                'success': True,
+                'text': "😔 Este prestador não está mais disponível.\n\nDigite 'Procuro [profissão] em [local]' para uma nova busca."
+            }
+        
+        text = f"🔧 *{provider.especialidade.title()}*\n\n"
+        text += self._format_provider_text(provider)
+        
+        if provider.descricao:
+            text += f"\n\n📝 {provider.descricao}"
+        
+        return {
+            'success': True,
+            'text': text,
+            'buttons': [
+                {'id': 'search_again', 'title': '🔍 Nova Busca'},
+                {'id': 'register_provider', 'title': '➕ Cadastrar-me'}
+            ]
+        }
+    
     def _handle_no_providers_found(self, specialty: str, location: str) -> Dict[str, Any]:
         """Trata caso onde não foram encontrados prestadores"""
         location_text = f" em {location}" if location else ""
@@ -235,18 +265,17 @@ class ServiceProvidersModule:
             'buttons': buttons
         }
     
-    def _extract_specialty(self, text: str) -> str:
+    def _extract_specialty(self, parsed: ParsedMessage) -> str:
         """Extrai especialidade do texto"""
-        text_lower = text.lower()
-        
-        for specialty, keywords in self.specialties.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    return specialty
+        specialty = parsed.first_key(self.specialties)
+        if specialty:
+            return specialty
         
         # Busca por padrões específicos
         import re
         
+        text_lower = parsed.text.lower()
+        
         # Padrão "sou [profissão]"
         match = re.search(r'sou\s+([a-zA-Z]+)', text_lower)
         if match:
@@ -286,7 +315,8 @@ class ServiceProvidersModule:
             if match:
                 location = match.group(1).strip()
                 if len(location) > 2:  # Evita palavras muito pequenas
-                    return location.title()
+                    place = PLACES.resolve(location)
+                    return place.nome if place else location.title()
         
         return None
     
@@ -307,7 +337,7 @@ class ServiceProvidersModule:
             )
             
             db.session.add(provider)
-            db.session.commit()
+            db.session.flush()
             
             text = f"✅ *Cadastro realizado com sucesso!*\n\n"
             text += f"👤 *Nome:* {provider.nome}\n"
@@ -324,7 +354,7 @@ class ServiceProvidersModule:
                 'success': True,
                 'text': text
             }
-            
+        
         except Exception as e:
             current_app.logger.error(f'Erro ao completar cadastro: {str(e)}')
             return {
@@ -0,0 +1,110 @@
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional
+from flask import Flask, current_app
+
+def lane_for_key(key: str, num_lanes: int) -> int:
+    """Calcula a faixa de um usuário (hash estável entre processos)"""
+    return zlib.crc32((key or '').encode('utf-8')) % max(num_lanes, 1)
+
+class ShardedExecutor:
+    """Executa tarefas em paralelo entre usuários mantendo a ordem de cada usuário
+
+    Cada faixa é um executor de uma única thread (fila FIFO). Como o número
+    do usuário sempre cai na mesma faixa, as mensagens de um usuário são
+    processadas na ordem de chegada, enquanto usuários em faixas diferentes
+    são processados ao mesmo tempo.
+    """
+
+    def __init__(self, num_lanes: int = 4, name: str = 'faixa'):
+        self.num_lanes = max(num_lanes, 1)
+        self.lanes = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'{name}-{i}')
+            for i in range(self.num_lanes)
+        ]
+
+    def lane_for(self, key: str) -> int:
+        """Retorna o índice da faixa do usuário"""
+        return lane_for_key(key, self.num_lanes)
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        """Agenda a tarefa na faixa do usuário"""
+        return self.lanes[self.lane_for(key)].submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        """Encerra todas as faixas"""
+        for lane in self.lanes:
+            lane.shutdown(wait=wait)
+
+class UserLock:
+    """Trava por usuário compartilhada entre processos (Redis)
+
+    Sem Redis configurado a trava não faz nada: dentro de um processo a
+    ordem já é garantida pelas faixas do ShardedExecutor.
+    """
+
+    REDIS_PREFIX = 'solicite_ia:user_lock:'
+
+    def __init__(self, redis_url: Optional[str] = None, timeout: int = 60, wait_timeout: int = 30):
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout
+        self.redis = None
+
+        if redis_url:
+            import redis
+            self.redis = redis.Redis.from_url(redis_url)
+
+    @contextmanager
+    def hold(self, user_key: str):
+        """Mantém a trava do usuário durante o bloco"""
+        if self.redis is None or not user_key:
+            yield True
+            return
+
+        lock = self.redis.lock(
+            f'{self.REDIS_PREFIX}{user_key}',
+            timeout=self.timeout,
+            blocking_timeout=self.wait_timeout
+        )
+
+        try:
+            acquired = lock.acquire()
+        except Exception as e:
+            current_app.logger.error(f'Erro ao obter trava do usuário: {str(e)}')
+            acquired = False
+
+        if not acquired:
+            # Prefere processar fora de ordem a descartar a mensagem
+            current_app.logger.warning(f'Trava do usuário {user_key} indisponível, processando sem trava')
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception as e:
+                    current_app.logger.error(f'Erro ao liberar trava do usuário: {str(e)}')
+
+def init_message_lanes(app: Flask) -> ShardedExecutor:
+    """Cria as faixas de processamento e a trava por usuário da aplicação"""
+    executor = ShardedExecutor(num_lanes=app.config.get('MESSAGE_LANES', 4))
+    app.extensions['message_lanes'] = executor
+
+    redis_url = app.config.get('REDIS_URL') if app.config.get('USER_LOCK_BACKEND') == 'redis' else None
+    app.extensions['user_lock'] = UserLock(
+        redis_url=redis_url,
+        timeout=app.config.get('USER_LOCK_TIMEOUT', 60),
+        wait_timeout=app.config.get('USER_LOCK_WAIT', 30)
+    )
+
+    return executor
+
+def get_message_lanes() -> ShardedExecutor:
+    """Retorna as faixas de processamento da aplicação atual"""
+    return current_app.extensions['message_lanes']
+
+def get_user_lock() -> UserLock:
+    """Retorna a trava por usuário da aplicação atual"""
+    return current_app.extensions['user_lock']
@@ -0,0 +1,226 @@
+import gzip
+import json
+import os
+import re
+from functools import lru_cache
+from itertools import product
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+from flask import Flask, current_app
+from src.modules.keyword_tables import GAZETTEER
+from src.modules.parsed_message import normalize_text
+from src.modules.places import PLACE_DATA, deletes, edit_distance
+
+# Grafias informais que a distância de edição não alcança (ou palavras curtas demais)
+INFORMAL_SPELLINGS = {
+    'kero': 'quero', 'keru': 'quero', 'ker': 'quer', 'keria': 'queria', 'kria': 'queria', 'kem': 'quem',
+    'ke': 'que', 'q': 'que', 'pq': 'porque', 'pk': 'porque', 'vc': 'voce', 'vcs': 'voces',
+    'tb': 'tambem', 'tbm': 'tambem', 'td': 'tudo', 'tds': 'todos', 'hj': 'hoje', 'amnh': 'amanha',
+    'obg': 'obrigado', 'obgd': 'obrigado', 'pf': 'por favor', 'pfv': 'por favor', 'pfvr': 'por favor',
+    'msm': 'mesmo', 'qd': 'quando', 'qdo': 'quando', 'qnd': 'quando', 'qto': 'quanto', 'qnto': 'quanto',
+    'cmg': 'comigo', 'ctg': 'contigo', 'dps': 'depois', 'agr': 'agora', 'mt': 'muito', 'mto': 'muito',
+    'mtu': 'muito', 'nd': 'nada', 'ngm': 'ninguem', 'axo': 'acho', 'ond': 'onde', 'ondi': 'onde',
+    'tou': 'estou', 'vnd': 'vendo', 'vndo': 'vendo', 'prcs': 'preciso'
+}
+
+# Palavras dos padrões de comando (registradas pelo NLPProcessor)
+PATTERN_WORDS: Set[str] = set()
+
+# Palavra literal de um padrão: letras e classes de caracteres, cada uma opcionalmente seguida de '?'
+PATTERN_WORD = re.compile(r'(?:\[[^\]^]*\]\??|\w\??)+')
+PATTERN_PIECE = re.compile(r'\[([^\]^]*)\](\??)|(\w)(\??)')
+REGEX_ESCAPE = re.compile(r'\\[a-zA-Z]')
+WORD = re.compile(r'^[a-z]+$')
+DIGIT = re.compile(r'\d')
+
+def pattern_word_forms(pattern: str) -> Set[str]:
+    """Formas das palavras literais de um padrão regex, com todas as alternativas
+    
+    Cada classe vale por cada um dos seus caracteres e o '?' também gera a
+    forma sem o trecho: 'procur[ao]' -> procura e procuro, 'um[a]?' -> um e
+    uma, 'servi[çc]os?' -> servico e servicos.
+    """
+    forms = set()
+    for chunk in PATTERN_WORD.findall(REGEX_ESCAPE.sub(' ', pattern)):
+        options = []
+        for alternatives, class_optional, char, char_optional in PATTERN_PIECE.findall(chunk):
+            options.append(list(alternatives or char) + ([''] if class_optional or char_optional else []))
+        
+        for combination in product(*options):
+            forms.update(normalize_text(''.join(combination)).split())
+    
+    return forms
+
+def register_pattern_words(patterns: Mapping[str, Iterable[str]]):
+    """Acrescenta ao vocabulário base as palavras literais dos padrões regex"""
+    for regexes in patterns.values():
+        for pattern in regexes:
+            PATTERN_WORDS.update(word for word in pattern_word_forms(pattern) if len(word) >= 3)
+
+def seed_vocabulary() -> Set[str]:
+    """Palavras que nunca são corrigidas e sempre podem ser sugeridas
+    
+    Padrões de comando, tabelas de palavras-chave dos módulos, nomes de
+    lugares e as formas corretas das grafias informais.
+    """
+    words = set(PATTERN_WORDS)
+    
+    for table in GAZETTEER.tables.values():
+        for keywords in table.values():
+            for keyword in keywords:
+                words.update(normalize_text(keyword).split())
+    
+    for _, nome, _, _, variants in PLACE_DATA:
+        for variant in (nome,) + tuple(variants):
+            words.update(normalize_text(variant).split())
+    
+    for replacement in INFORMAL_SPELLINGS.values():
+        words.update(replacement.split())
+    
+    return {word for word in words if WORD.match(word)}
+
+def is_plural_pair(word: str, other: str) -> bool:
+    """Indica se uma das palavras é o plural da outra (bolo/bolos, motor/motores)"""
+    short, long = sorted((word, other), key=len)
+    return long in (short + 's', short + 'es')
+
+def max_edits(length: int) -> int:
+    """Erros tolerados para uma palavra deste tamanho"""
+    if length < 4:
+        return 0
+    return 1 if length < 9 else 2
+
+class SpellingCorrector:
+    """Correção ortográfica antes da detecção de padrões (índice de remoções SymSpell)
+    
+    O dicionário de frequências vem das mensagens de Conversa (flask
+    build-spelling-dictionary), somado ao vocabulário base. Cada palavra
+    frequente é indexada com as suas remoções de até 1 ou 2 caracteres;
+    a consulta gera as remoções da palavra, confirma os candidatos com a
+    distância de edição e fica com o mais próximo (vocabulário base e
+    frequência desempatam).
+    
+    Uma palavra só é trocada se não estiver no dicionário ou se o candidato
+    for dominance vezes mais frequente: "eletrecista", comum no histórico,
+    ainda vira "eletricista". As correções de cada palavra ficam em cache.
+    """
+    
+    FORMAT_VERSION = 1
+    
+    def __init__(self, counts: Optional[Dict[str, int]] = None, min_count: int = 3, dominance: int = 20,
+                 seed: Optional[Iterable[str]] = None):
+        self.counts: Dict[str, int] = dict(counts or {})
+        self.min_count = min_count
+        self.dominance = dominance
+        self.seed = frozenset(seed_vocabulary() if seed is None else seed)
+        self.index: Dict[str, List[str]] = {}
+        
+        for word in self.seed:
+            self.counts[word] = max(self.counts.get(word, 0), min_count)
+        
+        for word, count in self.counts.items():
+            if count >= min_count and len(word) >= 4 and WORD.match(word):
+                for deleted in deletes(word, max_edits(len(word))):
+                    self.index.setdefault(deleted, []).append(word)
+        
+        self.correct_word = lru_cache(maxsize=65536)(self._correct_word)
+    
+    def correct(self, normalized_text: str) -> str:
+        """Texto normalizado com as palavras corrigidas
+        
+        Palavras ao lado de números ficam como estão ("note 10", "s 21" são
+        modelos, não erros de digitação); só as grafias informais são trocadas.
+        """
+        words = normalized_text.split()
+        corrected = []
+        
+        for position, word in enumerate(words):
+            neighbors = words[max(0, position - 1):position + 2]
+            if any(DIGIT.search(neighbor) for neighbor in neighbors):
+                corrected.append(INFORMAL_SPELLINGS.get(word, word))
+            else:
+                corrected.append(self.correct_word(word))
+        
+        return ' '.join(corrected)
+    
+    def _correct_word(self, word: str) -> str:
+        replacement = INFORMAL_SPELLINGS.get(word)
+        if replacement:
+            return replacement
+        
+        if word in self.seed or len(word) < 4 or not WORD.match(word):
+            return word
+        
+        limit = max_edits(len(word))
+        candidates = set()
+        for deleted in deletes(word, limit):
+            candidates.update(self.index.get(deleted, ()))
+        candidates.discard(word)
+        
+        best = None
+        for candidate in candidates:
+            # Singular e plural não são erros um do outro ("bolos" fica "bolos")
+            distance = edit_distance(word, candidate, limit)
+            if distance > limit or is_plural_pair(word, candidate):
+                continue
+            
+            rank = (distance, candidate not in self.seed, -self.counts[candidate])
+            if best is None or rank < best[0]:
+                best = (rank, candidate)
+        
+        if best and self.counts[best[1]] >= self.dominance * self.counts.get(word, 0):
+            return best[1]
+        
+        return word
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': self.FORMAT_VERSION,
+            'min_count': self.min_count,
+            'dominance': self.dominance,
+            'counts': {word: count for word, count in self.counts.items() if word not in self.seed or count > self.min_count}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SpellingCorrector':
+        if data.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Versão de dicionário não suportada: {data.get('version')}")
+        
+        return cls(data['counts'], data['min_count'], data['dominance'])
+    
+    def save(self, path: str):
+        """Grava o dicionário de frequências em JSON compactado com gzip"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+    
+    @classmethod
+    def load(cls, path: str) -> 'SpellingCorrector':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+def init_spelling_corrector(app: Flask) -> Optional[SpellingCorrector]:
+    """Carrega o dicionário ortográfico (SPELLING_DICTIONARY_PATH), se existir
+    
+    Sem dicionário do histórico a correção fica desligada: só com o
+    vocabulário base, palavras corretas que não estão nele seriam trocadas.
+    """
+    path = app.config.get('SPELLING_DICTIONARY_PATH')
+    corrector = None
+    
+    if path and os.path.exists(path):
+        try:
+            corrector = SpellingCorrector.load(path)
+            app.logger.info(f'Dicionário ortográfico carregado: {len(corrector.counts)} palavras')
+        except Exception as e:
+            app.logger.error(f'Erro ao carregar dicionário ortográfico: {str(e)}')
+    
+    app.extensions['spelling_corrector'] = corrector
+    
+    return corrector
+
+def get_spelling_corrector() -> Optional[SpellingCorrector]:
+    """Retorna o corretor ortográfico da aplicação atual (None se desligado)"""
+    return current_app.extensions.get('spelling_corrector')
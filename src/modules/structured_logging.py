@@ -0,0 +1,152 @@
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from flask import Flask, current_app
+
+class StageTimer:
+    """Mede o tempo de cada etapa do processamento de uma mensagem"""
+
+    __slots__ = ('start', 'timings')
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = start or time.time()
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Acumula o tempo do bloco na etapa (ms)"""
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - stage_start) * 1000
+            self.timings[name] = round(self.timings.get(name, 0) + elapsed, 1)
+
+    def total_ms(self) -> int:
+        """Tempo desde a chegada do webhook"""
+        return int((time.time() - self.start) * 1000)
+
+class _ListenerQueueHandler(QueueHandler):
+    """QueueHandler que guarda o listener que consome a sua fila"""
+
+    def __init__(self, log_queue, listener: QueueListener):
+        super().__init__(log_queue)
+        self.listener = listener
+
+def init_logging(app: Flask) -> Optional[QueueListener]:
+    """Configura o modo de log da aplicação
+
+    Com LOG_MODE=structured, os handlers do logger da aplicação (inclusive o
+    syslog de produção) passam a rodar em uma thread própria: a requisição só
+    coloca o registro em uma fila, sem formatar nem escrever em socket.
+
+    Os eventos JSON vão para um logger próprio (<logger da aplicação>.eventos)
+    em INFO, com a sua fila e saída em stdout: os handlers da aplicação
+    mantêm os níveis configurados (o syslog de produção fica em WARNING).
+    """
+    app.extensions['structured_logging'] = app.config.get('LOG_MODE') == 'structured'
+
+    if not app.extensions['structured_logging']:
+        return None
+
+    # O logger é compartilhado entre instâncias da aplicação com o mesmo nome:
+    # se a fila já existe, só os handlers novos passam para o listener
+    listener = next((h.listener for h in app.logger.handlers if isinstance(h, _ListenerQueueHandler)), None)
+    handlers = [h for h in app.logger.handlers if not isinstance(h, _ListenerQueueHandler)]
+
+    for handler in handlers:
+        app.logger.removeHandler(handler)
+
+    if listener is not None:
+        listener.handlers = listener.handlers + tuple(handlers)
+    else:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        app.logger.addHandler(_ListenerQueueHandler(log_queue, listener))
+
+    app.extensions['log_listener'] = listener
+    app.extensions['events_logger'] = init_events_logger(app)
+
+    return listener
+
+def init_events_logger(app: Flask) -> logging.Logger:
+    """Logger dos eventos estruturados, em INFO e fora dos handlers da aplicação"""
+    events_logger = app.logger.getChild('eventos')
+    events_logger.setLevel(logging.INFO)
+    events_logger.propagate = False
+
+    if not any(isinstance(h, _ListenerQueueHandler) for h in events_logger.handlers):
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter('%(message)s'))
+
+        events_queue = queue.SimpleQueue()
+        events_listener = QueueListener(events_queue, stream_handler)
+        events_listener.start()
+        atexit.register(events_listener.stop)
+        events_logger.addHandler(_ListenerQueueHandler(events_queue, events_listener))
+
+    return events_logger
+
+def is_structured_logging() -> bool:
+    """Indica se o modo de log estruturado está ativo"""
+    return current_app.extensions.get('structured_logging', False)
+
+def hash_user(phone: Optional[str]) -> Optional[str]:
+    """Identificador curto e estável do usuário para os logs (sem o número)"""
+    if not phone:
+        return None
+
+    secret = current_app.config['SECRET_KEY'].encode('utf-8')
+    return hmac.new(secret, phone.encode('utf-8'), hashlib.sha256).hexdigest()[:12]
+
+def log_event(event: str, **fields: Any):
+    """Registra um evento em uma única linha JSON compacta"""
+    logger = current_app.extensions.get('events_logger', current_app.logger)
+
+    # Sem ninguém para receber o evento, nem chega a serializar
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    record = {'event': event}
+    record.update({key: value for key, value in fields.items() if value is not None})
+
+    logger.info(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str))
+
+def log_webhook_payload(data: Dict[str, Any]):
+    """Registra o payload recebido
+
+    No modo estruturado, apenas uma amostra (WEBHOOK_PAYLOAD_LOG_SAMPLE_RATE)
+    dos payloads completos é registrada, em uma linha.
+    """
+    if not is_structured_logging():
+        current_app.logger.info(f'Mensagem recebida: {json.dumps(data, indent=2)}')
+        return
+
+    if random.random() < current_app.config.get('WEBHOOK_PAYLOAD_LOG_SAMPLE_RATE', 0.01):
+        log_event('webhook_payload', payload=data)
+
+def log_message_processed(message_id: Optional[str], from_number: Optional[str], timer: StageTimer, **fields: Any):
+    """Registra o fim do processamento de uma mensagem"""
+    if not is_structured_logging():
+        current_app.logger.info(f'Mensagem processada com sucesso para {from_number}')
+        return
+
+    log_event(
+        'message_processed',
+        message_id=message_id,
+        user=hash_user(from_number),
+        total_ms=timer.total_ms(),
+        stages=timer.timings,
+        **fields
+    )
@@ -0,0 +1,170 @@
+import re
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import List, NamedTuple, Optional, Tuple
+from src.modules.parsed_message import ACCENTS, Span
+
+class Amount(NamedTuple):
+    """Valor monetário extraído da mensagem"""
+    valor: Decimal
+    moeda: str  # AOA, USD ou EUR
+
+CURRENCIES = {
+    'kz': 'AOA', 'kzs': 'AOA', 'kwanza': 'AOA', 'kwanzas': 'AOA', 'akz': 'AOA', 'aoa': 'AOA',
+    'usd': 'USD', 'us$': 'USD', '$': 'USD', 'dolar': 'USD', 'dolares': 'USD', 'dollar': 'USD', 'dollars': 'USD',
+    'eur': 'EUR', '€': 'EUR', 'euro': 'EUR', 'euros': 'EUR'
+}
+
+MULTIPLIERS = {'mil': 1000, 'k': 1000, 'milhao': 1000000, 'milhoes': 1000000}
+
+MONTHS = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
+}
+
+CENTS = Decimal('0.01')
+
+# Os padrões rodam sobre o texto em minúsculas e sem acentos, mas com a pontuação
+# (o texto normalizado perde os separadores de "150.000,00 kz" e o @ dos emails)
+AMOUNT_PATTERN = re.compile(
+    r'(?<![\w.,])(\d{1,3}(?:[. ]\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)'
+    r'(?:\s*(mil|milhao|milhoes|k)(?:\s+de)?)?\s*(kzs?|kwanzas?|akz|aoa|usd|us\$|\$|dolar(?:es)?|dollars?|eur|€|euros?)(?!\w)'
+)
+
+PHONE_PATTERN = re.compile(r'(?<![\w+])(?:(?:\+|00)\s*244[\s.-]*)?([92]\d{2})[\s.-]?(\d{3})[\s.-]?(\d{3})(?!\d)')
+
+AGE_PATTERN = re.compile(r'(?<!\d)(?<!ha )(?<!faz )(\d{1,2})\s*anos?\b|\bidade\s*:?\s*(\d{1,2})\b')
+
+DATE_PATTERN = re.compile(
+    r'\b(?:(anteontem)|(ontem)|(hoje|hj)|(amanha)'
+    r'|(?:dia\s+)?(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?'
+    r'|(?:dia\s+)?(\d{1,2})\s+de\s+(' + '|'.join(MONTHS) + r')(?:\s+de\s+(\d{4}))?'
+    r'|dia\s+(\d{1,2}))\b'
+)
+
+EMAIL_PATTERN = re.compile(r'[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}')
+
+def parse_amount(number: str, multiplier: Optional[str] = None) -> Optional[Decimal]:
+    """Converte "150.000,00", "150 000" ou "12.50" (e "1,5 milhoes") em Decimal"""
+    number = number.replace(' ', '')
+    
+    if ',' in number:
+        number = number.replace('.', '').replace(',', '.')
+    elif re.fullmatch(r'\d{1,3}(?:\.\d{3})+', number):
+        number = number.replace('.', '')
+    
+    try:
+        value = Decimal(number)
+    except InvalidOperation:
+        return None
+    
+    if multiplier:
+        value *= MULTIPLIERS[multiplier]
+    
+    return value.quantize(CENTS)
+
+def last_valid_date(year: int, month: int, day: int, today: date) -> Optional[date]:
+    """Data sem ano explícito: a ocorrência mais recente que não esteja no futuro"""
+    for offset in (0, 1):
+        try:
+            candidate = date(year - offset, month, day)
+        except ValueError:
+            return None
+        if candidate <= today:
+            return candidate
+    
+    return None
+
+def last_day_of_month(day: int, today: date) -> Optional[date]:
+    """"dia 12": o dia 12 mais recente até hoje (volta os meses que não têm esse dia)"""
+    year, month = today.year, today.month
+    
+    for _ in range(12):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            candidate = None
+        if candidate and candidate <= today:
+            return candidate
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    
+    return None
+
+def resolve_date(match: re.Match, today: date) -> Optional[date]:
+    """Data absoluta de uma expressão de DATE_PATTERN"""
+    groups = match.groups()
+    
+    if groups[0]:
+        return today - timedelta(days=2)
+    if groups[1]:
+        return today - timedelta(days=1)
+    if groups[2]:
+        return today
+    if groups[3]:
+        return today + timedelta(days=1)
+    
+    try:
+        if groups[4]:
+            day, month = int(groups[4]), int(groups[5])
+            if groups[6]:
+                year = int(groups[6])
+                return date(year + 2000 if year < 100 else year, month, day)
+            return last_valid_date(today.year, month, day, today)
+        
+        if groups[7]:
+            day, month = int(groups[7]), MONTHS[groups[8]]
+            if groups[9]:
+                return date(int(groups[9]), month, day)
+            return last_valid_date(today.year, month, day, today)
+    except ValueError:
+        return None
+    
+    return last_day_of_month(int(groups[10]), today)
+
+def overlaps(start: int, end: int, taken: List[Tuple[int, int]]) -> bool:
+    """Indica se o trecho cruza algum dos já ocupados"""
+    return any(start < other_end and other_start < end for other_start, other_end in taken)
+
+def extract_typed_spans(text: str, today: Optional[date] = None) -> List[Span]:
+    """Valores, telefones, idades, datas e emails já interpretados
+    
+    Cada trecho traz em valor uma forma canônica em texto (usada nas
+    entidades, no prompt e na chave do cache) e em dado o valor tipado:
+    Amount para preco, telefone E.164, int para idade, date para data.
+    As posições referem-se ao texto original.
+    """
+    if not text:
+        return []
+    
+    folded = text.lower().translate(ACCENTS)
+    today = today or date.today()
+    spans = []
+    amounts = []
+    
+    for match in AMOUNT_PATTERN.finditer(folded):
+        value = parse_amount(match.group(1), match.group(2))
+        if value is not None:
+            amount = Amount(value, CURRENCIES[match.group(3)])
+            spans.append(Span('preco', match.start(), match.end(), f'{value} {amount.moeda}', amount))
+            amounts.append((match.start(), match.end()))
+    
+    for match in PHONE_PATTERN.finditer(folded):
+        # "200 000 000 kz" é um valor, não um telefone
+        if not overlaps(match.start(), match.end(), amounts):
+            phone = '+244' + ''.join(match.groups())
+            spans.append(Span('telefone', match.start(), match.end(), phone, phone))
+    
+    for match in AGE_PATTERN.finditer(folded):
+        age = int(match.group(1) or match.group(2))
+        if age > 0:
+            spans.append(Span('idade', match.start(), match.end(), str(age), age))
+    
+    for match in DATE_PATTERN.finditer(folded):
+        value = resolve_date(match, today)
+        if value is not None:
+            spans.append(Span('data', match.start(), match.end(), value.isoformat(), value))
+    
+    for match in EMAIL_PATTERN.finditer(folded):
+        spans.append(Span('email', match.start(), match.end(), match.group(0), match.group(0)))
+    
+    return spans
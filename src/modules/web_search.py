@@ -3,28 +3,28 @@ from flask import current_app
 import requests
 import json
 import re
+from src.modules.keyword_tables import freeze
 
 class WebSearchModule:
     """Módulo para pesquisa web e respostas gerais"""
     
-    def __init__(self):
-        self.question_types = {
-            'what': ['o que', 'que', 'qual'],
-            'how': ['como', 'de que forma', 'de que maneira'],
-            'when': ['quando', 'que horas', 'que dia'],
-            'where': ['onde', 'em que lugar', 'aonde'],
-            'why': ['por que', 'porque', 'qual motivo'],
-            'who': ['quem', 'que pessoa']
-        }
-        
-        self.common_topics = {
-            'weather': ['tempo', 'clima', 'chuva', 'sol', 'temperatura'],
-            'time': ['horas', 'horario', 'fuso', 'tempo'],
-            'location': ['fica', 'localiza', 'endereco', 'onde'],
-            'definition': ['significa', 'definicao', 'conceito'],
-            'calculation': ['calcular', 'quanto', 'resultado'],
-            'translation': ['traduzir', 'traducao', 'significa em']
-        }
+    question_types = freeze({
+        'what': ['o que', 'que', 'qual'],
+        'how': ['como', 'de que forma', 'de que maneira'],
+        'when': ['quando', 'que horas', 'que dia'],
+        'where': ['onde', 'em que lugar', 'aonde'],
+        'why': ['por que', 'porque', 'qual motivo'],
+        'who': ['quem', 'que pessoa']
+    })
+    
+    common_topics = freeze({
+        'weather': ['tempo', 'clima', 'chuva', 'sol', 'temperatura'],
+        'time': ['horas', 'horario', 'fuso', 'tempo'],
+        'location': ['fica', 'localiza', 'endereco', 'onde'],
+        'definition': ['significa', 'definicao', 'conceito'],
+        'calculation': ['calcular', 'quanto', 'resultado'],
+        'translation': ['traduzir', 'traducao', 'significa em']
+    })
     
     def process_message(self, nlp_result: Dict[str, Any], user, conversa) -> Dict[str, Any]:
         """Processa mensagem de pesquisa geral"""
@@ -0,0 +1,186 @@
+import atexit
+import copy
+import glob
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from flask import Flask, current_app
+from src.modules.parsed_message import ACCENTS
+from src.modules.typed_entities import AMOUNT_PATTERN, PHONE_PATTERN, overlaps
+
+class PhoneAnonymizer:
+    """Troca números de telefone por pseudônimos estáveis
+
+    O mesmo número sempre vira o mesmo pseudônimo (HMAC com o segredo), o
+    que preserva o agrupamento por usuário na reprodução sem expor o número real.
+    """
+
+    def __init__(self, secret: str):
+        self.secret = secret.encode('utf-8')
+
+    def pseudonym(self, phone: Optional[str]) -> Optional[str]:
+        """Gera o pseudônimo de um número (mantém o formato numérico com prefixo de Angola)"""
+        if not phone:
+            return phone
+
+        digits = re.sub(r'\D', '', str(phone))
+        digest = hmac.new(self.secret, digits.encode('utf-8'), hashlib.sha256).hexdigest()
+
+        return '244' + str(int(digest[:15], 16))[-9:].zfill(9)
+
+    def anonymize_text(self, text: str) -> str:
+        """Substitui os números de telefone encontrados no texto
+
+        Só números com formato de telefone angolano, como na extração de
+        entidades: valores ("250 000 000 kz"), datas e números de BI ficam
+        como estão, para a reprodução refletir as mensagens reais.
+        """
+        if not text:
+            return text
+
+        folded = text.lower().translate(ACCENTS)
+        amounts = [(match.start(), match.end()) for match in AMOUNT_PATTERN.finditer(folded)]
+
+        parts = []
+        last = 0
+        for match in PHONE_PATTERN.finditer(folded):
+            if overlaps(match.start(), match.end(), amounts):
+                continue
+
+            # Mesmo pseudônimo com ou sem o prefixo +244 (e igual ao do campo from)
+            parts.append(text[last:match.start()])
+            parts.append(self.pseudonym('244' + ''.join(match.groups())))
+            last = match.end()
+
+        parts.append(text[last:])
+        return ''.join(parts)
+
+    def anonymize_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Retorna uma cópia do payload do webhook sem números e nomes reais"""
+        data = copy.deepcopy(payload)
+
+        for entry in data.get('entry', []):
+            for change in entry.get('changes', []):
+                value = change.get('value', {})
+
+                for contact in value.get('contacts', []):
+                    contact['wa_id'] = self.pseudonym(contact.get('wa_id'))
+                    if 'profile' in contact:
+                        contact['profile'] = {'name': 'Usuário'}
+
+                for message in value.get('messages', []):
+                    message['from'] = self.pseudonym(message.get('from'))
+
+                    if message.get('type') == 'text' and 'text' in message:
+                        message['text']['body'] = self.anonymize_text(message['text'].get('body', ''))
+
+                    media = message.get(message.get('type'), {})
+                    if isinstance(media, dict) and media.get('caption'):
+                        media['caption'] = self.anonymize_text(media['caption'])
+
+                    if message.get('type') == 'contacts':
+                        message['contacts'] = [{'name': {'formatted_name': 'Contato'}}]
+
+                for status in value.get('statuses', []):
+                    status['recipient_id'] = self.pseudonym(status.get('recipient_id'))
+
+        return data
+
+class WebhookRecorder:
+    """Grava os payloads recebidos pelo webhook em JSONL comprimido (gzip)
+
+    Cada processo escreve o seu próprio arquivo no diretório configurado,
+    uma linha por requisição: {"t": horário de chegada, "payload": {...}}.
+    """
+
+    FLUSH_EVERY = 50
+
+    def __init__(self, directory: str, secret: str):
+        self.directory = directory
+        self.anonymizer = PhoneAnonymizer(secret)
+        self._file = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def record(self, payload: Dict[str, Any], received_at: Optional[float] = None):
+        """Anonimiza e grava um payload"""
+        line = json.dumps({
+            't': received_at or time.time(),
+            'payload': self.anonymizer.anonymize_payload(payload)
+        }, ensure_ascii=False)
+
+        with self._lock:
+            if self._file is None:
+                self._open()
+
+            self._file.write(line + '\n')
+            self._pending += 1
+
+            if self._pending >= self.FLUSH_EVERY:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self):
+        """Fecha o arquivo atual"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._pending = 0
+
+    def _open(self):
+        """Abre o arquivo do processo (modo append gera um novo membro gzip)"""
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f"webhooks-{datetime.utcnow().strftime('%Y%m%d')}-{os.getpid()}.jsonl.gz"
+        self._file = gzip.open(os.path.join(self.directory, filename), 'at', encoding='utf-8')
+
+def read_recordings(paths: List[str]) -> List[Dict[str, Any]]:
+    """Lê os registros gravados (arquivos ou diretórios), em ordem de chegada"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, '*.jsonl.gz')))
+        else:
+            files.extend(glob.glob(path))
+
+    records = []
+    for filename in sorted(files):
+        # O arquivo de um processo ainda gravando não tem o fim do membro gzip:
+        # ficam as linhas completas lidas até ali
+        try:
+            with gzip.open(filename, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.endswith('\n') and line.strip():
+                        records.append(json.loads(line))
+        except EOFError:
+            current_app.logger.warning(f'Arquivo em gravação lido até o último trecho gravado: {filename}')
+
+    records.sort(key=lambda record: record.get('t', 0))
+    return records
+
+def init_webhook_recorder(app: Flask) -> Optional[WebhookRecorder]:
+    """Cria o gravador de webhooks quando WEBHOOK_RECORD_DIR está configurado"""
+    directory = app.config.get('WEBHOOK_RECORD_DIR')
+    if not directory:
+        app.extensions['webhook_recorder'] = None
+        return None
+
+    recorder = WebhookRecorder(
+        directory=directory,
+        secret=app.config.get('WEBHOOK_RECORD_SECRET') or app.config['SECRET_KEY']
+    )
+    app.extensions['webhook_recorder'] = recorder
+    atexit.register(recorder.close)
+
+    return recorder
+
+def get_webhook_recorder() -> Optional[WebhookRecorder]:
+    """Retorna o gravador de webhooks da aplicação atual (None se desativado)"""
+    return current_app.extensions.get('webhook_recorder')
@@ -3,6 +3,7 @@ import json
 import logging
 from flask import current_app
 from typing import Optional, List, Dict, Any
+from src.modules.deadline import send_timeout
 
 class WhatsAppIntegration:
     """Classe para integração com WhatsApp Business API"""
@@ -11,6 +12,8 @@ class WhatsAppIntegration:
         self.base_url = current_app.config.get('WHATSAPP_API_BASE_URL', 'https://graph.facebook.com/v18.0')
         self.phone_number_id = current_app.config.get('WHATSAPP_PHONE_NUMBER_ID')
         self.access_token = current_app.config.get('WHATSAPP_TOKEN')
+        # Prazo das chamadas; durante o processamento de uma mensagem, limitado ao orçamento dela
+        self.timeout = current_app.config.get('WHATSAPP_TIMEOUT', 10.0)
         self.headers = {
             'Authorization': f'Bearer {self.access_token}',
             'Content-Type': 'application/json'
@@ -19,6 +22,11 @@ class WhatsAppIntegration:
     def send_message(self, to: str, message: str, image_url: Optional[str] = None, 
                     buttons: Optional[List[Dict]] = None, list_items: Optional[List[Dict]] = None) -> bool:
         """Envia mensagem via WhatsApp"""
+        return self.send_message_tracked(to, message, image_url, buttons, list_items) is not None
+    
+    def send_message_tracked(self, to: str, message: str, image_url: Optional[str] = None, 
+                            buttons: Optional[List[Dict]] = None, list_items: Optional[List[Dict]] = None) -> Optional[str]:
+        """Envia mensagem via WhatsApp e retorna o ID (wamid) da mensagem enviada"""
         try:
             url = f"{self.base_url}/{self.phone_number_id}/messages"
             
@@ -47,18 +55,21 @@ class WhatsAppIntegration:
             elif list_items:
                 payload = self._create_list_message(to, message, list_items)
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = requests.post(url, headers=self.headers, json=payload, timeout=send_timeout(self.timeout))
             
             if response.status_code == 200:
                 current_app.logger.info(f'Mensagem enviada com sucesso para {to}')
-                return True
+                
+                # O wamid identifica a resposta nos callbacks de status de entrega
+                messages = response.json().get('messages') or [{}]
+                return messages[0].get('id') or ''
             else:
                 current_app.logger.error(f'Erro ao enviar mensagem: {response.status_code} - {response.text}')
-                return False
+                return None
                 
         except Exception as e:
             current_app.logger.error(f'Erro na integração WhatsApp: {str(e)}')
-            return False
+            return None
     
     def _create_button_message(self, to: str, message: str, buttons: List[Dict]) -> Dict:
         """Cria mensagem com botões interativos"""
@@ -133,7 +144,7 @@ class WhatsAppIntegration:
             if components:
                 payload["template"]["components"] = components
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = requests.post(url, headers=self.headers, json=payload, timeout=send_timeout(self.timeout))
             
             if response.status_code == 200:
                 current_app.logger.info(f'Template enviado com sucesso para {to}')
@@ -151,7 +162,7 @@ class WhatsAppIntegration:
         try:
             # Primeiro, obtém URL da mídia
             url = f"{self.base_url}/{media_id}"
-            response = requests.get(url, headers=self.headers)
+            response = requests.get(url, headers=self.headers, timeout=send_timeout(self.timeout))
             
             if response.status_code != 200:
                 current_app.logger.error(f'Erro ao obter URL da mídia: {response.status_code}')
@@ -165,7 +176,7 @@ class WhatsAppIntegration:
                 return None
             
             # Baixa o arquivo
-            media_response = requests.get(media_url, headers=self.headers)
+            media_response = requests.get(media_url, headers=self.headers, timeout=send_timeout(self.timeout))
             
             if media_response.status_code == 200:
                 return media_response.content
@@ -188,7 +199,7 @@ class WhatsAppIntegration:
                 "message_id": message_id
             }
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = requests.post(url, headers=self.headers, json=payload, timeout=send_timeout(self.timeout))
             
             return response.status_code == 200
             
@@ -219,7 +230,7 @@ class WhatsAppIntegration:
                 "location": location_data
             }
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = requests.post(url, headers=self.headers, json=payload, timeout=send_timeout(self.timeout))
             
             if response.status_code == 200:
                 current_app.logger.info(f'Localização enviada com sucesso para {to}')
@@ -244,7 +255,7 @@ class WhatsAppIntegration:
                 "contacts": [contact_data]
             }
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = requests.post(url, headers=self.headers, json=payload, timeout=send_timeout(self.timeout))
             
             if response.status_code == 200:
                 current_app.logger.info(f'Contato enviado com sucesso para {to}')
@@ -261,7 +272,7 @@ class WhatsAppIntegration:
         """Obtém perfil do negócio"""
         try:
             url = f"{self.base_url}/{self.phone_number_id}/whatsapp_business_profile"
-            response = requests.get(url, headers=self.headers)
+            response = requests.get(url, headers=self.headers, timeout=send_timeout(self.timeout))
             
             if response.status_code == 200:
                 return response.json()
@@ -278,7 +289,7 @@ class WhatsAppIntegration:
         try:
             url = f"{self.base_url}/{self.phone_number_id}/whatsapp_business_profile"
             
-            response = requests.post(url, headers=self.headers, json=profile_data)
+            response = requests.post(url, headers=self.headers, json=profile_data, timeout=send_timeout(self.timeout))
             
             if response.status_code == 200:
                 current_app.logger.info('Perfil atualizado com sucesso')
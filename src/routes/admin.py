@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_cors import cross_origin
-from src.models import db, User, PrestadorServico, Produto, ConexaoPessoal, AchadoPerdido, Reclamacao, Conversa
+from src.models import db, User, PrestadorServico, Produto, ConexaoPessoal, AchadoPerdido, Reclamacao, Conversa, StatusEntrega
+from src.modules.delivery_status import delivery_latency_histogram
 from sqlalchemy import func, desc
 from datetime import datetime, timedelta
 import json
@@ -369,6 +370,67 @@ def get_system_status():
         current_app.logger.error(f'Erro ao buscar status: {str(e)}')
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@admin_bp.route('/metrics/delivery-latency', methods=['GET'])
+@cross_origin()
+def get_delivery_latency():
+    """Histograma por intenção do tempo entre a mensagem do usuário e a entrega da resposta"""
+    try:
+        days = request.args.get('days', 7, type=int)
+        since = datetime.now() - timedelta(days=days)
+        
+        rows = db.session.query(
+            Conversa.intencao_detectada,
+            Conversa.timestamp,
+            StatusEntrega.entregue_em
+        ).join(
+            StatusEntrega, StatusEntrega.conversa_id == Conversa.id
+        ).filter(
+            Conversa.timestamp >= since,
+            StatusEntrega.entregue_em.isnot(None)
+        ).all()
+        
+        failed = StatusEntrega.query.join(Conversa).filter(
+            Conversa.timestamp >= since,
+            StatusEntrega.falhou_em.isnot(None)
+        ).count()
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'period_days': days,
+                'delivered': len(rows),
+                'failed': failed,
+                'by_intent': delivery_latency_histogram(rows, buckets=[1, 2, 5, 10, 30, 60, 300])
+            }
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f'Erro ao calcular latência de entrega: {str(e)}')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/metrics/load', methods=['GET'])
+@cross_origin()
+def get_load_metrics():
+    """Retorna o estado do controle de carga e os contadores do processo"""
+    try:
+        shedder = current_app.extensions['load_shedder']
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'pending': shedder.pending,
+                'queue_depth': shedder.queue_depth(),
+                'degraded': shedder.degraded(),
+                'deferred_writes': current_app.extensions['deferred_writes'].pending(),
+                'openai_circuit': current_app.extensions['openai_client'].breaker.state,
+                'counters': current_app.extensions['metrics'].snapshot()
+            }
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f'Erro ao buscar métricas de carga: {str(e)}')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @admin_bp.route('/export/users', methods=['GET'])
 @cross_origin()
 def export_users():
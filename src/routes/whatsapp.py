@@ -1,11 +1,22 @@
 from flask import Blueprint, request, jsonify, current_app
 import json
 import time
+from concurrent.futures import wait
 from datetime import datetime
-from src.models import db, User, Conversa
-from src.modules.whatsapp_integration import WhatsAppIntegration
-from src.modules.nlp_processor import NLPProcessor
-from src.modules.message_router import MessageRouter
+from sqlalchemy.exc import IntegrityError
+from src.models import db, User, Conversa, MensagemAgrupada, StatusEntrega
+from src.modules.message_queue import is_async_mode, enqueue_message
+from src.modules.message_dedup import get_deduplicator
+from src.modules.sharded_executor import get_message_lanes, get_user_lock
+from src.modules.message_coalescer import get_message_coalescer
+from src.modules.webhook_recorder import get_webhook_recorder
+from src.modules.structured_logging import StageTimer, log_webhook_payload, log_message_processed
+from src.modules.delivery_status import get_status_ingestor
+from src.modules.load_shedder import get_load_shedder, mark_degraded
+from src.modules.deadline import start_deadline
+from src.modules.metrics import get_metrics
+from src.modules.image_analysis import get_image_analyzer
+from src.modules.registry import get_nlp_processor, get_message_router, get_whatsapp
 
 whatsapp_bp = Blueprint('whatsapp', __name__)
 
@@ -25,7 +36,7 @@ def verify_webhook():
         else:
             current_app.logger.warning('Falha na verificação do webhook')
             return 'Forbidden', 403
-            
+    
     except Exception as e:
         current_app.logger.error(f'Erro na verificação do webhook: {str(e)}')
         return 'Internal Server Error', 500
@@ -42,17 +53,26 @@ def receive_message():
         if not data:
             return jsonify({'status': 'error', 'message': 'No data received'}), 400
         
-        # Log da mensagem recebida (sem dados sensíveis)
-        current_app.logger.info(f'Mensagem recebida: {json.dumps(data, indent=2)}')
+        # Gravação anonimizada do tráfego para reprodução offline (WEBHOOK_RECORD_DIR)
+        recorder = get_webhook_recorder()
+        if recorder is not None:
+            recorder.record(data, received_at=start_time)
+        
+        # Log da mensagem recebida (amostrado no modo de log estruturado)
+        log_webhook_payload(data)
         
         # Verifica se há mudanças de mensagem
         if 'entry' not in data:
             return jsonify({'status': 'ok'}), 200
         
+        pending = []
+        shed = 0
+        shedder = get_load_shedder()
+        
         for entry in data['entry']:
             if 'changes' not in entry:
                 continue
-                
+            
             for change in entry['changes']:
                 if change.get('field') != 'messages':
                     continue
@@ -60,18 +80,113 @@ def receive_message():
                 value = change.get('value', {})
                 messages = value.get('messages', [])
                 
+                # Status de entrega das respostas são gravados em lote
+                get_status_ingestor().add(value.get('statuses', []))
+                
                 for message in messages:
+                    # Acima do limite de carga a mensagem é recusada antes da deduplicação,
+                    # para que o reenvio do WhatsApp seja aceito depois
+                    if shedder.should_shed():
+                        shed += 1
+                        continue
+                    
                     # Processa cada mensagem
-                    process_single_message(message, value, start_time)
+                    future = dispatch_message(message, value, start_time)
+                    if future is not None:
+                        pending.append(future)
         
-        return jsonify({'status': 'ok'}), 200
+        # No modo síncrono, responde após o processamento (usuários diferentes em paralelo)
+        if pending:
+            wait(pending)
+        
+        if shed:
+            get_metrics().increment('mensagens_recusadas', shed)
+            current_app.logger.warning(f'{shed} mensagem(ns) recusada(s) por excesso de carga')
+            retry_after = str(current_app.config.get('LOAD_SHED_RETRY_AFTER', 30))
+            return jsonify({'status': 'busy'}), 503, {'Retry-After': retry_after}
         
+        return jsonify({'status': 'ok'}), 200
+    
     except Exception as e:
         current_app.logger.error(f'Erro ao processar mensagem: {str(e)}')
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def dispatch_message(message, value, start_time):
+    """Enfileira a mensagem no modo assíncrono ou agenda na faixa do usuário
+    
+    Retorna um Future quando a mensagem é processada localmente.
+    """
+    # Validação mínima antes de aceitar a mensagem
+    if not message.get('from') or not message.get('type'):
+        current_app.logger.warning(f'Mensagem inválida ignorada: {message.get("id")}')
+        return None
+    
+    # Descarta reenvios do Meta antes de qualquer processamento
+    if get_deduplicator().is_duplicate(message.get('id')):
+        current_app.logger.info(f'Mensagem duplicada ignorada: {message.get("id")}')
+        return None
+    
+    try:
+        # A foto começa a ser baixada e analisada em segundo plano enquanto a mensagem espera a vez
+        if message.get('type') == 'image' and not is_async_mode():
+            analyzer = get_image_analyzer()
+            if analyzer:
+                analyzer.prefetch(message.get('image', {}).get('id'))
+        
+        # Rajadas de mensagens do mesmo usuário viram uma única mensagem lógica
+        coalescer = get_message_coalescer()
+        if coalescer.enabled:
+            future = coalescer.add(message.get('from'), message, value, start_time)
+            return None if is_async_mode() else future
+        
+        return dispatch_now(message, value, start_time)
+    except Exception:
+        # A mensagem não foi agendada: o reenvio do Meta tem de ser aceito
+        forget_message(message)
+        raise
+
+def forget_message(message):
+    """Libera na deduplicação os IDs da mensagem (e das que foram unidas a ela)"""
+    deduplicator = get_deduplicator()
+    for message_id in message.get('coalesced_ids') or [message.get('id')]:
+        deduplicator.forget(message_id)
+
+def dispatch_now(message, value, start_time):
+    """Enfileira a mensagem no Celery ou agenda na faixa do usuário"""
+    if is_async_mode():
+        if enqueue_message(message, value, start_time):
+            return None
+        
+        # Sem broker disponível, processa no próprio webhook para não perder a mensagem
+        current_app.logger.warning('Fila indisponível, processando mensagem de forma síncrona')
+    
+    app = current_app._get_current_object()
+    shedder = get_load_shedder()
+    
+    def run_in_lane():
+        try:
+            with app.app_context():
+                process_message_in_order(message, value, start_time)
+        finally:
+            shedder.task_finished()
+    
+    shedder.task_started()
+    return get_message_lanes().submit(message.get('from'), run_in_lane)
+
+def process_message_in_order(message, value, start_time):
+    """Processa a mensagem segurando a trava do usuário entre processos"""
+    with get_user_lock().hold(message.get('from')):
+        process_single_message(message, value, start_time)
+
 def process_single_message(message, value, start_time):
-    """Processa uma única mensagem"""
+    """Processa uma única mensagem
+    
+    Toda a mensagem é uma única unidade de trabalho: usuário, conversa e
+    contexto dos módulos são gravados em um único commit no final.
+    """
+    from_number = None
+    timer = StageTimer(start_time)
+    
     try:
         # Extrai informações da mensagem
         from_number = message.get('from')
@@ -83,8 +198,22 @@ def process_single_message(message, value, start_time):
             current_app.logger.warning('Mensagem sem número de origem')
             return
         
-        # Busca ou cria usuário
-        user = User.buscar_ou_criar(whatsapp_id=from_number)
+        # Reentregas da fila (ou do Meta) que já geraram conversa são descartadas
+        with timer.stage('dedup'):
+            already_processed = Conversa.mensagem_ja_processada(message_id)
+        
+        if already_processed:
+            current_app.logger.info(f'Mensagem {message_id} já processada, ignorando')
+            return
+        
+        # Modo degradado sob carga alta: sem OpenAI, respostas prontas e escritas adiadas
+        degraded = get_load_shedder().degraded()
+        mark_degraded(degraded)
+        if degraded:
+            get_metrics().increment('mensagens_degradadas')
+        
+        # Orçamento de tempo da mensagem: as etapas seguintes escolhem caminhos mais baratos quando ele acaba
+        deadline = start_deadline(start_time)
         
         # Extrai conteúdo da mensagem baseado no tipo
         message_content = extract_message_content(message, message_type)
@@ -93,9 +222,21 @@ def process_single_message(message, value, start_time):
             current_app.logger.warning(f'Não foi possível extrair conteúdo da mensagem tipo: {message_type}')
             return
         
+        # Busca ou cria usuário (sem commit; o último acesso é gravado no máximo uma vez por intervalo,
+        # e não é gravado no modo degradado)
+        with timer.stage('usuario'):
+            user = User.buscar_ou_criar(whatsapp_id=from_number, commit=False)
+            if not degraded:
+                user.registrar_acesso(current_app.config.get('USER_LAST_ACCESS_INTERVAL', 300))
+            
+            # Usuário novo: um INSERT curto para o NLP e os módulos já terem o ID dele
+            if user.id is None:
+                db.session.flush()
+        
         # Cria registro da conversa
         conversa = Conversa(
-            usuario_id=user.id,
+            usuario=user,
+            whatsapp_message_id=message_id,
             mensagem_usuario=message_content.get('text', ''),
             tipo_comando='processando',
             imagem_recebida=message_content.get('image_url'),
@@ -103,26 +244,43 @@ def process_single_message(message, value, start_time):
             sessao_id=f"{from_number}_{int(time.time())}"
         )
         
-        db.session.add(conversa)
-        db.session.commit()
-        
-        # Processa a mensagem com NLP
-        nlp_processor = NLPProcessor()
-        nlp_result = nlp_processor.process_message(
-            text=message_content.get('text', ''),
-            image_url=message_content.get('image_url'),
-            user_id=user.id
-        )
-        
-        # Atualiza conversa com resultado do NLP
-        conversa.intencao_detectada = nlp_result.get('intent')
-        conversa.tipo_comando = nlp_result.get('command_type')
-        conversa.categoria = nlp_result.get('category')
-        conversa.entidades_extraidas = json.dumps(nlp_result.get('entities', {}))
+        # Respostas de botões e listas vão direto ao handler pelo ID, sem NLP
+        reply_id = (message_content.get('button_id') or message_content.get('list_id')
+                    or message_content.get('button_payload'))
         
-        # Roteia mensagem para o módulo apropriado
-        message_router = MessageRouter()
-        response = message_router.route_message(nlp_result, user, conversa)
+        # Sem autoflush, as consultas do NLP e dos módulos não gravam a conversa antes do commit final
+        with db.session.no_autoflush:
+            message_router = get_message_router()
+            
+            response = None
+            
+            if reply_id:
+                with timer.stage('botao'):
+                    response = message_router.handle_button_response(reply_id, user)
+            
+            if response is not None:
+                conversa.intencao_detectada = 'resposta_botao'
+                conversa.tipo_comando = 'botao'
+                conversa.entidades_extraidas = json.dumps({'button_id': reply_id})
+            else:
+                # Processa a mensagem com NLP
+                with timer.stage('nlp'):
+                    nlp_processor = get_nlp_processor()
+                    nlp_result = nlp_processor.process_message(
+                        text=message_content.get('text', ''),
+                        image_url=message_content.get('image_url'),
+                        user_id=user.id
+                    )
+                
+                # Atualiza conversa com resultado do NLP
+                conversa.intencao_detectada = nlp_result.get('intent')
+                conversa.tipo_comando = nlp_result.get('command_type')
+                conversa.categoria = nlp_result.get('category')
+                conversa.entidades_extraidas = json.dumps(nlp_result.get('entities', {}))
+                
+                # Roteia mensagem para o módulo apropriado
+                with timer.stage('modulo'):
+                    response = message_router.route_message(nlp_result, user, conversa)
         
         # Atualiza conversa com resposta
         conversa.resposta_ia = response.get('text', '')
@@ -132,31 +290,68 @@ def process_single_message(message, value, start_time):
             conversa.erro_detalhes = response.get('error', '')
         
         # Calcula tempo de resposta
-        end_time = time.time()
-        conversa.tempo_resposta_ms = int((end_time - start_time) * 1000)
+        conversa.tempo_resposta_ms = timer.total_ms()
+        
+        # Único commit da mensagem, com os wamids das mensagens unidas a ela na rajada
+        db.session.add(conversa)
+        for coalesced_id in message.get('coalesced_ids', []):
+            if coalesced_id and coalesced_id != message_id:
+                db.session.add(MensagemAgrupada(whatsapp_message_id=coalesced_id, conversa=conversa))
         
-        db.session.commit()
+        try:
+            with timer.stage('commit'):
+                db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            
+            # Só é duplicata se outra entrega da mesma mensagem foi registrada em paralelo;
+            # qualquer outra restrição violada é erro (e o usuário recebe a resposta de erro)
+            message_ids = message.get('coalesced_ids') or [message_id]
+            if not any(Conversa.mensagem_ja_processada(registered_id) for registered_id in message_ids):
+                raise
+            
+            current_app.logger.info(f'Mensagem {message_id} registrada em paralelo, ignorando')
+            return
         
         # Envia resposta via WhatsApp
-        whatsapp = WhatsAppIntegration()
-        whatsapp.send_message(
-            to=from_number,
-            message=response.get('text', ''),
-            image_url=response.get('image_url'),
-            buttons=response.get('buttons')
-        )
+        with timer.stage('envio'):
+            whatsapp = get_whatsapp()
+            outbound_id = whatsapp.send_message_tracked(
+                to=from_number,
+                message=response.get('text', ''),
+                image_url=response.get('image_url'),
+                buttons=response.get('buttons')
+            )
         
-        # Atualiza último acesso do usuário
-        user.atualizar_ultimo_acesso()
+        if deadline and deadline.remaining() < 0:
+            get_metrics().increment('mensagens_fora_do_prazo')
         
-        current_app.logger.info(f'Mensagem processada com sucesso para {from_number}')
+        # Vincula a resposta à conversa para medir o tempo até a entrega
+        if outbound_id:
+            try:
+                StatusEntrega.registrar_envio(outbound_id, conversa.id)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f'Erro ao registrar envio da resposta: {str(e)}')
         
+        log_message_processed(
+            message_id, from_number, timer,
+            intent=conversa.intencao_detectada,
+            command=conversa.tipo_comando,
+            degraded=degraded or None,
+            coalesced=len(message.get('coalesced_ids', [])) or None
+        )
+    
     except Exception as e:
         current_app.logger.error(f'Erro ao processar mensagem individual: {str(e)}')
+        db.session.rollback()
+        
+        # Sem conversa gravada, um reenvio da mesma mensagem deve ser processado de novo
+        forget_message(message)
         
         # Tenta enviar mensagem de erro para o usuário
         try:
-            whatsapp = WhatsAppIntegration()
+            whatsapp = get_whatsapp()
             whatsapp.send_message(
                 to=from_number,
                 message="Desculpe, ocorreu um erro ao processar sua mensagem. Tente novamente em alguns instantes."
@@ -171,50 +366,50 @@ def extract_message_content(message, message_type):
     try:
         if message_type == 'text':
             content['text'] = message.get('text', {}).get('body', '')
-            
+        
         elif message_type == 'image':
             image_data = message.get('image', {})
             content['text'] = image_data.get('caption', '')
             content['image_url'] = image_data.get('id')  # ID da imagem no WhatsApp
             content['mime_type'] = image_data.get('mime_type')
-            
+        
         elif message_type == 'document':
             doc_data = message.get('document', {})
             content['text'] = doc_data.get('caption', '')
             content['document_url'] = doc_data.get('id')
             content['filename'] = doc_data.get('filename')
             content['mime_type'] = doc_data.get('mime_type')
-            
+        
         elif message_type == 'audio':
             audio_data = message.get('audio', {})
             content['audio_url'] = audio_data.get('id')
             content['mime_type'] = audio_data.get('mime_type')
-            
+        
         elif message_type == 'video':
             video_data = message.get('video', {})
             content['text'] = video_data.get('caption', '')
             content['video_url'] = video_data.get('id')
             content['mime_type'] = video_data.get('mime_type')
-            
+        
         elif message_type == 'location':
             location_data = message.get('location', {})
             content['text'] = f"Localização: {location_data.get('latitude')}, {location_data.get('longitude')}"
             content['latitude'] = location_data.get('latitude')
             content['longitude'] = location_data.get('longitude')
             content['address'] = location_data.get('address')
-            
+        
         elif message_type == 'contacts':
             contacts_data = message.get('contacts', [])
             if contacts_data:
                 contact = contacts_data[0]
                 content['text'] = f"Contato: {contact.get('name', {}).get('formatted_name', '')}"
                 content['contact_data'] = contact
-                
+        
         elif message_type == 'button':
             button_data = message.get('button', {})
             content['text'] = button_data.get('text', '')
             content['button_payload'] = button_data.get('payload')
-            
+        
         elif message_type == 'interactive':
             interactive_data = message.get('interactive', {})
             if interactive_data.get('type') == 'button_reply':
@@ -227,7 +422,7 @@ def extract_message_content(message, message_type):
                 content['list_id'] = list_reply.get('id')
         
         return content
-        
+    
     except Exception as e:
         current_app.logger.error(f'Erro ao extrair conteúdo da mensagem: {str(e)}')
         return {'text': ''}
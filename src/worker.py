@@ -0,0 +1,13 @@
+"""
+Ponto de entrada dos workers Celery
+
+Uso: celery -A src.worker worker --loglevel=info -Q mensagens
+
+Com CELERY_LANE_QUEUES=N, inicie um worker de concorrência 1 por fila
+(mensagens.0 ... mensagens.N-1) para manter a ordem das mensagens de cada usuário:
+    celery -A src.worker worker -Q mensagens.0 -c 1
+"""
+
+from src.main import app
+
+celery = app.extensions['celery']
@@ -7,6 +7,9 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
+# src.main cria a aplicação de desenvolvimento na importação: sem a pasta database/ usa banco em memória
+os.environ.setdefault('DEV_DATABASE_URL', 'sqlite:///:memory:')
+
 def test_imports():
     """Testa se todos os módulos podem ser importados"""
     print("🔍 Testando imports dos módulos...")
@@ -125,6 +128,1067 @@ def test_whatsapp_integration():
         print(f"❌ Erro no teste WhatsApp: {e}")
         return False
 
+def test_message_dedup():
+    """Testa a deduplicação de mensagens reenviadas"""
+    print("\n♻️ Testando deduplicação de mensagens...")
+    
+    try:
+        from src.modules.message_dedup import MessageDeduplicator
+        
+        dedup = MessageDeduplicator(max_size=2, ttl_seconds=60)
+        
+        assert dedup.is_duplicate('wamid.1') is False
+        assert dedup.is_duplicate('wamid.1') is True
+        print("✅ Reenvio da mesma mensagem descartado")
+        
+        # O LRU limitado esquece os IDs mais antigos
+        dedup.is_duplicate('wamid.2')
+        dedup.is_duplicate('wamid.3')
+        assert dedup.is_duplicate('wamid.1') is False
+        print("✅ Limite de tamanho do LRU respeitado")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de deduplicação: {e}")
+        return False
+
+def test_product_sale_flow():
+    """Testa a venda de ponta a ponta: NLP, roteador e marketplace com banco em memória"""
+    print("\n💰 Testando fluxo de venda de produto...")
+    
+    try:
+        import json
+        from unittest.mock import patch
+        from src.main import create_app
+        from src.models import db, User, Conversa
+        from src.modules.nlp_processor import NLPProcessor
+        from src.modules.registry import get_nlp_processor, get_message_router
+        
+        app = create_app('testing')
+        
+        # Sem chave do OpenAI no teste: a análise devolve a intenção de venda
+        ai_analysis = {'intent': 'venda_produto', 'command_type': 'venda_produto', 'category': 'produto', 'confidence': 0.9}
+        
+        with app.test_request_context(), patch.object(NLPProcessor, '_cached_openai_analysis', return_value=ai_analysis):
+            user = User(whatsapp_id='244923000000')
+            db.session.add(user)
+            db.session.commit()
+            
+            for text in ["Vendo iPhone 12, usado, 150.000kz", "Vendo iPhone 12, 150000 kz"]:
+                conversa = Conversa(usuario_id=user.id, mensagem_usuario=text)
+                db.session.add(conversa)
+                
+                nlp_result = get_nlp_processor().process_message(text)
+                response = get_message_router().route_message(nlp_result, user, conversa)
+                db.session.commit()
+                
+                assert response['success'], response['text']
+                assert '150,000 kz' in response['text']
+                assert json.loads(conversa.contexto_conversa)['product_info']['price'] == '150000.00'
+                print(f"✅ Anúncio iniciado: {text}")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de venda: {e}")
+        raise
+
+def test_keyword_plurals():
+    """Testa as palavras-chave dos módulos no plural"""
+    print("\n🔤 Testando plurais nas tabelas de palavras-chave...")
+    
+    try:
+        import src.modules.message_router  # as tabelas se registram ao importar os módulos
+        from src.modules.keyword_tables import GAZETTEER
+        from src.modules.parsed_message import ParsedMessage
+        
+        cases = [
+            ("quanto custam os dolares hoje", 'financial_market.currencies', 'usd'),
+            ("vendo carros usados", 'marketplace.categories', 'veiculos'),
+            ("vendo telefones", 'marketplace.categories', 'eletronicos'),
+            ("perdi os documentos", 'lost_found.categories', 'documento'),
+            ("preciso de eletricistas", 'service_providers.specialties', 'eletricista')
+        ]
+        
+        for text, table, key in cases:
+            assert key in GAZETTEER.scan(text).get(table, set()), text
+            print(f"✅ {text}: {key}")
+        
+        # Listas simples também aceitam o plural; siglas curtas continuam exigindo a palavra inteira
+        assert ParsedMessage("vendo carros usados").has('usado')
+        assert not ParsedMessage("canal tvi").has('tv')
+        print("✅ Plural em listas simples e limites de palavra respeitados")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de plurais: {e}")
+        raise
+
+def test_openai_resilience():
+    """Testa o disjuntor, o prazo e o hedge do cliente OpenAI (sem rede)"""
+    print("\n🔌 Testando resiliência do cliente OpenAI...")
+    
+    try:
+        import threading
+        import time
+        from types import SimpleNamespace
+        from flask import Flask, g
+        from src.modules.deadline import Deadline
+        from src.modules.openai_client import (CircuitBreaker, CircuitOpenError, OpenAITimeoutError,
+                                               ResilientOpenAIClient)
+        
+        class FakeCompletions:
+            """Imita chat.completions: cada chamada demora o atraso da sua vez"""
+            
+            def __init__(self, delays):
+                self.delays = delays
+                self.calls = 0
+                self.lock = threading.Lock()
+            
+            def create(self, timeout=None, **kwargs):
+                with self.lock:
+                    number = self.calls
+                    self.calls += 1
+                delay = self.delays[min(number, len(self.delays) - 1)]
+                time.sleep(min(delay, timeout))
+                if delay > timeout:
+                    raise TimeoutError('timeout do SDK')
+                return f'resposta {number}'
+        
+        def fake_client(delays, **options):
+            client = ResilientOpenAIClient(**options)
+            client._client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(delays)))
+            return client
+        
+        # Fechado -> aberto -> meio-aberto -> fechado, com relógio controlado
+        now = [0.0]
+        breaker = CircuitBreaker(window_size=4, min_calls=2, error_rate=0.5, open_seconds=10, clock=lambda: now[0])
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+        
+        now[0] += 10
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow() and not breaker.allow()  # uma chamada de teste por vez
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN  # teste falhou: reabre
+        
+        now[0] += 10
+        assert breaker.allow()
+        breaker.record_success(latency_ms=10)
+        assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+        print("✅ Disjuntor: fechado -> aberto -> meio-aberto -> fechado")
+        
+        app = Flask(__name__)
+        with app.test_request_context():
+            # Erros abrem o disjuntor do cliente, que passa a recusar na hora
+            client = fake_client([1.0], timeout=0.05,
+                                 breaker=CircuitBreaker(window_size=2, min_calls=2, open_seconds=60))
+            for _ in range(2):
+                try:
+                    client.create(model='teste', messages=[])
+                    assert False, 'a chamada deveria estourar o prazo'
+                except TimeoutError:
+                    pass
+            try:
+                client.create(model='teste', messages=[])
+                assert False, 'o disjuntor deveria recusar a chamada'
+            except CircuitOpenError:
+                pass
+            assert client.client.chat.completions.calls == 2
+            print("✅ Disjuntor aberto recusa sem chamar a API")
+            
+            # Orçamento da mensagem esgotado: falha sem chamar nem contar no disjuntor
+            client = fake_client([0.0], timeout=5.0)
+            g.deadline = Deadline(start=time.time() - 20, budget=15)
+            try:
+                client.create(model='teste', messages=[])
+                assert False, 'sem orçamento a chamada não deveria ser feita'
+            except OpenAITimeoutError:
+                pass
+            g.deadline = None
+            assert client.client.chat.completions.calls == 0
+            assert client.breaker.state == CircuitBreaker.CLOSED
+            print("✅ Prazo da mensagem esgotado antes da chamada")
+            
+            # Hedge: a primeira requisição demora, a duplicada responde primeiro
+            client = fake_client([0.5, 0.01], timeout=2.0, hedge=True, hedge_min_delay_ms=50)
+            started = time.monotonic()
+            assert client.create(model='teste', messages=[]) == 'resposta 1'
+            assert time.monotonic() - started < 0.4
+            print("✅ Hedge: a requisição duplicada venceu")
+            
+            # Hedge com as duas requisições lentas: vale o prazo total da chamada
+            client = fake_client([0.5], timeout=0.2, hedge=True, hedge_min_delay_ms=50)
+            started = time.monotonic()
+            try:
+                client.create(model='teste', messages=[])
+                assert False, 'a chamada deveria estourar o prazo'
+            except (OpenAITimeoutError, TimeoutError):
+                pass
+            assert time.monotonic() - started < 0.4
+            print("✅ Prazo total respeitado com hedge")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste do cliente OpenAI: {e}")
+        raise
+
+def test_intent_batcher():
+    """Testa o micro-lote de classificações com um classificador falso"""
+    print("\n📦 Testando micro-lote de classificações...")
+    
+    try:
+        import json
+        import threading
+        import time
+        from types import SimpleNamespace
+        from flask import Flask
+        from src.modules.metrics import init_metrics
+        from src.modules.intent_batcher import IntentBatcher, classify_batch_with_openai, parse_batch_response
+        
+        calls = []
+        lock = threading.Lock()
+        
+        def fake_classify(items):
+            with lock:
+                calls.append([text for text, _ in items])
+            return [{'intent': 'busca_produto', 'text': text} for text, _ in items]
+        
+        app = Flask(__name__)
+        init_metrics(app)
+        
+        with app.app_context():
+            # Lote cheio é enviado na hora, sem esperar a janela
+            batcher = IntentBatcher(window_ms=10000, max_batch=3, classify_batch=fake_classify)
+            futures = [batcher.submit(text, {}) for text in ('a', 'b', 'c')]
+            assert all(future.done() for future in futures)
+            assert calls == [['a', 'b', 'c']]
+            assert [future.result()['text'] for future in futures] == ['a', 'b', 'c']
+            print("✅ Lote enviado ao atingir o tamanho máximo")
+            
+            # Fim da janela envia o lote incompleto
+            calls.clear()
+            batcher = IntentBatcher(window_ms=30, max_batch=8, classify_batch=fake_classify)
+            started = time.monotonic()
+            assert batcher.classify('d', {})['text'] == 'd'
+            assert calls == [['d']] and time.monotonic() - started < 1
+            print("✅ Lote enviado no fim da janela")
+            
+            # Array JSON: cercas de código, índices fora de ordem, objeto envolvente e itens faltando
+            content = '```json\n[{"index": 2, "intent": "saudacao"}, {"index": 1, "intent": "ajuda"}]\n```'
+            assert [r['intent'] for r in parse_batch_response(content, 2)] == ['ajuda', 'saudacao']
+            assert parse_batch_response('{"results": [{"intent": "ajuda"}]}', 1)[0]['command_type'] == 'ajuda'
+            assert parse_batch_response('[{"index": 1, "intent": "ajuda"}, "x", {"index": 9}]', 3)[1:] == [None, None]
+            try:
+                parse_batch_response('[{"index": 1,', 1)
+                assert False, 'JSON inválido deveria falhar'
+            except ValueError:
+                pass
+            print("✅ Interpretação do array JSON")
+            
+            # Mensagem que faltou na resposta é classificada sozinha; as outras não
+            single = []
+            
+            def short_batch(items):
+                return [{'intent': 'ajuda'}] + [None] * (len(items) - 1)
+            
+            def fallback(text, entities):
+                single.append(text)
+                return {'intent': 'individual'}
+            
+            batcher = IntentBatcher(window_ms=10000, max_batch=2, classify_batch=short_batch)
+            results = []
+            worker = threading.Thread(target=lambda: results.append(batcher.classify('e', {}, fallback=fallback)))
+            worker.start()
+            while batcher._batch is None:
+                time.sleep(0.001)
+            second = batcher.classify('f', {}, fallback=fallback)
+            worker.join()
+            assert results == [{'intent': 'ajuda'}] and second == {'intent': 'individual'} and single == ['f']
+            print("✅ Fallback individual só para a mensagem que faltou")
+            
+            # Falha da requisição do lote: None, sem repetir a chamada mensagem a mensagem
+            def failing(items):
+                raise RuntimeError('OpenAI indisponível')
+            
+            batcher = IntentBatcher(window_ms=10, max_batch=8, classify_batch=failing)
+            assert batcher.classify('g', {}, fallback=fallback) is None and single == ['f']
+            print("✅ Falha do lote não gera chamadas individuais")
+            
+            # Resposta inválida do OpenAI vira None para todas as mensagens do lote
+            reply = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='não é json'))])
+            app.extensions['openai_client'] = SimpleNamespace(create=lambda **kwargs: reply)
+            assert classify_batch_with_openai([('h', {}), ('i', {})]) == [None, None]
+            reply.choices[0].message.content = json.dumps([{'index': 1, 'intent': 'ajuda'}])
+            assert classify_batch_with_openai([('h', {}), ('i', {})])[0]['intent'] == 'ajuda'
+            print("✅ Resposta inválida do OpenAI tratada")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste do micro-lote: {e}")
+        raise
+
+def test_message_lanes():
+    """Testa a ordem por usuário e o paralelismo entre usuários das faixas"""
+    print("\n🛣️ Testando faixas de processamento por usuário...")
+    
+    try:
+        import threading
+        import time
+        from src.modules.sharded_executor import ShardedExecutor
+        
+        lanes = ShardedExecutor(num_lanes=4, name='teste')
+        first_user = '244900000001'
+        other_user = next(f'2449000000{n:02d}' for n in range(2, 99)
+                          if lanes.lane_for(f'2449000000{n:02d}') != lanes.lane_for(first_user))
+        
+        completed = []
+        other_started = threading.Event()
+        
+        def first_user_task(number, delay):
+            # A primeira mensagem só termina depois que o outro usuário começou
+            if number == 0:
+                assert other_started.wait(timeout=5), 'o outro usuário ficou esperando a faixa do primeiro'
+            time.sleep(delay)
+            completed.append(number)
+        
+        def other_user_task():
+            other_started.set()
+        
+        # Atrasos decrescentes: em paralelo, as últimas terminariam antes das primeiras
+        futures = [lanes.submit(first_user, first_user_task, number, 0.05 - number * 0.01) for number in range(5)]
+        futures.append(lanes.submit(other_user, other_user_task))
+        
+        for future in futures:
+            future.result(timeout=10)
+        lanes.shutdown()
+        
+        assert completed == [0, 1, 2, 3, 4]
+        print("✅ Mensagens do mesmo usuário processadas na ordem de chegada")
+        print("✅ Outro usuário processado em paralelo, sem esperar a faixa do primeiro")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste das faixas: {e}")
+        raise
+
+def test_message_coalescer():
+    """Testa a junção de rajadas de mensagens e o registro de todos os wamids"""
+    print("\n🧩 Testando junção de rajadas de mensagens...")
+    
+    try:
+        import threading
+        import time
+        from unittest.mock import MagicMock, patch
+        from src.modules.message_coalescer import MessageCoalescer
+        from src.main import create_app
+        from src.models import Conversa, MensagemAgrupada
+        from src.routes import whatsapp as whatsapp_route
+        
+        delivered = []
+        ready = threading.Event()
+        
+        def collect(message, value, start_time):
+            delivered.append(message)
+            ready.set()
+            return None
+        
+        def text(message_id, body):
+            return {'id': message_id, 'from': '244900000001', 'type': 'text', 'text': {'body': body}}
+        
+        # Debounce: mensagens dentro da janela viram uma só, entregue depois do silêncio
+        coalescer = MessageCoalescer(window_ms=80, max_wait_ms=2000, flush_callback=collect)
+        for message_id, body in (('wamid.1', 'Procuro'), ('wamid.2', 'eletricista'), ('wamid.3', 'em Viana')):
+            coalescer.add('244900000001', text(message_id, body), {}, time.time())
+            time.sleep(0.02)
+        assert not delivered, 'a rajada foi entregue antes do fim da janela'
+        assert ready.wait(timeout=2)
+        assert len(delivered) == 1
+        assert delivered[0]['id'] == 'wamid.1' and delivered[0]['text']['body'] == 'Procuro eletricista em Viana'
+        assert delivered[0]['coalesced_ids'] == ['wamid.1', 'wamid.2', 'wamid.3']
+        print("✅ Rajada unida em uma única mensagem")
+        
+        # Mensagem que não é texto libera a rajada antes dela, mantendo a ordem
+        delivered.clear()
+        coalescer.add('244900000001', text('wamid.4', 'Vendo'), {}, time.time())
+        coalescer.add('244900000001', {'id': 'wamid.5', 'from': '244900000001', 'type': 'image'}, {}, time.time())
+        assert [message['id'] for message in delivered] == ['wamid.4', 'wamid.5']
+        print("✅ Imagem libera a rajada pendente na ordem")
+        
+        # Todos os wamids da rajada ficam registrados: a reentrega de qualquer um é reconhecida
+        app = create_app('testing')
+        whatsapp = MagicMock()
+        whatsapp.send_message_tracked.return_value = None
+        nlp = MagicMock()
+        nlp.process_message.return_value = {'intent': 'saudacao', 'command_type': 'saudacao', 'confidence': 0.9,
+                                            'entities': {}, 'text': 'ola'}
+        
+        with app.test_request_context(), \
+                patch.object(whatsapp_route, 'get_whatsapp', return_value=whatsapp), \
+                patch.object(whatsapp_route, 'get_nlp_processor', return_value=nlp):
+            merged = dict(text('wamid.10', 'ola tudo bem'), coalesced_ids=['wamid.10', 'wamid.11', 'wamid.12'])
+            whatsapp_route.process_single_message(merged, {}, time.time())
+            
+            assert Conversa.query.count() == 1 and MensagemAgrupada.query.count() == 2
+            assert all(Conversa.mensagem_ja_processada(message_id) for message_id in merged['coalesced_ids'])
+            
+            whatsapp_route.process_single_message(text('wamid.12', 'tudo bem'), {}, time.time())
+            assert Conversa.query.count() == 1
+        print("✅ Reentrega de mensagem unida reconhecida")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de junção de rajadas: {e}")
+        raise
+
+def test_load_shedder():
+    """Testa a recusa por excesso de carga e o modo degradado"""
+    print("\n🚦 Testando controle de carga...")
+    
+    try:
+        import time
+        from unittest.mock import MagicMock, patch
+        from flask import g
+        from src.main import create_app
+        from src.modules.load_shedder import LoadShedder, init_load_shedder, is_degraded
+        from src.routes import whatsapp as whatsapp_route
+        
+        class FakePipeline:
+            def __init__(self, depths):
+                self.depths = depths
+                self.names = []
+            
+            def llen(self, name):
+                self.names.append(name)
+            
+            def execute(self):
+                return [self.depths.get(name, 0) for name in self.names]
+        
+        class FakeRedis:
+            def __init__(self, depths):
+                self.depths = depths
+            
+            def pipeline(self):
+                return FakePipeline(self.depths)
+        
+        # Modo Celery sem limites de fila configurados: valem os limites de PENDING sobre as filas do broker
+        app = create_app('testing')
+        app.config.update(MESSAGE_PROCESSING_MODE='celery', CELERY_BROKER_URL='redis://localhost:6379/0',
+                          CELERY_LANE_QUEUES=2, LOAD_SHED_MAX_PENDING=10, LOAD_DEGRADE_PENDING=4,
+                          LOAD_SHED_MAX_QUEUE_DEPTH=None, LOAD_DEGRADE_QUEUE_DEPTH=None)
+        with app.app_context():
+            shedder = init_load_shedder(app)
+            assert shedder.max_queue_depth == 10 and shedder.degrade_queue_depth == 4
+            assert shedder.redis is not None
+            
+            shedder.redis = FakeRedis({'mensagens': 1, 'mensagens.0': 2, 'mensagens.1': 3})
+            assert shedder.pending == 0 and shedder.queue_depth() == 6
+            assert shedder.degraded() and not shedder.should_shed()
+            
+            shedder.redis = FakeRedis({'mensagens.1': 12})
+            shedder._queue_depth_at = 0.0
+            assert shedder.should_shed()
+        print("✅ Modo Celery usa o tamanho das filas do broker")
+        
+        # Limite zero explícito continua desligando a consulta às filas
+        app.config.update(LOAD_SHED_MAX_QUEUE_DEPTH=0, LOAD_DEGRADE_QUEUE_DEPTH=0)
+        shedder = init_load_shedder(app)
+        assert shedder.redis is None and shedder.max_queue_depth == 0
+        
+        # Modo síncrono: sem consulta às filas
+        sync_app = create_app('testing')
+        assert sync_app.extensions['load_shedder'].redis is None
+        print("✅ Limite zero e modo síncrono não consultam o broker")
+        
+        # Acima do limite o webhook responde 503 com Retry-After, sem processar a mensagem
+        sync_app.config['LOAD_SHED_RETRY_AFTER'] = 45
+        sync_app.extensions['load_shedder'] = LoadShedder(max_pending=1, degrade_pending=0)
+        sync_app.extensions['load_shedder'].task_started()
+        payload = {'entry': [{'changes': [{'field': 'messages', 'value': {'messages': [
+            {'id': 'wamid.carga', 'from': '244900000002', 'type': 'text', 'text': {'body': 'ola'}}]}}]}]}
+        with patch.object(whatsapp_route, 'dispatch_message') as dispatch:
+            response = sync_app.test_client().post('/webhook/whatsapp', json=payload)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '45'
+        assert not dispatch.called
+        print("✅ Webhook recusa com 503 e Retry-After")
+        
+        # Acima do limite de degradação a mensagem é processada no modo degradado
+        sync_app.extensions['load_shedder'] = LoadShedder(max_pending=0, degrade_pending=1)
+        sync_app.extensions['load_shedder'].task_started()
+        seen = {}
+        
+        def process(text, image_url=None, user_id=None):
+            seen['degraded'] = (g.degraded, is_degraded())
+            return {'intent': 'saudacao', 'command_type': 'saudacao', 'confidence': 0.9, 'entities': {}, 'text': text}
+        
+        whatsapp = MagicMock()
+        whatsapp.send_message_tracked.return_value = None
+        nlp = MagicMock()
+        nlp.process_message.side_effect = process
+        message = {'id': 'wamid.degradado', 'from': '244900000003', 'type': 'text', 'text': {'body': 'ola'}}
+        with sync_app.test_request_context(), \
+                patch.object(whatsapp_route, 'get_whatsapp', return_value=whatsapp), \
+                patch.object(whatsapp_route, 'get_nlp_processor', return_value=nlp):
+            whatsapp_route.process_single_message(message, {}, time.time())
+        assert seen['degraded'] == (True, True)
+        print("✅ Mensagem processada no modo degradado")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de controle de carga: {e}")
+        raise
+
+def test_structured_logging():
+    """Testa os eventos estruturados sem alterar o nível dos handlers da aplicação"""
+    print("\n🪵 Testando log estruturado...")
+    
+    try:
+        import logging
+        from flask import Flask
+        from src.modules.structured_logging import init_logging, log_event
+        
+        class ListHandler(logging.Handler):
+            def __init__(self, level=logging.NOTSET):
+                super().__init__(level)
+                self.messages = []
+            
+            def emit(self, record):
+                self.messages.append(record.getMessage())
+        
+        # Como o syslog de produção: logger e handler em WARNING
+        app = Flask('teste_log_estruturado')
+        app.config['LOG_MODE'] = 'structured'
+        app_handler = ListHandler(logging.WARNING)
+        app.logger.setLevel(logging.WARNING)
+        app.logger.addHandler(app_handler)
+        
+        # Fora do pytest o Flask também acrescenta o seu handler padrão
+        levels = {handler: handler.level for handler in app.logger.handlers}
+        
+        listener = init_logging(app)
+        events_logger = app.extensions['events_logger']
+        events_handler = ListHandler()
+        events_logger.handlers[0].listener.handlers = (events_handler,)
+        
+        assert app.logger.level == logging.WARNING
+        assert set(listener.handlers) == set(levels)
+        assert all(handler.level == level for handler, level in levels.items())
+        
+        with app.app_context():
+            log_event('message_processed', message_id='wamid.1', total_ms=12)
+            app.logger.info('detalhe interno')
+            app.logger.warning('aviso')
+        # stop() espera as filas esvaziarem; o atexit da aplicação para de novo no fim
+        for queue_listener in (listener, events_logger.handlers[0].listener):
+            queue_listener.stop()
+            queue_listener.start()
+        
+        assert events_handler.messages == ['{"event":"message_processed","message_id":"wamid.1","total_ms":12}']
+        assert app_handler.messages == ['aviso']
+        print("✅ Eventos em INFO, handlers da aplicação no nível configurado")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de log estruturado: {e}")
+        raise
+
+def test_typed_entities():
+    """Testa a extração de valores, telefones, idades e datas (data de referência fixa)"""
+    print("\n🔢 Testando entidades tipadas...")
+    
+    try:
+        from datetime import date
+        from decimal import Decimal
+        from src.modules.typed_entities import Amount, extract_typed_spans, parse_amount
+        
+        amount_cases = [
+            (('150.000,00', None), Decimal('150000.00')),
+            (('150 000', None), Decimal('150000.00')),
+            (('2.500.000', None), Decimal('2500000.00')),
+            (('12.50', None), Decimal('12.50')),
+            (('1,5', 'milhoes'), Decimal('1500000.00')),
+            (('25', 'mil'), Decimal('25000.00')),
+            (('1.2.3', None), None),
+        ]
+        for (number, multiplier), expected in amount_cases:
+            value = parse_amount(number, multiplier)
+            assert value == expected, f'parse_amount({number!r}, {multiplier!r}) = {value!r}, esperado {expected!r}'
+        print(f"✅ parse_amount: {len(amount_cases)} casos")
+        
+        # Terça-feira, 5 de março de 2024
+        today = date(2024, 3, 5)
+        span_cases = [
+            ('Vendo carro por 1,5 milhoes kz', [('preco', '1500000.00 AOA', Amount(Decimal('1500000.00'), 'AOA'))]),
+            ('Preço: 2.500.000 kz', [('preco', '2500000.00 AOA', Amount(Decimal('2500000.00'), 'AOA'))]),
+            ('Custa 150.000,00 Kz ou 200 USD', [('preco', '150000.00 AOA', Amount(Decimal('150000.00'), 'AOA')),
+                                                ('preco', '200.00 USD', Amount(Decimal('200.00'), 'USD'))]),
+            ('200 000 000 kz', [('preco', '200000000.00 AOA', Amount(Decimal('200000000.00'), 'AOA'))]),
+            ('Ligue 923 456 789', [('telefone', '+244923456789', '+244923456789')]),
+            ('contacto +244 923-456-789', [('telefone', '+244923456789', '+244923456789')]),
+            ('Tenho 25 anos', [('idade', '25', 25)]),
+            ('Perdi o documento dia 12', [('data', '2024-02-12', date(2024, 2, 12))]),
+            ('Foi no dia 3', [('data', '2024-03-03', date(2024, 3, 3))]),
+            ('Encontrado dia 31', [('data', '2024-01-31', date(2024, 1, 31))]),
+            ('Encontrado em 12/10', [('data', '2023-10-12', date(2023, 10, 12))]),
+            ('Evento 01/03/24', [('data', '2024-03-01', date(2024, 3, 1))]),
+            ('Perdi ontem', [('data', '2024-03-04', date(2024, 3, 4))]),
+            ('Chega amanhã', [('data', '2024-03-06', date(2024, 3, 6))]),
+            ('Sumiu a 2 de fevereiro', [('data', '2024-02-02', date(2024, 2, 2))]),
+            ('Data 31/02', []),
+            ('Olá, tudo bem?', []),
+        ]
+        for text, expected in span_cases:
+            spans = [(span.tipo, span.valor, span.dado) for span in extract_typed_spans(text, today=today)]
+            assert spans == expected, f'{text!r}: {spans}, esperado {expected}'
+        
+        # As posições referem-se ao texto original
+        text = 'Preço: 2.500.000 kz'
+        span = extract_typed_spans(text, today=today)[0]
+        assert text[span.inicio:span.fim] == '2.500.000 kz'
+        print(f"✅ extract_typed_spans: {len(span_cases)} casos")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de entidades tipadas: {e}")
+        raise
+
+def test_intent_matcher():
+    """Testa se o IntentMatcher equivale ao laço sequencial de re.search"""
+    print("\n🎯 Testando filtro de padrões de comando...")
+    
+    try:
+        import json
+        import re
+        from src.modules.nlp_processor import NLPProcessor
+        from src.modules.parsed_message import normalize_text
+        
+        def sequential_detection(text):
+            for command_type, patterns in NLPProcessor.command_patterns.items():
+                for pattern in patterns:
+                    match = re.search(pattern, text, re.IGNORECASE)
+                    if match:
+                        return command_type, pattern, match.span(), match.groups()
+            return None
+        
+        def matcher_detection(text):
+            detection = NLPProcessor.command_matcher.match(text)
+            if detection:
+                command_type, pattern, match = detection
+                return command_type, pattern, match.span(), match.groups()
+            return None
+        
+        with open(os.path.join(os.path.dirname(__file__), 'benchmarks', 'corpus', 'nlp_corpus_v1.jsonl'), encoding='utf-8') as corpus:
+            texts = [json.loads(line)['text'] for line in corpus if line.strip()]
+        
+        detected = 0
+        for text in texts:
+            # O texto original (maiúsculas e acentos) e o normalizado que o NLP usa
+            for variant in (text, normalize_text(text)):
+                expected = sequential_detection(variant)
+                assert matcher_detection(variant) == expected, f'{variant!r}: esperado {expected}'
+                detected += expected is not None
+        
+        assert detected, 'nenhuma mensagem do corpus casou com os padrões'
+        print(f"✅ Mesmo primeiro padrão em {len(texts) * 2} mensagens ({detected} com comando)")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste do filtro de padrões: {e}")
+        raise
+
+def test_intent_classifier():
+    """Testa o treino, a gravação e a predição do classificador local de intenções"""
+    print("\n🧠 Testando classificador local de intenções...")
+    
+    try:
+        import json
+        import tempfile
+        from src.modules.intent_classifier import NaiveBayesIntentClassifier, evaluate
+        from src.modules.nlp_processor import NLPProcessor
+        from src.modules.parsed_message import normalize_text
+        
+        with open(os.path.join(os.path.dirname(__file__), 'benchmarks', 'corpus', 'nlp_corpus_v1.jsonl'), encoding='utf-8') as corpus:
+            rows = [json.loads(line) for line in corpus if line.strip()]
+        texts = [normalize_text(row['text']) for row in rows]
+        labels = [row['intent'] for row in rows]
+        
+        model = NaiveBayesIntentClassifier(n_features=2 ** 16).fit(texts, labels)
+        assert model.labels == sorted(set(labels))
+        assert model.predict('') == (None, 0.0)
+        
+        report = evaluate(model, texts, labels, [0.0, 0.9])
+        assert report[0]['fallback_rate'] == 0.0 and report[0]['accuracy'] > 0.9
+        assert report[1]['fallback_rate'] >= report[0]['fallback_rate']
+        print(f"✅ Treino com {len(texts)} mensagens (acurácia no treino {report[0]['accuracy']:.0%})")
+        
+        # Gravado e carregado, o modelo dá exatamente as mesmas predições
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'modelos', 'intencoes.json.gz')
+            model.save(path)
+            loaded = NaiveBayesIntentClassifier.load(path)
+        assert [loaded.predict(text) for text in texts] == [model.predict(text) for text in texts]
+        
+        try:
+            NaiveBayesIntentClassifier.from_dict(dict(model.to_dict(), version=0))
+            assert False, 'versão de modelo desconhecida foi aceita'
+        except ValueError:
+            pass
+        print("✅ Modelo gravado e carregado com as mesmas predições")
+        
+        # Sem padrão de comando, a detecção local usa o classificador acima do limiar
+        nlp = NLPProcessor()
+        assert nlp.detect_intent_locally('mano tudo fixe', None) is None
+        assert nlp.detect_intent_locally('mano tudo fixe', loaded, threshold=1.01) is None
+        detection = nlp.detect_intent_locally('mano tudo fixe', loaded, threshold=0.0)
+        assert detection['intent_source'] == 'classificador_local' and detection['intent'] in model.labels
+        print("✅ Detecção local respeita o limiar do classificador")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste do classificador local: {e}")
+        raise
+
+def test_place_gazetteer():
+    """Testa a busca aproximada de localidades de Angola"""
+    print("\n📍 Testando gazetteer de localidades...")
+    
+    try:
+        from src.main import create_app
+        from src.models import db, User, Produto
+        from src.modules.nlp_processor import NLPProcessor
+        from src.modules.parsed_message import normalize_text
+        from src.modules.places import PLACES, location_filter
+        
+        # (mensagem, [(id, trecho, distância)])
+        cases = [
+            ('Procuro eletricista em Cacuacu', [('cacuaco', 'cacuacu', 1)]),
+            ('moro no Cacuaco', [('cacuaco', 'cacuaco', 0)]),
+            ('Procuro eletricista Cacuacu', []),
+            ('vendo casa em Kilamba Kiaxi', [('kilamba_kiaxi', 'kilamba kiaxi', 0)]),
+            ('perdi a carteira na Huíla', [('huila', 'huila', 0)]),
+        ]
+        for text, expected in cases:
+            normalized = normalize_text(text)
+            found = [(match.place.id, normalized[match.inicio:match.fim], match.distancia)
+                     for match in PLACES.find(normalized)]
+            assert found == expected, f'{text!r}: {found}, esperado {expected}'
+        print(f"✅ Localidades encontradas em {len(cases)} mensagens (Cacuacu -> Cacuaco)")
+        
+        nlp = NLPProcessor()
+        entities = nlp._extract_entities(nlp._normalize_text('Procuro eletricista em Cacuacu'))
+        assert entities['localizacao'] == ['Cacuaco'] and entities['localizacao_id'] == ['cacuaco']
+        assert PLACES.resolve('em Cacuacu').nome == 'Cacuaco' and PLACES.resolve('Bairro X') is None
+        print("✅ Entidade localizacao com o nome canônico")
+        
+        # A busca no banco encontra a grafia gravada com ou sem acentos e a antiga só com 'kilamba'
+        app = create_app('testing')
+        with app.app_context():
+            user = User(whatsapp_id='244900000020')
+            db.session.add(user)
+            db.session.flush()
+            for location in ('Huíla', 'huila', 'Kilamba', 'Kilamba Kiaxi', 'Cacuaco', 'Viana'):
+                db.session.add(Produto(usuario_id=user.id, nome='Gerador', preco=1, categoria='outros', localizacao=location))
+            db.session.commit()
+            
+            def locations(query):
+                return sorted(p.localizacao for p in Produto.query.filter(location_filter(query, Produto.localizacao)))
+            
+            assert locations('Huila') == ['Huíla', 'huila']
+            assert locations('Kilamba Kiaxi') == ['Kilamba', 'Kilamba Kiaxi']
+            assert locations('Cacuacu') == ['Cacuaco']
+            assert locations('Bairro X') == []
+        print("✅ Filtro de localidade sem acentos e com grafias antigas")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste do gazetteer de localidades: {e}")
+        raise
+
+def test_spelling_correction():
+    """Testa a correção de grafias informais e erros de digitação"""
+    print("\n✏️ Testando correção ortográfica...")
+    
+    try:
+        from unittest.mock import patch
+        from src.main import create_app
+        from src.modules.nlp_processor import NLPProcessor
+        from src.modules.spelling import INFORMAL_SPELLINGS, SpellingCorrector
+        
+        corrector = SpellingCorrector({'bolo': 10, 'eletrecista': 2, 'eletricista': 80})
+        cases = [
+            ('kero comprar uma geleira', 'quero comprar uma geleira'),
+            ('prcs de um pintor pfv', 'preciso de um pintor por favor'),
+            ('vc tb ker', 'voce tambem quer'),
+            ('kero 2 quartos', 'quero 2 quartos'),
+            ('preciso de uma eletrecista', 'preciso de uma eletricista'),
+            ('procuro eletricista', 'procuro eletricista'),
+            ('vendo samsung note 10', 'vendo samsung note 10'),
+            ('vendo bolos', 'vendo bolos'),
+        ]
+        for text, expected in cases:
+            corrected = corrector.correct(text)
+            assert corrected == expected, f'{text!r}: {corrected!r}, esperado {expected!r}'
+        
+        # Toda grafia informal é trocada, mesmo ao lado de números
+        for informal, replacement in INFORMAL_SPELLINGS.items():
+            assert corrector.correct(f'{informal} 2') == f'{replacement} 2', informal
+        
+        loaded = SpellingCorrector.from_dict(corrector.to_dict())
+        assert [loaded.correct(text) for text, _ in cases] == [expected for _, expected in cases]
+        print(f"✅ {len(cases)} frases e {len(INFORMAL_SPELLINGS)} grafias informais corrigidas")
+        
+        # Com o corretor da aplicação, a grafia informal chega corrigida aos padrões de comando
+        app = create_app('testing')
+        app.extensions['spelling_corrector'] = corrector
+        nlp = NLPProcessor()
+        with app.app_context(), patch.object(NLPProcessor, '_cached_openai_analysis', return_value=None):
+            result = nlp.process_message('Prcs de um pintor')
+        assert result['intent'] == 'busca_prestador' and result['parsed'].normalized == 'preciso de um pintor'
+        print("✅ 'prcs de um pintor' detectado como busca de prestador")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de correção ortográfica: {e}")
+        raise
+
+def test_delivery_status():
+    """Testa a gravação em lote dos status de entrega"""
+    print("\n📬 Testando status de entrega em lote...")
+    
+    try:
+        import time
+        from datetime import datetime
+        from src.main import create_app
+        from src.models import db, User, Conversa, StatusEntrega
+        from src.modules.delivery_status import StatusIngestor
+        
+        def status(message_id, name, timestamp, **extra):
+            return dict({'id': message_id, 'status': name, 'timestamp': str(timestamp)}, **extra)
+        
+        app = create_app('testing')
+        with app.app_context():
+            user = User(whatsapp_id='244900000009')
+            db.session.add(user)
+            db.session.flush()
+            conversa = Conversa(usuario_id=user.id, mensagem_usuario='ola')
+            db.session.add(conversa)
+            db.session.commit()
+            StatusEntrega.registrar_envio('wamid.resposta1', conversa.id)
+            
+            # Abaixo do tamanho do lote nada é gravado até o intervalo
+            ingestor = StatusIngestor(app, batch_size=4, flush_interval=60)
+            ingestor.add([status('wamid.resposta1', 'sent', 1700000100), status('wamid.resposta1', 'delivered', 1700000105)])
+            time.sleep(0.1)
+            assert db.session.get(StatusEntrega, 'wamid.resposta1').enviado_em is None
+            
+            # Lote cheio: a thread grava sem esperar o intervalo, mantendo a primeira data de cada status
+            ingestor.add([
+                status('wamid.resposta1', 'delivered', 1700000103),
+                status('wamid.resposta1', 'read', 1700000110),
+                status('wamid.resposta2', 'failed', 1700000120, errors=[{'code': 131026}]),
+                status('wamid.resposta3', 'deleted', 1700000130),
+                {'status': 'read', 'timestamp': '1700000140'}
+            ])
+            deadline = time.time() + 2
+            while StatusEntrega.query.count() < 2 and time.time() < deadline:
+                time.sleep(0.02)
+            db.session.expire_all()
+            
+            first = db.session.get(StatusEntrega, 'wamid.resposta1')
+            assert first.conversa_id == conversa.id
+            assert first.enviado_em == datetime.fromtimestamp(1700000100)
+            assert first.entregue_em == datetime.fromtimestamp(1700000103)
+            assert first.lido_em == datetime.fromtimestamp(1700000110)
+            second = db.session.get(StatusEntrega, 'wamid.resposta2')
+            assert second.falhou_em == datetime.fromtimestamp(1700000120) and second.erro_codigo == 131026
+            assert StatusEntrega.query.count() == 2
+            print("✅ Lote cheio gravado com uma escrita, primeira data de cada status")
+            
+            # Status repetido depois não sobrescreve a data já gravada
+            ingestor.add([status('wamid.resposta1', 'delivered', 1700000200)])
+            ingestor.flush()
+            db.session.expire_all()
+            assert db.session.get(StatusEntrega, 'wamid.resposta1').entregue_em == datetime.fromtimestamp(1700000103)
+            print("✅ Status repetido mantém a primeira entrega")
+        
+        # O webhook só acumula os status, sem gravar na requisição
+        payload = {'entry': [{'changes': [{'field': 'messages', 'value': {
+            'statuses': [status('wamid.resposta4', 'sent', 1700000300)]}}]}]}
+        app.extensions['status_ingestor'] = StatusIngestor(app, batch_size=100, flush_interval=60)
+        response = app.test_client().post('/webhook/whatsapp', json=payload)
+        assert response.status_code == 200
+        with app.app_context():
+            assert db.session.get(StatusEntrega, 'wamid.resposta4') is None
+            app.extensions['status_ingestor'].flush()
+            assert db.session.get(StatusEntrega, 'wamid.resposta4').enviado_em == datetime.fromtimestamp(1700000300)
+        print("✅ Webhook acumula os status para o lote")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de status de entrega: {e}")
+        raise
+
+def test_webhook_replay():
+    """Testa a pseudonimização dos webhooks gravados e a sua reprodução"""
+    print("\n📼 Testando gravação e reprodução de webhooks...")
+    
+    try:
+        import tempfile
+        from unittest.mock import MagicMock, patch
+        from src.main import create_app
+        from src.models import Conversa
+        from src.modules.webhook_recorder import PhoneAnonymizer, WebhookRecorder, read_recordings
+        from src.commands.replay import rewrite_message_ids
+        from src.routes import whatsapp as whatsapp_route
+        
+        anonymizer = PhoneAnonymizer('segredo')
+        pseudonym = anonymizer.pseudonym('244923456789')
+        assert pseudonym != '244923456789' and len(pseudonym) == 12 and pseudonym.startswith('244')
+        assert anonymizer.pseudonym('+244 923 456 789') == pseudonym
+        assert PhoneAnonymizer('outro segredo').pseudonym('244923456789') != pseudonym
+        
+        # Só os telefones mudam; valores e documentos ficam como estão
+        text = 'Ligue 923 456 789 ou +244923456789. Preço 250 000 000 kz, BI 004567890LA042'
+        assert anonymizer.anonymize_text(text) == (
+            f'Ligue {pseudonym} ou {pseudonym}. Preço 250 000 000 kz, BI 004567890LA042')
+        
+        def webhook(message_id, body):
+            return {'entry': [{'changes': [{'field': 'messages', 'value': {
+                'contacts': [{'wa_id': '244923456789', 'profile': {'name': 'Maria Domingos'}}],
+                'messages': [{'id': message_id, 'from': '244923456789', 'type': 'text', 'text': {'body': body}}],
+                'statuses': [{'id': 'wamid.resposta', 'status': 'sent', 'recipient_id': '244923456789'}]
+            }}]}]}
+        
+        payload = webhook('wamid.gravado', 'olá, o meu número é 923 456 789')
+        anonymized = anonymizer.anonymize_payload(payload)
+        value = anonymized['entry'][0]['changes'][0]['value']
+        assert value['contacts'] == [{'wa_id': pseudonym, 'profile': {'name': 'Usuário'}}]
+        assert value['messages'][0]['from'] == pseudonym
+        assert value['messages'][0]['text']['body'] == f'olá, o meu número é {pseudonym}'
+        assert value['statuses'][0]['recipient_id'] == pseudonym
+        assert payload['entry'][0]['changes'][0]['value']['messages'][0]['from'] == '244923456789'
+        print("✅ Telefones e nomes pseudonimizados de forma estável")
+        
+        app = create_app('testing')
+        with tempfile.TemporaryDirectory() as directory:
+            # Gravados fora de ordem entre processos: a leitura ordena pela chegada
+            recorder = WebhookRecorder(directory, 'segredo')
+            recorder.record(webhook('wamid.2', 'boa tarde'), received_at=1700000020)
+            recorder.record(webhook('wamid.1', 'bom dia'), received_at=1700000010)
+            recorder.close()
+            
+            with app.app_context():
+                records = read_recordings([directory])
+            assert [record['t'] for record in records] == [1700000010, 1700000020]
+            assert records[0]['payload']['entry'][0]['changes'][0]['value']['messages'][0]['from'] == pseudonym
+            
+            replayed = records[0]['payload']
+            assert rewrite_message_ids(replayed, '42') == ['wamid.1.replay-42']
+            print("✅ Gravação lida em ordem de chegada, com IDs únicos por reprodução")
+            
+            # Reprodução em processo: as mensagens passam pelo webhook e viram conversas
+            whatsapp = MagicMock()
+            whatsapp.send_message_tracked.return_value = None
+            nlp = MagicMock()
+            nlp.process_message.return_value = {'intent': 'saudacao', 'command_type': 'saudacao', 'confidence': 0.9,
+                                                'entities': {}, 'text': 'ola'}
+            with patch.object(whatsapp_route, 'get_whatsapp', return_value=whatsapp), \
+                    patch.object(whatsapp_route, 'get_nlp_processor', return_value=nlp):
+                result = app.test_cli_runner().invoke(args=['replay-webhooks', directory, '--rate', '100', '--wait', '1'])
+            
+            assert result.exit_code == 0, result.output
+            assert 'Requisições: 2 (0 com erro)' in result.output
+            assert 'Mensagens: 2 enviadas, 2 processadas' in result.output
+            with app.app_context():
+                senders = {conversa.usuario.whatsapp_id for conversa in Conversa.query.all()}
+            assert senders == {pseudonym}
+            print("✅ Reprodução processa as mensagens gravadas")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de gravação e reprodução: {e}")
+        raise
+
+def test_message_deadline():
+    """Testa o orçamento de tempo da mensagem e os prazos das etapas"""
+    print("\n⏱️ Testando orçamento de tempo da mensagem...")
+    
+    try:
+        import time
+        from unittest.mock import MagicMock
+        from flask import g
+        from src.main import create_app
+        from src.modules.deadline import (Deadline, budget_exhausted, cap_timeout, openai_allowed, search_limit,
+                                          send_timeout, start_deadline)
+        from src.modules.message_router import MessageRouter
+        
+        # Fora do processamento de mensagens os prazos configurados valem como estão
+        assert cap_timeout(30) == 30 and send_timeout(10) == 10 and search_limit(10) == 10
+        assert openai_allowed() and not budget_exhausted()
+        
+        app = create_app('testing')
+        with app.test_request_context():
+            app.config['MESSAGE_DEADLINE_SECONDS'] = 0
+            assert start_deadline(time.time()) is None and g.deadline is None
+            assert cap_timeout(30) == 30 and not budget_exhausted()
+            
+            # Mensagem recém-chegada: orçamento de 15 s, 2 s reservados para o envio
+            app.config['MESSAGE_DEADLINE_SECONDS'] = 15
+            start_deadline(time.time())
+            assert 12.5 < cap_timeout(30) <= 13 and cap_timeout(5) == 5
+            assert openai_allowed() and not budget_exhausted() and search_limit(10) == 10
+            print("✅ Prazo das etapas limitado ao que resta do orçamento")
+            
+            # Perto do fim: ainda dá para o OpenAI, mas as buscas ficam menores
+            g.deadline = Deadline(start=time.time() - 11, budget=15)
+            assert 1.5 < cap_timeout(30) <= 2
+            assert openai_allowed() and search_limit(10) == 3 and search_limit(2) == 2
+            assert 3.5 < send_timeout(10) <= 4
+            
+            # Orçamento esgotado: nenhuma etapa recebe tempo e o envio fica com a reserva
+            g.deadline = Deadline(start=time.time() - 14, budget=15)
+            assert cap_timeout(30) == 0.0 and budget_exhausted() and not openai_allowed()
+            assert send_timeout(10) == 2.0
+            print("✅ Orçamento esgotado: sem OpenAI e envio com a reserva")
+            
+            # Com o orçamento esgotado, os módulos não são chamados: resposta pronta
+            router = MessageRouter()
+            module = MagicMock()
+            router.modules['busca_prestador'] = module
+            nlp_result = {'intent': 'busca_prestador', 'command_type': 'busca_prestador', 'confidence': 0.9,
+                          'entities': {}, 'text': 'preciso de um eletricista'}
+            response = router.route_message(nlp_result, MagicMock(), MagicMock())
+            assert response['type'] == 'deadline' and response['text'] == MessageRouter.DEADLINE_REPLY
+            assert not module.process_message.called
+            
+            g.deadline = Deadline(start=time.time(), budget=15)
+            module.process_message.return_value = {'success': True, 'text': 'ok'}
+            assert router.route_message(nlp_result, MagicMock(), MagicMock())['text'] == 'ok'
+        print("✅ Resposta pronta quando o orçamento acaba")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no teste de orçamento de tempo: {e}")
+        raise
+
 def main():
     """Executa todos os testes"""
     print("🚀 Iniciando testes do sistema Solicite IA\n")
@@ -133,7 +1197,24 @@ def main():
         ("Imports", test_imports),
         ("NLP Processor", test_nlp_processor),
         ("Módulos Funcionais", test_modules),
-        ("Integração WhatsApp", test_whatsapp_integration)
+        ("Integração WhatsApp", test_whatsapp_integration),
+        ("Deduplicação de Mensagens", test_message_dedup),
+        ("Fluxo de Venda", test_product_sale_flow),
+        ("Plurais das Palavras-chave", test_keyword_plurals),
+        ("Resiliência do OpenAI", test_openai_resilience),
+        ("Micro-lote de Classificações", test_intent_batcher),
+        ("Faixas por Usuário", test_message_lanes),
+        ("Junção de Rajadas", test_message_coalescer),
+        ("Controle de Carga", test_load_shedder),
+        ("Log Estruturado", test_structured_logging),
+        ("Entidades Tipadas", test_typed_entities),
+        ("Filtro de Padrões", test_intent_matcher),
+        ("Classificador Local", test_intent_classifier),
+        ("Gazetteer de Localidades", test_place_gazetteer),
+        ("Correção Ortográfica", test_spelling_correction),
+        ("Status de Entrega", test_delivery_status),
+        ("Gravação e Reprodução", test_webhook_replay),
+        ("Orçamento de Tempo", test_message_deadline)
     ]
     
     passed = 0